@@ -564,7 +564,65 @@ IMPORTERS = {
     'xls': 'organization.importers.xls.XLSImporter'
 }
 
+# Number of imported rows buffered before they are written to the
+# database with bulk inserts.
+IMPORT_BATCH_SIZE = 1000
+
+# Queue imports for the ``processimports`` worker instead of running
+# them inside the request.
+IMPORT_ASYNC = False
+
+# Build project exports in the ``processexports`` worker. Finished
+# exports are cached until their files exceed EXPORT_CACHE_SIZE bytes.
+EXPORT_ASYNC = False
+EXPORT_CACHE_SIZE = 1024 ** 3
+
+# Store ODK submissions in an inbox for the ``processsubmissions``
+# worker and acknowledge them with 202 Accepted, instead of ingesting
+# them inside the request.
+XFORM_SUBMISSION_ASYNC = False
+
+# Search backends, asked in order until one answers. The PostgreSQL
+# backend serves searches while ES is unavailable; deployments without
+# ES list only the PostgreSQL backend.
+SEARCH_BACKENDS = (
+    'search.backends.ElasticsearchBackend',
+    'search.backends.PostgresBackend',
+)
+
 ES_SCHEME = 'http'
 ES_HOST = 'localhost'
 ES_PORT = '9200'
 ES_MAX_RESULTS = 10000
+
+# Timeouts (seconds), retries and circuit breaker of the ES client: after
+# ES_CIRCUIT_FAILURES failed requests, searches fail immediately for
+# ES_CIRCUIT_RESET_TIMEOUT seconds.
+ES_CONNECT_TIMEOUT = 3.05
+ES_READ_TIMEOUT = 10
+ES_MAX_RETRIES = 2
+ES_RETRY_BACKOFF = 0.1
+ES_POOL_SIZE = 10
+ES_CIRCUIT_FAILURES = 5
+ES_CIRCUIT_RESET_TIMEOUT = 30
+# Every ES_METRICS_INTERVAL seconds, each process logs the number and
+# latency of its ES requests to the 'search' logger. None disables it.
+ES_METRICS_INTERVAL = 300
+
+# Search exports are not limited to ES_MAX_RESULTS: they scroll through
+# all results, ES_EXPORT_BATCH_SIZE hits at a time.
+ES_EXPORT_BATCH_SIZE = 500
+ES_SCROLL_KEEP_ALIVE = '1m'
+
+# Queue changes of locations, parties, relationships and resources for
+# the ``processindex`` worker, which sends them to ES in batches of
+# ES_INDEX_BATCH_SIZE documents. Updates address documents by entity ID,
+# which only indices built by ``rebuildindex`` use: run it for all
+# projects before turning this on, and run the worker while it is on.
+ES_INDEX_UPDATES = False
+ES_INDEX_BATCH_SIZE = 500
+
+# ``rebuildindex`` builds the indices of this many projects in parallel;
+# new indices get ES_INDEX_REPLICAS replicas once they are loaded.
+ES_REINDEX_PROCESSES = 4
+ES_INDEX_REPLICAS = 1
@@ -99,6 +99,10 @@ LOGGING = {
         'xform.submissions': {
             'handlers': ['file'],
             'level': 'DEBUG'
+        },
+        'xform.downloads': {
+            'handlers': ['file'],
+            'level': 'DEBUG'
         }
     },
 }
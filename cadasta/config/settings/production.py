@@ -53,6 +53,10 @@ CACHES = {
 
 ES_HOST = os.environ['ES_HOST']
 
+IMPORT_ASYNC = True
+EXPORT_ASYNC = True
+XFORM_SUBMISSION_ASYNC = True
+
 OPBEAT = {
     'ORGANIZATION_ID': os.environ['OPBEAT_ORGID'],
     'APP_ID': os.environ['OPBEAT_APPID'],
@@ -129,6 +133,16 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'search': {
+            'handlers': ['file', 'email_admins', 'opbeat'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'xform.downloads': {
+            'handlers': ['file', 'email_admins', 'opbeat'],
+            'level': 'DEBUG',
+            'propagate': True,
+        },
         # Log errors from the Opbeat module to the console
         'opbeat.errors': {
             'level': 'ERROR',
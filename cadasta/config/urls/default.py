@@ -54,6 +54,10 @@ api_v1 = [
         '(?P<project>[-\w]+)/relationships/',
         include('party.urls.api.relationships',
                 namespace='relationship')),
+    url(r'^organizations/(?P<organization>[-\w]+)/projects/'
+        '(?P<project>[-\w]+)/submissions/',
+        include('xforms.urls.submissions',
+                namespace='xforms')),
 
     url(r'^docs/',
         include('rest_framework_docs.urls'))
@@ -0,0 +1,36 @@
+import logging
+import time
+
+from django.db import connection
+
+logger = logging.getLogger('core')
+
+
+def run_worker(job_class, handler, poll_interval=5, once=False):
+    """Claim and run queued jobs of ``job_class`` with ``handler``.
+
+    The handler is responsible for recording the outcome of a job. An
+    exception raised by the handler is taken for a transient failure, the
+    job is queued again with ``job.retry``. With ``once`` the worker
+    returns the number of processed jobs as soon as the queue is empty,
+    otherwise it polls forever.
+    """
+    processed = 0
+    while True:
+        job = job_class.claim_next()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        try:
+            handler(job)
+        except Exception as e:
+            logger.exception("Background job %s failed", job.pk)
+            # Drop a connection that the failure left unusable
+            if not connection.in_atomic_block:
+                connection.close_if_unusable_or_obsolete()
+            # Only keep the progress the handler committed
+            job.refresh_from_db()
+            job.retry(str(e))
+        processed += 1
@@ -127,7 +127,8 @@ class SchemaSelectorMixin():
         content_type_to_selectors = dict()
         for k, v in settings.JSONATTRS_SCHEMA_SELECTORS.items():
             a, m = k.split('.')
+            # get_by_natural_key is served from the content type cache
             content_type_to_selectors[
-                ContentType.objects.get(app_label=a, model=m)
+                ContentType.objects.get_by_natural_key(a, m)
             ] = v
         return content_type_to_selectors
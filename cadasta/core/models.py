@@ -1,7 +1,10 @@
 import itertools
 import math
+from datetime import timedelta
+
 from core.util import slugify
 from django.db import models
+from django.utils import timezone
 
 from .util import random_id, ID_FIELD_LENGTH
 
@@ -53,3 +56,118 @@ class SlugModel:
         self.__original_slug = self.slug
 
         return super().save(*args, **kwargs)
+
+
+class BackgroundJob(RandomIDModel):
+    """A unit of work queued in the database and run by a worker.
+
+    Workers claim jobs with a conditional update, so several workers can
+    poll the same table. A running job whose ``updated`` timestamp has
+    not moved for ``STALE_AFTER`` seconds is considered abandoned and can
+    be claimed again; jobs are expected to save their progress regularly.
+
+    A job that fails for a transient reason is put back in the queue with
+    ``retry``, which delays it exponentially and fails it for good after
+    ``MAX_ATTEMPTS``.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((PENDING, 'Pending'),
+                      (RUNNING, 'Running'),
+                      (DONE, 'Done'),
+                      (FAILED, 'Failed'))
+
+    STALE_AFTER = 600
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = 30
+
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES,
+                              default=PENDING, db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def get_claimable(cls):
+        now = timezone.now()
+        stale = now - timedelta(seconds=cls.STALE_AFTER)
+        return cls.objects.filter(
+            models.Q(status=cls.PENDING, retry_after__isnull=True) |
+            models.Q(status=cls.PENDING, retry_after__lte=now) |
+            models.Q(status=cls.RUNNING, updated__lt=stale)
+        ).order_by('created')
+
+    @classmethod
+    def claim_next(cls):
+        """Claim the oldest claimable job, or return ``None``."""
+        for job in cls.get_claimable()[:10]:
+            if job.claim():
+                return job
+        return None
+
+    def claim(self):
+        now = timezone.now()
+        claimed = type(self).objects.filter(
+            pk=self.pk, status=self.status, updated=self.updated
+        ).update(status=self.RUNNING, updated=now,
+                 started=self.started or now)
+        if claimed:
+            self.status = self.RUNNING
+            self.updated = now
+            self.started = self.started or now
+        return bool(claimed)
+
+    def finish(self, status=DONE):
+        self.status = status
+        self.finished = timezone.now()
+        self.save()
+
+    def touch(self):
+        """Mark a running job as still making progress, so that it does
+        not become stale while it works through a large project."""
+        self.save(update_fields=['updated'])
+
+    def add_error(self, message):
+        """Record an error of the job. Jobs without a list of errors only
+        log them."""
+
+    def retry(self, message):
+        """Record the error of a transient failure and queue the job
+        again, or fail it once it has been attempted ``MAX_ATTEMPTS``
+        times. Returns whether the job will be retried."""
+        self.add_error(message)
+        self.attempts += 1
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.finish(self.FAILED)
+            return False
+        self.status = self.PENDING
+        self.finished = None
+        self.retry_after = timezone.now() + timedelta(
+            seconds=self.RETRY_DELAY * 2 ** (self.attempts - 1))
+        self.save()
+        return True
+
+    @property
+    def is_stale(self):
+        """Whether the job is queued or running but has not been updated
+        for ``STALE_AFTER`` seconds, e.g. because no worker is running."""
+        if self.status not in (self.PENDING, self.RUNNING):
+            return False
+        stale = timezone.now() - timedelta(seconds=self.STALE_AFTER)
+        return self.updated < stale
+
+    @property
+    def elapsed(self):
+        if not self.started:
+            return 0
+        end = self.finished or timezone.now()
+        return (end - self.started).total_seconds()
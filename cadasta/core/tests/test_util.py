@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from ..util import LRUCache
+
+
+class LRUCacheTest(TestCase):
+
+    def test_get_and_set(self):
+        cache = LRUCache(2)
+        assert cache.get('a') is None
+        assert cache.get('a', 0) == 0
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        assert 'a' in cache
+        assert len(cache) == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+
+    def test_delete(self):
+        cache = LRUCache(4)
+        for key in [('x', 1), ('x', 2), ('y', 1)]:
+            cache.set(key, True)
+        cache.delete(('y', 1))
+        cache.delete(('y', 2))
+        assert len(cache) == 2
+        cache.delete_matching(lambda key: key[0] == 'x')
+        assert len(cache) == 0
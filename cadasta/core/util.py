@@ -1,6 +1,7 @@
 from collections import OrderedDict
 import random
 import string
+import threading
 
 import django.utils.text as base_utils
 from rest_framework.settings import api_settings
@@ -24,6 +25,52 @@ def random_id():
     return ''.join(map(byte_to_base32_chr, rand_id))
 
 
+class LRUCache:
+    """A thread-safe, size-bounded mapping that evicts the least
+    recently used entry once it holds more than ``max_size`` keys."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Remove all entries whose key satisfies ``predicate``."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 def slugify(text, max_length=None, allow_unicode=False):
     slug = base_utils.slugify(text, allow_unicode=allow_unicode)
     if max_length is not None:
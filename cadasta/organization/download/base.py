@@ -1,12 +1,119 @@
 from collections import OrderedDict
 from core.mixins import SchemaSelectorMixin
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.query import QuerySet
+
+# Number of exported rows between two progress reports
+PROGRESS_BATCH_SIZE = 1000
+
+
+def make_getter(attr):
+    """Return a function that resolves a dotted attribute path such as
+    ``geometry.ewkt`` on a row. The first part of the path is looked up
+    with ``get_root``; a missing value anywhere on the path yields
+    ``None``."""
+    root, _, path = attr.partition('.')
+    path = path.split('.') if path else []
+
+    def getter(row, get_root):
+        value = get_root(row, root)
+        for a in path:
+            if value is None:
+                return None
+            value = getattr(value, a)
+        return value
+    return getter
+
+
+def get_item_value(item, name):
+    return getattr(item, name)
+
+
+def get_dict_value(row, name):
+    return row[name]
+
+
+class RowProjection:
+    """Compiled column getters for exporting the rows of one model.
+
+    Selectors and attribute paths are resolved once, so projecting a row
+    does not run any queries. If all exported columns are concrete model
+    fields, querysets are read with ``values()`` and no model instances
+    are built.
+    """
+
+    def __init__(self, model, model_attrs, schema_attrs, selector=None):
+        self.getters = [(attr, make_getter(attr)) for attr in model_attrs]
+        self.selector = selector
+
+        self.attributes = {}
+        for entity_type, attributes in schema_attrs.items():
+            self.attributes[entity_type] = list(attributes.keys())
+        self.default_attributes = (
+            [] if selector else self.attributes.get('DEFAULT', []))
+
+        # related objects can't be read from values(), their IDs can
+        field_names = {field.attname
+                       for field in model._meta.concrete_fields}
+        fields = OrderedDict.fromkeys(
+            attr.split('.')[0] for attr in model_attrs)
+        fields['attributes'] = None
+        if selector:
+            fields[selector] = None
+        self.fields = list(fields)
+        self.use_values = all(f in field_names for f in self.fields)
+
+    def project(self, row, get_root=get_item_value):
+        values = OrderedDict()
+        for attr, getter in self.getters:
+            values[attr] = getter(row, get_root)
+
+        if self.selector:
+            keys = self.attributes.get(
+                get_root(row, self.selector), [])
+        else:
+            keys = self.default_attributes
+        attributes = get_root(row, 'attributes')
+        for key in keys:
+            attr_value = attributes.get(key, '')
+            if isinstance(attr_value, list):
+                attr_value = (', ').join(attr_value)
+            values[key] = attr_value
+
+        return values
+
+    def iterate(self, queryset):
+        """Yield the projected values of every row in ``queryset``.
+
+        Rows are fetched with ``iterator()``, so the queryset does not
+        cache results while a large project is exported. Other iterables
+        are expected to hold model instances.
+        """
+        if not isinstance(queryset, QuerySet):
+            for item in queryset:
+                yield self.project(item)
+        elif self.use_values:
+            for row in queryset.values(*self.fields).iterator():
+                yield self.project(row, get_dict_value)
+        else:
+            for item in queryset.iterator():
+                yield self.project(item)
 
 
 class Exporter(SchemaSelectorMixin):
-    def __init__(self, project):
+    def __init__(self, project, progress=None):
         self.project = project
+        self.progress = progress
         self._schema_attrs = {}
+        self._selectors = {}
+
+    def track(self, rows):
+        """Yield ``rows``, calling ``progress`` after every
+        ``PROGRESS_BATCH_SIZE`` rows."""
+        for count, row in enumerate(rows, 1):
+            yield row
+            if self.progress and count % PROGRESS_BATCH_SIZE == 0:
+                self.progress()
 
     def get_schema_attrs(self, content_type):
         label = '{0}.{1}'.format(content_type.app_label, content_type.model)
@@ -14,30 +121,18 @@ class Exporter(SchemaSelectorMixin):
             self._schema_attrs = self.get_attributes(self.project)
         return self._schema_attrs[label]
 
-    def get_values(self, item, model_attrs, schema_attrs):
-        values = OrderedDict()
-        for attr in model_attrs:
-
-            if attr.split('.')[0] == 'geometry' and not item.geometry:
-                values[attr] = None
-                continue
+    def get_selector(self, content_type):
+        if content_type not in self._selectors:
+            self._selectors[content_type] = self.get_conditional_selector(
+                content_type)
+        return self._selectors[content_type]
 
-            value = item
-            for a in attr.split('.'):
-                value = getattr(value, a)
-            values[attr] = value
+    def get_projection(self, content_type, model_attrs, schema_attrs):
+        return RowProjection(content_type.model_class(), model_attrs,
+                             schema_attrs, self.get_selector(content_type))
 
+    def get_values(self, item, model_attrs, schema_attrs):
         content_type = ContentType.objects.get_for_model(item)
-        conditional_selector = self.get_conditional_selector(content_type)
-        if conditional_selector:
-            entity_type = getattr(item, conditional_selector)
-            attributes = schema_attrs.get(entity_type, {})
-        else:
-            attributes = schema_attrs.get('DEFAULT', {})
-        for key, attr in attributes.items():
-            attr_value = item.attributes.get(key, '')
-            if type(attr_value) == list:
-                attr_value = (', ').join(attr_value)
-            values[key] = attr_value
-
-        return values
+        projection = self.get_projection(
+            content_type, model_attrs, schema_attrs)
+        return projection.project(item)
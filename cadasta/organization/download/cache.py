@@ -0,0 +1,94 @@
+import hashlib
+import os
+import shutil
+from datetime import timedelta
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from party.models import Party, TenureRelationship
+from spatial.models import SpatialUnit
+
+from ..models import ExportJob
+from .shape import ShapeExporter
+from .xls import XLSExporter
+
+EXPORTERS = {
+    'shp': ShapeExporter,
+    'xls': XLSExporter,
+}
+
+
+def make_export(project, type, file_name, progress=None):
+    """Write a project export of the given type and return its path and
+    MIME type. ``progress`` is called while the rows are written, see
+    ``Exporter.track``."""
+    exporter = EXPORTERS[type](project, progress=progress)
+    path, mime_type = exporter.make_download(
+        '{}-{}'.format(file_name, type))
+    if type == 'shp':
+        # the shape files are only needed until they have been zipped
+        shutil.rmtree(os.path.splitext(path)[0], ignore_errors=True)
+    return path, mime_type
+
+
+def get_data_version(project):
+    """Return a stamp that changes whenever a project's export changes.
+
+    Every create, update and delete of a location, party or relationship
+    adds a historical record, so the latest history date and the number
+    of records per model identify the state of the project data. The
+    project itself and its questionnaire determine the exported columns.
+    """
+    parts = [project.id, project.last_updated.isoformat(),
+             project.current_questionnaire or '']
+    for model in (SpatialUnit, Party, TenureRelationship):
+        history = model.history.filter(project_id=project.id).aggregate(
+            latest=Max('history_date'), count=Count('history_id'))
+        parts.append(history['latest'].isoformat()
+                     if history['latest'] else '')
+        parts.append(history['count'])
+    stamp = ':'.join(str(part) for part in parts)
+    return hashlib.sha1(stamp.encode()).hexdigest()
+
+
+def get_export_job(project, type, user=None):
+    """Return the export job for the current state of a project's data.
+
+    A finished export of unchanged data is reused and marked as recently
+    used; so is an export that is still queued or running, unless it has
+    not been updated for ``ExportJob.STALE_AFTER`` seconds. Otherwise a
+    new job is queued.
+    """
+    version = get_data_version(project)
+    stale = timezone.now() - timedelta(seconds=ExportJob.STALE_AFTER)
+    jobs = ExportJob.objects.filter(
+        Q(status=ExportJob.DONE) |
+        Q(status__in=(ExportJob.PENDING, ExportJob.RUNNING),
+          updated__gte=stale),
+        project=project, type=type, version=version)
+    for job in jobs:
+        if job.status != ExportJob.DONE:
+            return job
+        if os.path.exists(job.path):
+            job.save(update_fields=['updated'])
+            return job
+        job.delete()
+    return ExportJob.objects.create(
+        project=project, user=user, type=type, version=version)
+
+
+def remove_export(job):
+    if job.path and os.path.exists(job.path):
+        os.remove(job.path)
+    job.delete()
+
+
+def evict_exports(max_size):
+    """Remove the least recently used exports until the files of the
+    remaining ones take up at most ``max_size`` bytes."""
+    total = 0
+    jobs = ExportJob.objects.filter(status=ExportJob.DONE).order_by('-updated')
+    for job in jobs.only('id', 'path', 'size'):
+        total += job.size
+        if total > max_size:
+            remove_export(job)
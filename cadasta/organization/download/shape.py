@@ -7,36 +7,52 @@ from osgeo import ogr, osr
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import BinaryField, Func
 from django.template.loader import render_to_string
 
-from .base import Exporter
+from .base import Exporter, get_dict_value
 
 MIME_TYPE = 'application/zip'
 
+# Number of features written to a layer per OGR transaction
+FEATURE_BATCH_SIZE = 1000
 
-class ShapeExporter(Exporter):
 
-    def write_items(self, filename, queryset, content_type, model_attrs):
-        schema_attrs = self.get_schema_attrs(content_type)
+class AsWKB(Func):
+    """Geometry as WKB, encoded by PostGIS."""
+    function = 'ST_AsBinary'
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, output_field=BinaryField(), **extra)
 
-        # build column labels
-        attr_columns = OrderedDict()
+
+class ShapeExporter(Exporter):
+
+    def get_columns(self, model_attrs, schema_attrs):
+        """Return the CSV column labels with the value used for columns
+        that a row does not have."""
+        columns = OrderedDict()
         for a in model_attrs:
-            attr_columns[a] = ''
+            columns[a] = ''
         for _, attrs in schema_attrs.items():
             for a in attrs.values():
-                if a.name not in attr_columns.keys():
-                    attr_columns[a.name] = None
+                if a.name not in columns:
+                    columns[a.name] = None
+        return columns
+
+    def write_items(self, filename, queryset, content_type, model_attrs):
+        schema_attrs = self.get_schema_attrs(content_type)
+        columns = self.get_columns(model_attrs, schema_attrs)
 
         with open(filename, 'w+', newline='') as csvfile:
             csvwriter = csv.writer(csvfile)
-            csvwriter.writerow(attr_columns.keys())
+            csvwriter.writerow(columns.keys())
 
-            for item in queryset:
-                values = self.get_values(item, model_attrs, schema_attrs)
-                data = attr_columns.copy()
-                data.update(values)
-                csvwriter.writerow(data.values())
+            projection = self.get_projection(
+                content_type, model_attrs, schema_attrs)
+            for values in self.track(projection.iterate(queryset)):
+                csvwriter.writerow([values.get(c, default)
+                                    for c, default in columns.items()])
 
     def write_relationships(self, filename):
         relationships = self.project.tenure_relationships.all()
@@ -59,6 +75,13 @@ class ShapeExporter(Exporter):
                          ('id', 'name', 'type'))
 
     def write_features(self, ds, filename):
+        """Write the project locations to the CSV file and their
+        geometries to shape file layers in a single pass.
+
+        Geometries are encoded as WKB by PostGIS and fed to OGR as they
+        are, and features are committed to each layer in batches of
+        ``FEATURE_BATCH_SIZE``.
+        """
         spatial_units = self.project.spatial_units.all()
         if spatial_units.count() == 0:
             return
@@ -66,29 +89,56 @@ class ShapeExporter(Exporter):
         content_type = ContentType.objects.get(app_label='spatial',
                                                model='spatialunit')
         model_attrs = ('id', 'type', 'area')
-
-        self.write_items(
-            filename, spatial_units, content_type, model_attrs)
+        schema_attrs = self.get_schema_attrs(content_type)
+        columns = self.get_columns(model_attrs, schema_attrs)
+        projection = self.get_projection(
+            content_type, model_attrs, schema_attrs)
+        rows = spatial_units.annotate(wkb=AsWKB('geometry')).values(
+            *(projection.fields + ['wkb']))
 
         layers = {}
+        pending = {}
 
-        for su in spatial_units:
-            # Excluding empty geometries from export
-            if not su.geometry:
-                continue
-
-            geom = ogr.CreateGeometryFromWkt(su.geometry.wkt)
-            layer_type = geom.GetGeometryName().lower()
-            layer = layers.get(layer_type, None)
-            if layer is None:
-                layer = self.create_layer(ds, layer_type)
-                layers[layer_type] = layer
+        with open(filename, 'w+', newline='') as csvfile:
+            csvwriter = csv.writer(csvfile)
+            csvwriter.writerow(columns.keys())
+
+            for row in self.track(rows.iterator()):
+                values = projection.project(row, get_dict_value)
+                csvwriter.writerow([values.get(c, default)
+                                    for c, default in columns.items()])
+
+                # Excluding empty geometries from export
+                if row['wkb'] is None:
+                    continue
+                geom = ogr.CreateGeometryFromWkb(bytes(row['wkb']))
+                if geom is None or geom.IsEmpty():
+                    continue
+
+                layer_type = geom.GetGeometryName().lower()
+                if layer_type not in layers:
+                    layer = self.create_layer(ds, layer_type)
+                    layers[layer_type] = layer
+                    if layer:
+                        layer.StartTransaction()
+                        pending[layer_type] = 0
+                layer = layers[layer_type]
+                if layer:
+                    feature = ogr.Feature(layer.GetLayerDefn())
+                    feature.SetGeometry(geom)
+                    feature.SetField('id', row['id'])
+                    layer.CreateFeature(feature)
+                    feature.Destroy()
+
+                    pending[layer_type] += 1
+                    if pending[layer_type] >= FEATURE_BATCH_SIZE:
+                        layer.CommitTransaction()
+                        layer.StartTransaction()
+                        pending[layer_type] = 0
+
+        for layer in layers.values():
             if layer:
-                feature = ogr.Feature(layer.GetLayerDefn())
-                feature.SetGeometry(geom)
-                feature.SetField('id', su.id)
-                layer.CreateFeature(feature)
-                feature.Destroy()
+                layer.CommitTransaction()
         return layers
 
     def create_datasource(self, dst_dir):
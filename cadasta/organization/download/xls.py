@@ -26,11 +26,11 @@ class XLSExporter(Exporter):
         worksheet.append(list(attr_columns.keys()))
 
         # write data
-        for i, item in enumerate(queryset):
-            values = self.get_values(item, model_attrs, schema_attrs)
-            data = attr_columns.copy()
-            data.update(values)
-            worksheet.append(list(data.values()))
+        columns = list(attr_columns.keys())
+        projection = self.get_projection(
+            content_type, model_attrs, schema_attrs)
+        for values in self.track(projection.iterate(queryset)):
+            worksheet.append([values.get(c, '') for c in columns])
 
     def write_locations(self):
         locations = self.project.spatial_units.all()
@@ -62,13 +62,18 @@ class XLSExporter(Exporter):
         self.write_items(worksheet, relationships, content_type,
                          ['party_id', 'spatial_unit_id', 'tenure_type'])
 
-    def make_download(self, f_name):
-        path = os.path.join(settings.MEDIA_ROOT, 'temp/{}.xlsx'.format(f_name))
+    def write_workbook(self, file):
+        # write-only worksheets keep their rows in temporary files, so
+        # memory use does not grow with the size of the project
         self.workbook = Workbook(write_only=True)
 
         self.write_locations()
         self.write_parties()
         self.write_relationships()
 
-        self.workbook.save(filename=path)
+        self.workbook.save(file)
+
+    def make_download(self, f_name):
+        path = os.path.join(settings.MEDIA_ROOT, 'temp/{}.xlsx'.format(f_name))
+        self.write_workbook(path)
         return path, MIME_TYPE
@@ -1,5 +1,4 @@
 import mimetypes
-import time
 # from zipfile import ZipFile
 
 from accounts.models import User
@@ -21,8 +20,7 @@ from tutelary.models import check_perms
 
 from .choices import ADMIN_CHOICES, ROLE_CHOICES
 # from .download.resources import ResourceExporter
-from .download.shape import ShapeExporter
-from .download.xls import XLSExporter
+from .download.cache import get_export_job
 from organization import fields as org_fields
 from .models import Organization, OrganizationRole, Project, ProjectRole
 
@@ -491,39 +489,9 @@ class DownloadForm(forms.Form):
         self.project = project
         self.user = user
 
-    def get_file(self):
-        t = round(time.time() * 1000)
-
-        file_name = '{}-{}-{}'.format(self.project.id, self.user.id, t)
-        type = self.cleaned_data['type']
-
-        if type == 'shp':
-            e = ShapeExporter(self.project)
-            path, mime = e.make_download(file_name + '-shp')
-        elif type == 'xls':
-            e = XLSExporter(self.project)
-            path, mime = e.make_download(file_name + '-xls')
-        # elif type == 'res':
-        #     e = ResourceExporter(self.project)
-        #     path, mime = e.make_download(file_name + '-res')
-        # elif type == 'all':
-        #     res_exporter = ResourceExporter(self.project)
-        #     xls_exporter = XLSExporter(self.project)
-        #     shp_exporter = ShapeExporter(self.project)
-        #     path, mime = res_exporter.make_download(file_name + '-res')
-        #     data_path, _ = xls_exporter.make_download(file_name + '-xls')
-        #     shp_path, _ = shp_exporter.make_download(file_name + '-shp')
-        #     dupes = ['locations.csv', 'parties.csv', 'relationships.csv']
-        #     with ZipFile(path, 'a') as myzip:
-        #         myzip.write(data_path, arcname='data.xlsx')
-        #         with ZipFile(shp_path, 'r') as shp_zip:
-        #             for name in shp_zip.namelist():
-        #                 if name not in dupes:
-        #                     myzip.writestr(name, shp_zip.read(name))
-        #             shp_zip.close()
-        #         myzip.close()
-
-        return path, mime
+    def get_export_job(self):
+        return get_export_job(
+            self.project, self.cleaned_data['type'], user=self.user)
 
 
 class SelectImportForm(SanitizeFieldsForm, forms.Form):
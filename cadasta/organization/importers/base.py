@@ -1,15 +1,17 @@
 import csv
+import importlib
+from contextlib import ExitStack
 
 from core.mixins import SchemaSelectorMixin
-from core.messages import SANITIZE_ERROR
-from core.validators import sanitize_string
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from party.models import Party, TenureRelationship
 from spatial.models import SpatialUnit
 
-from . import exceptions, validators
+from . import exceptions
+from .bulk import BulkCreator, get_history_user
+from .mapper import RowMapper, cast_to_type
 
 ATTRIBUTE_GROUPS = settings.ATTRIBUTE_GROUPS
 
@@ -38,18 +40,36 @@ XLS_WORKSHEET_TO_CONTENT_TYPE = {
 }
 
 
+def get_importer(type, **kwargs):
+    """Instantiate the importer configured for ``type`` in
+    ``settings.IMPORTERS``."""
+    fqn = settings.IMPORTERS.get(type)
+    parts = fqn.rpartition('.')
+    module = importlib.import_module(parts[0])
+    clazz = parts[-1]
+    importer = getattr(module, clazz)
+    return importer(**kwargs)
+
+
 class Importer(SchemaSelectorMixin):
 
     class Meta:
         abstract = True
 
-    def __init__(self, project, delimiter=',', quotechar='"'):
+    def __init__(self, project, delimiter=',', quotechar='"',
+                 batch_size=None):
         self.project = project
         self.delimiter = delimiter
         self.quotechar = quotechar
+        self.batch_size = batch_size
+        self.history_user = None
         self._schema_attrs = {}
         self._parties_created = {}
         self._locations_created = {}
+        self._new_parties = {}
+        self._new_locations = {}
+        self._bulk = None
+        self._committed_line = 0
 
     def get_headers(self):
         raise NotImplementedError(
@@ -63,6 +83,28 @@ class Importer(SchemaSelectorMixin):
             % self.__class__.__name__
         )
 
+    def get_checkpoint(self):
+        """Return the last committed line and what was created since the
+        previous checkpoint: the IDs of the locations and parties that
+        rows refer to, and the primary keys of all created instances.
+
+        Checkpoints only hold what changed, so they stay small however
+        large the import gets. To resume an import, pass the line of the
+        last checkpoint and the merged ``locations`` and ``parties`` of
+        all checkpoints to ``set_checkpoint``.
+        """
+        return {
+            'line_num': self._committed_line,
+            'locations': dict(self._new_locations),
+            'parties': dict(self._new_parties),
+            'created': self._bulk.get_pending_ids() if self._bulk else {},
+        }
+
+    def set_checkpoint(self, checkpoint):
+        self._committed_line = checkpoint.get('line_num', 0)
+        self._locations_created = dict(checkpoint.get('locations', {}))
+        self._parties_created = dict(checkpoint.get('parties', {}))
+
     def get_content_type_keys(self):
         content_type_keys = []
         for attribute_group in ATTRIBUTE_GROUPS:
@@ -156,30 +198,58 @@ class Importer(SchemaSelectorMixin):
         return (attribute_map,
                 sorted(extra_attrs), sorted(extra_headers))
 
-    def _import(self, config, csvfile):
-        attributes = config.get('attributes', None)
+    def _import(self, config, csvfile, **kwargs):
+        reader = csv.reader(
+            csvfile, delimiter=self.delimiter, quotechar=self.quotechar
+        )
+        self._import_rows(
+            config, ((reader.line_num, row) for row in reader), **kwargs)
+
+    def _import_rows(self, config, rows, on_commit=None):
+        """Import rows from an iterable of ``(line_num, row)`` tuples.
+
+        The first row holds the column headers. By default the whole
+        import runs in one transaction. If ``on_commit`` is given, every
+        chunk of ``batch_size`` rows is committed on its own and
+        ``on_commit(checkpoint, rows)`` is called inside that chunk's
+        transaction; rows up to a checkpoint restored with
+        ``set_checkpoint`` are skipped.
+        """
+        if on_commit and not self.batch_size:
+            raise ValueError("Chunked imports require a batch_size.")
+
         entity_types = config.get('entity_types', None)
 
         type = config.get('type', None)
         (attr_map,
             extra_attrs, extra_headers) = self.get_attribute_map(
                 type, entity_types)
+        if self.batch_size:
+            def committed(last_line, rows):
+                self._committed_line = last_line
+                on_commit(self.get_checkpoint(), rows)
+                self._new_locations = {}
+                self._new_parties = {}
+
+            self._bulk = BulkCreator(
+                self.batch_size,
+                history_user=self.history_user or get_history_user(),
+                on_flush=committed if on_commit else None)
+        content_type_keys = self.get_content_type_keys()
+        resume_after = self._committed_line
+        line_num = None
         try:
-            with transaction.atomic():
-                reader = csv.reader(
-                    csvfile, delimiter=self.delimiter,
-                    quotechar=self.quotechar
-                )
-                headers = [h.lower() for h in next(reader)]
-
-                for row in reader:
-                    content_types = dict(
-                        (key, None) for key in self.get_content_type_keys()
-                    )
+            with (ExitStack() if on_commit else transaction.atomic()):
+                line_num, head = next(rows)
+                headers = [h.lower() for h in head]
+                mapper = RowMapper(headers, config, attr_map)
+
+                for line_num, row in rows:
+                    if line_num <= resume_after:
+                        continue
+                    content_types = dict.fromkeys(content_type_keys)
                     (party_name, party_type, geometry, location_type,
-                        tenure_type) = validators.validate_row(
-                            headers, row, config
-                    )
+                        tenure_type) = mapper.validate(row)
                     if 'PT' in entity_types and party_type:
                         content_types['party.party'] = {
                             'project': self.project,
@@ -199,115 +269,74 @@ class Importer(SchemaSelectorMixin):
                             'project': self.project,
                             'attributes': {}
                         }
-                    content_types = self._map_attrs_to_content_types(
-                        headers, row, content_types, attributes, attr_map)
+                    content_types = mapper.map_attributes(row, content_types)
                     self._create_models(
-                        type, headers, row, content_types, tenure_type
+                        mapper, row, content_types, tenure_type,
+                        line_num=line_num
                     )
+                    if self._bulk:
+                        self._bulk.end_row(line_num)
+                if self._bulk:
+                    self._bulk.flush()
         except ValidationError as e:
             raise exceptions.DataImportError(
-                e.messages[0], line_num=reader.line_num)
+                e.messages[0], line_num=line_num)
+        finally:
+            self._bulk = None
 
-    def _create_models(self, type, headers, row, content_types, tenure):
+    def _create_models(self, mapper, row, content_types, tenure,
+                       line_num=None):
 
         party_ct = content_types['party.party']
         spatial_ct = content_types['spatial.spatialunit']
 
-        s_id = (
-            'tenurerelationship::spatial_unit_id'
-            if type == 'xls' else 'spatial_unit_id')
-        p_id = (
-            'tenurerelationship::party_id'
-            if type == 'xls' else 'party_id'
-        )
-
         if spatial_ct:
-            try:
-                spatial_unit_id = row[headers.index(s_id)]
-            except ValueError:
-                su = SpatialUnit.objects.create(**spatial_ct)
-            else:
-                if spatial_unit_id:
-                    created_su_id = self._locations_created.get(
-                        spatial_unit_id, None
-                    )
-                    if created_su_id:
-                        su = SpatialUnit.objects.get(id=created_su_id)
-                    else:
-                        su = SpatialUnit.objects.create(**spatial_ct)
-                        self._locations_created[spatial_unit_id] = su.pk
-                else:
-                    su = SpatialUnit.objects.create(**spatial_ct)
-                    self._locations_created[spatial_unit_id] = su.pk
+            spatial_unit_id = mapper.get_spatial_unit_id(row)
+            su_id = None
+            if spatial_unit_id:
+                su_id = self._locations_created.get(spatial_unit_id, None)
+            if not su_id:
+                su_id = self._create(SpatialUnit, spatial_ct, line_num)
+                if spatial_unit_id is not None:
+                    self._locations_created[spatial_unit_id] = su_id
+                    self._new_locations[spatial_unit_id] = su_id
 
         if party_ct:
-            try:
-                party_id = row[headers.index(p_id)]
-            except ValueError:
-                party = Party.objects.create(**party_ct)
-            else:
-                if party_id:
-                    created_party_id = self._parties_created.get(
-                        party_id, None)
-                    if created_party_id:
-                        party = Party.objects.get(id=created_party_id)
-                    else:
-                        party = Party.objects.create(**party_ct)
-                        self._parties_created[party_id] = party.pk
-                else:
-                    party = Party.objects.create(**party_ct)
-                    self._parties_created[party_id] = party.pk
+            party_id = mapper.get_party_id(row)
+            pt_id = None
+            if party_id:
+                pt_id = self._parties_created.get(party_id, None)
+            if not pt_id:
+                pt_id = self._create(Party, party_ct, line_num)
+                if party_id is not None:
+                    self._parties_created[party_id] = pt_id
+                    self._new_parties[party_id] = pt_id
 
         if party_ct and spatial_ct:
-            content_types['party.tenurerelationship']['party'] = party
-            content_types['party.tenurerelationship']['spatial_unit'] = su
+            content_types['party.tenurerelationship']['party_id'] = pt_id
+            content_types['party.tenurerelationship']['spatial_unit_id'] = (
+                su_id)
             content_types['party.tenurerelationship']['tenure_type'] = tenure
-            TenureRelationship.objects.create(
-                **content_types['party.tenurerelationship']
+            self._create(
+                TenureRelationship,
+                content_types['party.tenurerelationship'],
+                line_num
             )
 
+    def _create(self, model, attrs, line_num=None):
+        """Create a model instance and return its primary key.
+
+        In batched mode the instance is only buffered; it is written
+        when the current chunk is flushed.
+        """
+        if self._bulk:
+            return self._bulk.create(model, line_num=line_num, **attrs).pk
+        return model.objects.create(**attrs).pk
+
     def _map_attrs_to_content_types(self, headers, row, content_types,
                                     attributes, attr_map):
-        for model, selectors in attr_map.items():
-            for selector, attrs in selectors.items():
-                content_type = content_types.get(model, None)
-                if not content_type:
-                    continue
-                if selector in ['DEFAULT', content_type.get('type', '')]:
-                    for attr in attrs:
-                        attribute = attrs[attr][0]
-                        attr_label = '{0}::{1}'.format(
-                            model.split('.')[1], attr)
-                        if attr_label not in attributes:
-                            continue
-                        try:
-                            val = row[headers.index(attribute.name.lower())]
-                        except:
-                            val = row[headers.index(attr_label)]
-
-                        if not sanitize_string(val):
-                            raise ValidationError(SANITIZE_ERROR)
-
-                        if not attribute.required and val == '':
-                            continue
-                        if attribute.attr_type.name == 'select_multiple':
-                            val = [v.strip() for v in val.split(',')]
-                        if attribute.attr_type.name in ['integer', 'decimal']:
-                            val = self._cast_to_type(
-                                val, attribute.attr_type.name)
-                        if content_type:
-                            content_type['attributes'][attribute.name] = val
-        return content_types
+        mapper = RowMapper(headers, {'attributes': attributes}, attr_map)
+        return mapper.map_attributes(row, content_types)
 
     def _cast_to_type(self, val, type):
-        if type == 'integer':
-            try:
-                val = int(float(val))
-            except:
-                val = 0
-        if type == 'decimal':
-            try:
-                val = float(val)
-            except:
-                val = 0.0
-        return val
+        return cast_to_type(val, type)
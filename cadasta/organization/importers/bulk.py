@@ -0,0 +1,124 @@
+from collections import OrderedDict
+
+from core.util import random_id
+from django.db import (DatabaseError, InterfaceError, OperationalError,
+                       models, transaction)
+from django.utils import timezone
+from party.models import Party, TenureRelationship
+from search.models import IndexUpdate
+from simple_history.models import HistoricalRecords
+from spatial.models import SpatialUnit
+from spatial.tiles import invalidate_tiles
+
+from . import exceptions
+
+# Flush order matters: tenure relationships reference both
+# spatial units and parties.
+BULK_MODELS = (SpatialUnit, Party, TenureRelationship)
+
+
+def get_history_user():
+    """Return the user of the current request, as recorded by
+    simple_history's ``HistoryRequestMiddleware``."""
+    try:
+        user = HistoricalRecords.thread.request.user
+    except AttributeError:
+        return None
+    return user if user.is_authenticated else None
+
+
+class BulkCreator:
+    """Buffers imported model instances and writes them in chunks.
+
+    IDs are generated up front, so rows can reference each other
+    before anything is written. Each chunk is written with a single
+    ``bulk_create`` per model plus one ``bulk_create`` for the
+    matching historical records. Pre-save signals are still sent so
+    the longitude fix in ``spatial.models.check_extent`` applies;
+    location areas are computed by the ``calculate_area`` database
+    trigger on insert.
+
+    ``on_flush`` is called inside the transaction that writes a chunk,
+    with the line number of the last row in the chunk and the number of
+    rows it held, so callers can record a checkpoint atomically with
+    the data.
+    """
+
+    def __init__(self, batch_size, history_user=None, on_flush=None):
+        self.batch_size = batch_size
+        self.history_user = history_user
+        self.on_flush = on_flush
+        self.created = OrderedDict((model, 0) for model in BULK_MODELS)
+        self._buffers = OrderedDict((model, []) for model in BULK_MODELS)
+        self._rows = 0
+        self._first_line = None
+        self._last_line = None
+
+    def create(self, model, line_num=None, **kwargs):
+        instance = model(id=random_id(), **kwargs)
+        models.signals.pre_save.send(
+            sender=model, instance=instance, raw=False,
+            using=None, update_fields=None)
+        self._buffers[model].append(instance)
+        if self._first_line is None:
+            self._first_line = line_num
+        return instance
+
+    def end_row(self, line_num=None):
+        self._rows += 1
+        self._last_line = line_num
+        if self._rows >= self.batch_size:
+            self.flush()
+
+    def get_pending_ids(self):
+        """Return the primary keys of the buffered instances, keyed by
+        model label."""
+        return OrderedDict(
+            (model._meta.label_lower, [instance.pk for instance in instances])
+            for model, instances in self._buffers.items() if instances)
+
+    def flush(self):
+        history_date = timezone.now()
+        try:
+            with transaction.atomic():
+                for model, instances in self._buffers.items():
+                    if not instances:
+                        continue
+                    model.objects.bulk_create(instances)
+                    model.history.model.objects.bulk_create([
+                        self._historical_record(model, instance, history_date)
+                        for instance in instances
+                    ])
+                    self.created[model] += len(instances)
+                    # bulk_create does not queue search index updates
+                    IndexUpdate.enqueue(model, instances)
+                if self.on_flush and self._rows:
+                    self.on_flush(self._last_line, self._rows)
+        except (InterfaceError, OperationalError):
+            # Lost connections and lock timeouts are not caused by the
+            # imported data
+            raise
+        except DatabaseError as e:
+            raise exceptions.DataImportError(
+                str(e), line_num=self._first_line)
+
+        # bulk_create does not send post_save, which clears cached tiles
+        for project_id in {su.project_id
+                           for su in self._buffers[SpatialUnit]}:
+            invalidate_tiles(project_id)
+
+        for instances in self._buffers.values():
+            del instances[:]
+        self._rows = 0
+        self._first_line = None
+        self._last_line = None
+
+    def _historical_record(self, model, instance, history_date):
+        attrs = {field.attname: getattr(instance, field.attname)
+                 for field in model._meta.fields}
+        return model.history.model(
+            history_date=history_date,
+            history_type='+',
+            history_user=self.history_user,
+            **attrs
+        )
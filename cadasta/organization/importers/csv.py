@@ -5,8 +5,10 @@ from . import base
 
 class CSVImporter(base.Importer):
 
-    def __init__(self, project, path, delimiter=',', quotechar='"'):
-        super(CSVImporter, self).__init__(project=project)
+    def __init__(self, project, path, delimiter=',', quotechar='"',
+                 batch_size=None):
+        super(CSVImporter, self).__init__(
+            project=project, batch_size=batch_size)
         self.path = path
         self.delimiter = delimiter
         self.quotechar = quotechar
@@ -26,4 +28,4 @@ class CSVImporter(base.Importer):
 
     def import_data(self, config_dict, **kwargs):
         with open(self.path, 'r', newline='') as csvfile:
-            self._import(config_dict, csvfile)
+            self._import(config_dict, csvfile, **kwargs)
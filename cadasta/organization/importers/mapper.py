@@ -0,0 +1,107 @@
+from core.messages import SANITIZE_ERROR
+from core.validators import sanitize_string
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext as _
+
+from . import validators
+
+
+def cast_to_type(val, type):
+    if type == 'integer':
+        try:
+            val = int(float(val))
+        except (TypeError, ValueError):
+            val = 0
+    if type == 'decimal':
+        try:
+            val = float(val)
+        except (TypeError, ValueError):
+            val = 0.0
+    return val
+
+
+def split_multiple(val):
+    return [v.strip() for v in val.split(',')]
+
+
+def get_caster(attr_type):
+    if attr_type == 'select_multiple':
+        return split_multiple
+    if attr_type in ('integer', 'decimal'):
+        return lambda val: cast_to_type(val, attr_type)
+    return None
+
+
+class RowMapper:
+    """Compiled import plan for a fixed header row.
+
+    Resolves, once per import, the column of every configured field and
+    attribute together with the caster that converts its value. Mapping
+    a row is then a single pass over precomputed positions instead of
+    repeated ``headers.index`` lookups.
+    """
+
+    def __init__(self, headers, config, attr_map):
+        index = validators.get_header_index(headers)
+        self.validate = validators.RowValidator(headers, config)
+
+        if config.get('type', None) == 'xls':
+            self.spatial_unit_id = index.get(
+                'tenurerelationship::spatial_unit_id')
+            self.party_id = index.get('tenurerelationship::party_id')
+        else:
+            self.spatial_unit_id = index.get('spatial_unit_id')
+            self.party_id = index.get('party_id')
+
+        attributes = config.get('attributes', None) or []
+        self.attribute_groups = []
+        for model, selectors in attr_map.items():
+            for selector, attrs in selectors.items():
+                columns = []
+                for attr in attrs:
+                    attribute = attrs[attr][0]
+                    attr_label = '{0}::{1}'.format(
+                        model.split('.')[1], attr)
+                    if attr_label not in attributes:
+                        continue
+                    position = index.get(
+                        attribute.name.lower(), index.get(attr_label))
+                    if position is None:
+                        raise ValidationError(
+                            _("No '{}' column found.".format(attr_label))
+                        )
+                    columns.append((
+                        attribute.name, position, attribute.required,
+                        get_caster(attribute.attr_type.name)
+                    ))
+                if columns:
+                    self.attribute_groups.append((model, selector, columns))
+
+    def get_spatial_unit_id(self, row):
+        if self.spatial_unit_id is None:
+            return None
+        return row[self.spatial_unit_id]
+
+    def get_party_id(self, row):
+        if self.party_id is None:
+            return None
+        return row[self.party_id]
+
+    def map_attributes(self, row, content_types):
+        for model, selector, columns in self.attribute_groups:
+            content_type = content_types.get(model, None)
+            if not content_type:
+                continue
+            if selector not in ('DEFAULT', content_type.get('type', '')):
+                continue
+            attributes = content_type['attributes']
+            for name, position, required, caster in columns:
+                val = row[position]
+                if not sanitize_string(val):
+                    raise ValidationError(SANITIZE_ERROR)
+                if not required and val == '':
+                    continue
+                if caster:
+                    val = caster(val)
+                attributes[name] = val
+        return content_types
@@ -1,5 +1,3 @@
-from functools import partial
-
 from django.contrib.gis.geos import GEOSGeometry, GEOSException
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext as _
@@ -9,68 +7,107 @@ from core.messages import SANITIZE_ERROR
 from xforms.utils import InvalidODKGeometryError, odk_geom_to_wkt
 
 
-def get_field_value(headers, row, header, field_name):
-    try:
-        return row[headers.index(header)]
-    except ValueError:
-        raise ValidationError(
-            _("No '{}' column found.".format(field_name))
-        )
+def get_header_index(headers):
+    """Map each header to the position of its first occurrence."""
+    index = {}
+    for position, header in enumerate(headers):
+        index.setdefault(header, position)
+    return index
 
 
 def validate_row(headers, row, config):
-    party_name, party_type, geometry, tenure_type, location_type = (
-        None, None, None, None, None)
+    return RowValidator(headers, config)(row)
+
+
+class RowValidator:
+    """Validates import rows against a fixed header row.
+
+    Column positions are resolved once, when the validator is created;
+    validating a row only indexes into it.
+    """
+
+    def __init__(self, headers, config):
+        (party_name_field, party_type_field, location_type_field, type,
+            geometry_field, tenure_type_field) = get_fields_from_config(config)
+        index = get_header_index(headers)
+
+        def column(header, field_name):
+            return index.get(header), field_name
+
+        self.width = len(headers)
+        self.party = None
+        if party_name_field and party_type_field:
+            self.party = (column(party_name_field, 'party_name'),
+                          column(party_type_field, 'party_type'))
+        self.geometry = None
+        if geometry_field:
+            self.geometry = column(geometry_field, 'geometry_field')
+        self.location_type = None
+        if location_type_field:
+            self.location_type = column(location_type_field, 'location_type')
+            self.location_types = config.get(
+                'allowed_location_types', [])
+        self.tenure_type = None
+        if party_name_field and geometry_field:
+            self.tenure_type = column(tenure_type_field, 'tenure_type')
+            self.tenure_types = config.get('allowed_tenure_types', [])
+
+    def __call__(self, row):
+        party_name, party_type, geometry, tenure_type, location_type = (
+            None, None, None, None, None)
+
+        if self.width != len(row):
+            raise ValidationError(
+                _("Number of headers and columns do not match.")
+            )
 
-    (party_name_field, party_type_field, location_type_field, type,
-        geometry_field, tenure_type_field) = get_fields_from_config(config)
+        if self.party:
+            party_name = get_column_value(row, *self.party[0])
+            party_type = get_column_value(row, *self.party[1])
 
-    if len(headers) != len(row):
-        raise ValidationError(
-            _("Number of headers and columns do not match.")
-        )
+        if self.geometry:
+            coords = get_column_value(row, *self.geometry)
+            if coords == '':
+                geometry = None
+            else:
+                try:
+                    geometry = GEOSGeometry(coords)
+                except (ValueError, GEOSException):
+                    try:
+                        geometry = GEOSGeometry(odk_geom_to_wkt(coords))
+                    except InvalidODKGeometryError:
+                        raise ValidationError(_("Invalid geometry."))
 
-    _get_field_value = partial(get_field_value, headers, row)
+        if self.location_type:
+            location_type = get_column_value(row, *self.location_type)
+            if location_type and location_type not in self.location_types:
+                raise ValidationError(
+                    _("Invalid location_type: '%s'.") % location_type
+                )
 
-    if party_name_field and party_type_field:
-        party_name = _get_field_value(party_name_field, "party_name")
-        party_type = _get_field_value(party_type_field, "party_type")
+        if self.tenure_type:
+            tenure_type = get_column_value(row, *self.tenure_type)
 
-    if geometry_field:
-        coords = _get_field_value(geometry_field, "geometry_field")
-        if coords == '':
-            geometry = None
-        else:
-            try:
-                geometry = GEOSGeometry(coords)
-            except (ValueError, GEOSException):
-                try:
-                    geometry = GEOSGeometry(odk_geom_to_wkt(coords))
-                except InvalidODKGeometryError:
-                    raise ValidationError(_("Invalid geometry."))
-
-    if location_type_field:
-        location_type = _get_field_value(location_type_field, "location_type")
-        type_choices = config['allowed_location_types']
-        if location_type and location_type not in type_choices:
-            raise ValidationError(
-                _("Invalid location_type: '%s'.") % location_type
-            )
+            if tenure_type and tenure_type not in self.tenure_types:
+                raise ValidationError(
+                    _("Invalid tenure_type: '%s'.") % tenure_type
+                )
 
-    if party_name_field and geometry_field:
-        tenure_type = _get_field_value(tenure_type_field, 'tenure_type')
+        values = (party_name, party_type, geometry, location_type,
+                  tenure_type)
 
-        if tenure_type and tenure_type not in config['allowed_tenure_types']:
-            raise ValidationError(
-                _("Invalid tenure_type: '%s'.") % tenure_type
-            )
+        if not all(sanitize_string(val) for val in values):
+            raise ValidationError(SANITIZE_ERROR)
 
-    values = (party_name, party_type, geometry, location_type, tenure_type)
+        return values
 
-    if not all(sanitize_string(val) for val in values):
-        raise ValidationError(SANITIZE_ERROR)
 
-    return values
+def get_column_value(row, position, field_name):
+    if position is None:
+        raise ValidationError(
+            _("No '{}' column found.".format(field_name))
+        )
+    return row[position]
 
 
 def get_fields_from_config(config):
@@ -1,8 +1,9 @@
-import io
 import itertools
+import pickle
+import tempfile
 
-import pandas as pd
 from django.utils.translation import ugettext as _
+from openpyxl import load_workbook
 
 from . import base, exceptions
 
@@ -14,94 +15,192 @@ class XLSImporter(base.Importer):
         'tenure_type.label'
     ]
 
-    def __init__(self, project=None, path=None):
-        super(XLSImporter, self).__init__(project=project)
+    def __init__(self, project=None, path=None, batch_size=None):
+        super(XLSImporter, self).__init__(
+            project=project, batch_size=batch_size)
         self.path = path
+        self._header_map = None
 
     def get_header_map(self):
-        headers = {}
-        EXCLUDE_HEADERS = base.EXCLUDE_HEADERS.copy()
-        EXCLUDE_HEADERS.extend(self.EXCLUDE_IDS)
-        workbook = pd.read_excel(self.path, sheetname=None)
-        for sheet in workbook.keys():
-            worksheet = workbook[sheet]
-            heads = []
-            headers[sheet] = heads
-            for col in worksheet.columns.tolist():
-                if not (col.startswith(
-                        ('_', 'meta/')) or col in EXCLUDE_HEADERS):
-                    heads.append(col.lower())
-        return headers
+        if self._header_map is None:
+            EXCLUDE_HEADERS = base.EXCLUDE_HEADERS.copy()
+            EXCLUDE_HEADERS.extend(self.EXCLUDE_IDS)
+            headers = {}
+            with open(self.path, 'rb') as f:
+                workbook = load_workbook(f, read_only=True)
+                for worksheet in workbook.worksheets:
+                    headers[worksheet.title] = [
+                        col.lower() for col in get_sheet_headers(worksheet)
+                        if col and not (col.startswith(('_', 'meta/')) or
+                                        col in EXCLUDE_HEADERS)
+                    ]
+            self._header_map = headers
+        return self._header_map
 
     def get_headers(self):
         return itertools.chain.from_iterable(self.get_header_map().values())
 
     def import_data(self, config, **kwargs):
         entity_types = config['entity_types']
-        df = pd.read_excel(self.path, sheetname=None)
-        data = get_csv_from_dataframe(df, entity_types)
-        with io.StringIO(data) as csvfile:
-            self._import(config, csvfile)
+        with open(self.path, 'rb') as f:
+            workbook = load_workbook(f, read_only=True)
+            self._import_rows(
+                config, get_rows(workbook, entity_types), **kwargs)
+
+
+def get_cell_value(value):
+    """Convert a worksheet cell value to the text the importer expects."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def get_sheet_headers(worksheet):
+    for row in worksheet.iter_rows(max_row=1):
+        headers = [get_cell_value(cell.value) for cell in row]
+        while headers and not headers[-1]:
+            headers.pop()
+        return headers
+    return []
+
+
+def iter_sheet_rows(worksheet, width):
+    """Yield the data rows of a worksheet as lists of ``width`` strings.
+
+    Read-only worksheets omit trailing empty cells, so rows are padded;
+    rows without any values are skipped.
+    """
+    rows = worksheet.iter_rows(min_row=2)
+    for row in rows:
+        values = [get_cell_value(cell.value) for cell in row[:width]]
+        if not any(values):
+            continue
+        values.extend([''] * (width - len(values)))
+        yield values
+
+
+def get_worksheet(workbook, name):
+    if name not in workbook.sheetnames:
+        raise exceptions.DataImportError(
+            _("Missing '%s' worksheet.") % name)
+    return workbook[name]
+
+
+def get_rows(workbook, entity_types):
+    """Stream the rows of an exported project workbook.
+
+    Yields ``(line_num, row)`` tuples in the same shape as a CSV import:
+    the first row holds prefixed column headers and every later row
+    combines a location, a tenure relationship and a party. This is the
+    row-wise equivalent of an outer join of the three worksheets.
 
+    Only the relationships worksheet is held in memory, indexed by
+    ``spatial_unit_id``. Parties that take part in a relationship are
+    spooled to a temporary file and looked up by ``party_id`` through an
+    index of file offsets; locations are never buffered.
+    """
+    if 'SU' in entity_types and 'PT' in entity_types:
+        rows = _get_joined_rows(workbook)
+    elif 'SU' in entity_types:
+        rows = _get_sheet_rows(workbook, 'locations', 'spatialunit')
+    elif 'PT' in entity_types:
+        rows = _get_sheet_rows(workbook, 'parties', 'party')
+    else:
+        raise exceptions.DataImportError(
+            _('Unsupported import format.'))
+    return ((line_num, row) for line_num, row in enumerate(rows, start=1))
+
+
+def _get_sheet_rows(workbook, name, prefix):
+    worksheet = get_worksheet(workbook, name)
+    headers = [h.lower() for h in get_sheet_headers(worksheet)]
+    keep = [i for i, h in enumerate(headers) if h != 'id']
+
+    yield [prefix + '::' + headers[i] for i in keep]
+    for row in iter_sheet_rows(worksheet, len(headers)):
+        yield [row[i] for i in keep]
 
-def get_csv_from_dataframe(df, entity_types):
-    locations, parties, relationships = None, None, None
+
+def _get_joined_rows(workbook):
+    locations = get_worksheet(workbook, 'locations')
+    parties = get_worksheet(workbook, 'parties')
+    relationships = get_worksheet(workbook, 'relationships')
+
+    su_headers = [h.lower() for h in get_sheet_headers(locations)]
+    pt_headers = [h.lower() for h in get_sheet_headers(parties)]
+    tr_headers = [h.lower() for h in get_sheet_headers(relationships)]
+    if not (su_headers and pt_headers and tr_headers):
+        raise exceptions.DataImportError(_('Empty worksheet.'))
+
+    su_keep = [i for i, h in enumerate(su_headers) if h != 'id']
+    pt_keep = [i for i, h in enumerate(pt_headers) if h != 'id']
     try:
-        if 'SU' in entity_types and 'PT' in entity_types:
-            locations = df['locations']
-            parties = df['parties']
-            relationships = df['relationships']
-            if not (locations.empty or
-                    relationships.empty or parties.empty):
-                locations.rename(
-                    columns=lambda x: 'spatialunit::' + x.lower(),
-                    inplace=True
-                )
-                relationships.rename(
-                    columns=lambda x: 'tenurerelationship::' + x.lower(),
-                    inplace=True)
-                parties.rename(
-                    columns=lambda x: 'party::' + x.lower(), inplace=True
-                )
-                # join locations and relationships on spatial_id's
-                joined = pd.merge(
-                    locations, relationships, left_on='spatialunit::id',
-                    right_on='tenurerelationship::spatial_unit_id',
-                    how='outer'
-                )
-                # then join to parties on party_id
-                merged = pd.merge(
-                    joined, parties, left_on='tenurerelationship::party_id',
-                    right_on='party::id', how='outer'
-                )
-                # drop unused columns
-                drop_cols = ['spatialunit::id', 'party::id']
-                merged.drop(drop_cols, inplace=True, axis=1)
-
-                return merged.to_csv(index=False, index_label=False)
+        su_id_idx = su_headers.index('id')
+        pt_id_idx = pt_headers.index('id')
+        tr_su_idx = tr_headers.index('spatial_unit_id')
+        tr_pt_idx = tr_headers.index('party_id')
+    except ValueError as e:
+        raise exceptions.DataImportError(str(e))
+
+    empty_su = [''] * len(su_keep)
+    empty_pt = [''] * len(pt_keep)
+
+    # index relationships by location and collect the parties they use
+    tenure_index = {}
+    linked_parties = set()
+    for row in iter_sheet_rows(relationships, len(tr_headers)):
+        tenure_index.setdefault(row[tr_su_idx], []).append(row)
+        linked_parties.add(row[tr_pt_idx])
+    if not tenure_index:
+        raise exceptions.DataImportError(_('Empty worksheet.'))
+
+    yield (
+        ['spatialunit::' + su_headers[i] for i in su_keep] +
+        ['tenurerelationship::' + h for h in tr_headers] +
+        ['party::' + pt_headers[i] for i in pt_keep]
+    )
+
+    with tempfile.TemporaryFile() as spool:
+        # parties without relationships are imported on their own, the
+        # others are spooled until their relationships are reached.
+        party_index = {}
+        has_parties = False
+        for row in iter_sheet_rows(parties, len(pt_headers)):
+            has_parties = True
+            values = [row[i] for i in pt_keep]
+            party_id = row[pt_id_idx]
+            if party_id in linked_parties:
+                party_index[party_id] = spool.tell()
+                pickle.dump(values, spool)
             else:
-                raise exceptions.DataImportError(
-                    _('Empty worksheet.'))
-        elif 'SU' in entity_types and 'PT' not in entity_types:
-            locations = df['locations']
-            # rename location type
-            locations.rename(
-                columns=lambda x: 'spatialunit::' + x.lower(), inplace=True
-            )
-            drop_cols = ['spatialunit::id']
-            locations.drop(drop_cols, inplace=True, axis=1)
-            return locations.to_csv(index=False, index_label=False)
-        elif 'SU' not in entity_types and 'PT' in entity_types:
-            parties = df['parties']
-            parties.rename(
-                columns=lambda x: 'party::' + x.lower(), inplace=True
-            )
-            drop_cols = ['party::id']
-            parties.drop(drop_cols, inplace=True, axis=1)
-            return parties.to_csv(index=False, index_label=False)
-        else:
-            raise exceptions.DataImportError(
-                _('Unsupported import format.'))
-    except KeyError as e:
-        raise exceptions.DataImportError(
-            _("Missing '%s' worksheet.") % e.args[0])
+                yield empty_su + [''] * len(tr_headers) + values
+        if not has_parties:
+            raise exceptions.DataImportError(_('Empty worksheet.'))
+
+        def get_party(party_id):
+            offset = party_index.get(party_id)
+            if offset is None:
+                return empty_pt
+            spool.seek(offset)
+            return pickle.load(spool)
+
+        has_locations = False
+        for row in iter_sheet_rows(locations, len(su_headers)):
+            has_locations = True
+            values = [row[i] for i in su_keep]
+            tenures = tenure_index.pop(row[su_id_idx], None)
+            if not tenures:
+                yield values + [''] * len(tr_headers) + empty_pt
+                continue
+            for tenure in tenures:
+                yield values + tenure + get_party(tenure[tr_pt_idx])
+        if not has_locations:
+            raise exceptions.DataImportError(_('Empty worksheet.'))
+
+        # relationships that reference a location missing from the
+        # workbook still carry their party
+        for tenures in tenure_index.values():
+            for tenure in tenures:
+                yield empty_su + tenure + get_party(tenure[tr_pt_idx])
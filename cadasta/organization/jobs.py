@@ -0,0 +1,51 @@
+import os
+
+from django.conf import settings
+
+from .download.cache import evict_exports, make_export
+from .importers.base import get_importer
+from .importers.exceptions import DataImportError
+from .models import ExportJob, ImportJob
+
+
+def run_import_job(job):
+    """Run a queued data import, committing one chunk at a time.
+
+    An import that was interrupted, e.g. by a lost database connection,
+    resumes after its last committed chunk when it is run again. Invalid
+    data fails the job and removes the rows it already committed.
+    """
+    project = job.project
+    importer = get_importer(
+        job.type, project=project, path=job.path,
+        batch_size=settings.IMPORT_BATCH_SIZE)
+    importer.history_user = job.user
+    importer.set_checkpoint(job.get_checkpoint())
+
+    config = dict(job.config)
+    config['project'] = project
+
+    try:
+        importer.import_data(config, on_commit=job.add_chunk)
+    except DataImportError as e:
+        job.add_error(str(e), e.line_num)
+        job.finish(ImportJob.FAILED)
+    else:
+        job.finish(ImportJob.DONE)
+        if os.path.exists(job.path):
+            os.remove(job.path)
+
+
+def run_export_job(job):
+    """Write a queued project export and evict old exports beyond
+    ``settings.EXPORT_CACHE_SIZE``.
+
+    The job is touched as batches of rows are written, so a long export
+    is not mistaken for a stale one and claimed by another worker.
+    """
+    job.path, job.mime_type = make_export(
+        job.project, job.type, 'export-{}'.format(job.id),
+        progress=job.touch)
+    job.size = os.path.getsize(job.path)
+    job.finish(ExportJob.DONE)
+    evict_exports(settings.EXPORT_CACHE_SIZE)
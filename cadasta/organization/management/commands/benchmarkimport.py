@@ -0,0 +1,83 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from party.choices import TENURE_RELATIONSHIP_TYPES
+from spatial.choices import TYPE_CHOICES
+
+from organization.importers.mapper import RowMapper
+
+ATTR_TYPES = ('text', 'integer', 'decimal', 'select_multiple')
+SAMPLE_VALUES = {
+    'text': 'some text',
+    'integer': '42',
+    'decimal': '4.2',
+    'select_multiple': 'one, two, three',
+}
+
+
+def make_odk_export(columns, rows):
+    """Build headers, an attribute map and rows shaped like a wide ODK
+    CSV export with ``columns`` attribute columns."""
+    names = ['attr_{}'.format(i) for i in range(columns)]
+    headers = ['name_of_hh', 'party_type', 'location_type', 'tenure_type',
+               'location_geometry'] + names
+    attrs = {}
+    for i, name in enumerate(names):
+        attr_type = ATTR_TYPES[i % len(ATTR_TYPES)]
+        attrs[name] = (
+            SimpleNamespace(name=name, required=False,
+                            attr_type=SimpleNamespace(name=attr_type)),
+            'spatial.spatialunit', 'Location'
+        )
+    attr_map = {'spatial.spatialunit': {'DEFAULT': attrs}}
+    config = {
+        'type': 'csv',
+        'entity_types': ['PT', 'SU'],
+        'party_name_field': 'name_of_hh',
+        'party_type_field': 'party_type',
+        'location_type_field': 'location_type',
+        'geometry_field': 'location_geometry',
+        'attributes': ['spatialunit::' + name for name in names],
+        'allowed_tenure_types': [t[0] for t in TENURE_RELATIONSHIP_TYPES],
+        'allowed_location_types': [t[0] for t in TYPE_CHOICES],
+    }
+    row = ['Party name', 'IN', 'PA', 'FH', '24.84 89.83 0.0 0.0'] + [
+        SAMPLE_VALUES[attrs[name][0].attr_type.name] for name in names]
+    return headers, config, attr_map, [list(row) for _ in range(rows)]
+
+
+class Command(BaseCommand):
+    help = """Measures how many rows per second the data importer can
+            validate and map for a wide ODK export. No data is written
+            to the database."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--columns', type=int, default=300,
+            help='Number of attribute columns in the export')
+        parser.add_argument(
+            '--rows', type=int, default=5000,
+            help='Number of rows to map')
+
+    def handle(self, *args, **options):
+        headers, config, attr_map, rows = make_odk_export(
+            options['columns'], options['rows'])
+
+        start = time.perf_counter()
+        mapper = RowMapper(headers, config, attr_map)
+        compiled = time.perf_counter()
+        for row in rows:
+            mapper.validate(row)
+            mapper.map_attributes(row, {
+                'spatial.spatialunit': {'type': 'PA', 'attributes': {}}
+            })
+        finished = time.perf_counter()
+
+        elapsed = finished - compiled
+        self.stdout.write(
+            'Compiled {} columns in {:.4f}s'.format(
+                len(headers), compiled - start))
+        self.stdout.write(
+            'Mapped {} rows in {:.3f}s ({:.0f} rows/sec)'.format(
+                len(rows), elapsed, len(rows) / elapsed if elapsed else 0))
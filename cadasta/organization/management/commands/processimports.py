@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import run_worker
+from organization.jobs import run_import_job
+from organization.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = """Runs queued project data imports. Interrupted imports are
+            resumed from their last committed chunk."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='Exit when no imports are left in the queue')
+        parser.add_argument(
+            '--poll-interval', type=int, default=5, dest='poll_interval',
+            help='Seconds to wait between polls of an empty queue')
+
+    def handle(self, *args, **options):
+        run_worker(ImportJob, run_import_job,
+                   poll_interval=options['poll_interval'],
+                   once=options['once'])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('organization', '0006_add_project_area_trigger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.CharField(max_length=24, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=7)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('retry_after', models.DateTimeField(blank=True, null=True)),
+                ('type', models.CharField(max_length=3)),
+                ('path', models.CharField(max_length=255)),
+                ('config', django.contrib.postgres.fields.jsonb.JSONField(default={})),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('errors', django.contrib.postgres.fields.jsonb.JSONField(default=[])),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='organization.Project')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_num', models.IntegerField()),
+                ('rows', models.IntegerField()),
+                ('locations', django.contrib.postgres.fields.jsonb.JSONField(default={})),
+                ('parties', django.contrib.postgres.fields.jsonb.JSONField(default={})),
+                ('created', django.contrib.postgres.fields.jsonb.JSONField(default={})),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='organization.ImportJob')),
+            ],
+            options={
+                'ordering': ('line_num',),
+            },
+        ),
+    ]
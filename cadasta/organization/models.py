@@ -1,7 +1,8 @@
 from django.utils.functional import cached_property
 from django.core.urlresolvers import reverse
 from django.conf import settings
-from django.db import models
+from django.apps import apps
+from django.db import models, transaction
 from django_countries.fields import CountryField
 from django.contrib.postgres.fields import JSONField, ArrayField
 from django.dispatch import receiver
@@ -15,7 +16,7 @@ from shapely.wkt import dumps
 from tutelary.decorators import permissioned_model
 from tutelary.models import Policy
 
-from core.models import RandomIDModel, SlugModel
+from core.models import BackgroundJob, RandomIDModel, SlugModel
 from geography.models import WorldBorder
 from resources.mixins import ResourceModelMixin
 from .validators import validate_contact
@@ -373,3 +374,135 @@ def assign_project_permissions(sender, instance, **kwargs):
 @receiver(models.signals.post_delete, sender=ProjectRole)
 def remove_project_permissions(sender, instance, **kwargs):
     assign_prj_policies(instance, delete=True)
+
+
+class ImportJob(BackgroundJob):
+    """A project data import run by the ``processimports`` worker.
+
+    Rows are committed in chunks and each chunk records what it created,
+    see ``ImportChunk``. An interrupted import resumes after the last
+    chunk; a failed import removes what its chunks created.
+    """
+
+    project = models.ForeignKey(Project, related_name='import_jobs')
+    user = models.ForeignKey('accounts.User', null=True,
+                             on_delete=models.SET_NULL, related_name='+')
+    type = models.CharField(max_length=3)
+    path = models.CharField(max_length=255)
+    config = JSONField(default={})
+    rows_processed = models.IntegerField(default=0)
+    errors = JSONField(default=[])
+
+    class Meta:
+        ordering = ('-created',)
+
+    def __repr__(self):
+        repr_string = ('<ImportJob id={obj.id}'
+                       ' project={obj.project.slug}'
+                       ' type={obj.type}'
+                       ' status={obj.status}>')
+        return repr_string.format(obj=self)
+
+    def add_error(self, message, line_num=None):
+        self.errors = self.errors + [{'line': line_num, 'message': message}]
+
+    def add_chunk(self, checkpoint, rows):
+        """Record a committed chunk from an importer's checkpoint."""
+        ImportChunk.objects.create(
+            job=self, line_num=checkpoint['line_num'], rows=rows,
+            locations=checkpoint['locations'],
+            parties=checkpoint['parties'],
+            created=checkpoint['created'])
+        self.rows_processed += rows
+        self.save(update_fields=['rows_processed', 'updated'])
+
+    def get_checkpoint(self):
+        """Return the checkpoint to resume the import from, merged from
+        the committed chunks."""
+        checkpoint = {'line_num': 0, 'locations': {}, 'parties': {}}
+        for chunk in self.chunks.order_by('line_num'):
+            checkpoint['line_num'] = chunk.line_num
+            checkpoint['locations'].update(chunk.locations)
+            checkpoint['parties'].update(chunk.parties)
+        return checkpoint
+
+    def rollback(self):
+        """Delete everything the committed chunks created."""
+        created = {}
+        for chunk in self.chunks.all():
+            for label, ids in chunk.created.items():
+                created.setdefault(label, []).extend(ids)
+        with transaction.atomic():
+            # relationships reference locations and parties
+            for label in ('party.tenurerelationship', 'party.party',
+                          'spatial.spatialunit'):
+                if created.get(label):
+                    model = apps.get_model(label)
+                    model.objects.filter(pk__in=created[label]).delete()
+            self.chunks.all().delete()
+            self.rows_processed = 0
+
+    def finish(self, status=BackgroundJob.DONE):
+        """Finish the import. The chunks of a successful import are no
+        longer needed; a failed import is rolled back."""
+        if status == self.FAILED:
+            self.rollback()
+        else:
+            self.chunks.all().delete()
+        super().finish(status)
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0
+        return round(self.rows_processed / elapsed, 1)
+
+
+class ImportChunk(models.Model):
+    """A chunk of rows committed by an import job.
+
+    ``locations`` and ``parties`` map the location and party IDs of the
+    imported file to the primary keys created for them, so later rows
+    of a resumed import can refer to them. ``created`` lists the primary
+    keys of all instances created by the chunk, keyed by model label.
+    """
+
+    job = models.ForeignKey(ImportJob, related_name='chunks')
+    line_num = models.IntegerField()
+    rows = models.IntegerField()
+    locations = JSONField(default={})
+    parties = JSONField(default={})
+    created = JSONField(default={})
+
+    class Meta:
+        ordering = ('line_num',)
+
+
+class ExportJob(BackgroundJob):
+    """A project data export run by the ``processexports`` worker.
+
+    Finished exports are kept as a cache, keyed by the export type and a
+    stamp of the project data, see
+    ``organization.download.cache.get_data_version``.
+    """
+
+    project = models.ForeignKey(Project, related_name='export_jobs')
+    user = models.ForeignKey('accounts.User', null=True,
+                             on_delete=models.SET_NULL, related_name='+')
+    type = models.CharField(max_length=3)
+    version = models.CharField(max_length=40)
+    path = models.CharField(max_length=255, blank=True)
+    mime_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ('-created',)
+        index_together = ('project', 'type', 'version')
+
+    def __repr__(self):
+        repr_string = ('<ExportJob id={obj.id}'
+                       ' project={obj.project.slug}'
+                       ' type={obj.type}'
+                       ' status={obj.status}>')
+        return repr_string.format(obj=self)
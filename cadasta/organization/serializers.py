@@ -11,7 +11,8 @@ from core.form_mixins import SuperUserCheck
 from core import serializers as core_serializers
 from accounts.models import User
 from accounts.serializers import UserSerializer
-from .models import Organization, Project, OrganizationRole, ProjectRole
+from .models import (Organization, Project, OrganizationRole, ProjectRole,
+                     ImportJob)
 from .forms import create_update_or_delete_project_role
 
 
@@ -318,3 +319,14 @@ class UserAdminSerializer(UserSerializer):
         model = User
         fields = ('username', 'full_name', 'email',
                   'organizations', 'last_login', 'is_active')
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.ReadOnlyField()
+
+    class Meta:
+        model = ImportJob
+        fields = ('id', 'type', 'status', 'rows_processed',
+                  'rows_per_second', 'errors', 'attempts', 'retry_after',
+                  'created', 'started', 'finished')
+        read_only_fields = fields
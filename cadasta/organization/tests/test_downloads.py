@@ -1,9 +1,11 @@
 import csv
 import os
 import time
+from collections import OrderedDict
 from zipfile import ZipFile
 
 import pytest
+from unittest.mock import patch
 
 from core.tests.utils.cases import UserTestCase
 from core.tests.utils.files import make_dirs  # noqa
@@ -14,6 +16,7 @@ from django.test import TestCase
 from jsonattrs.models import Attribute, AttributeType, Schema
 from openpyxl import Workbook, load_workbook
 from organization.tests.factories import ProjectFactory
+from party.models import Party, TenureRelationship
 from party.tests.factories import PartyFactory, TenureRelationshipFactory
 from resources.models import ContentObject
 from resources.tests.factories import ResourceFactory
@@ -23,7 +26,7 @@ from spatial.tests.factories import SpatialUnitFactory
 from spatial.models import SpatialUnit
 from questionnaires.tests import factories as q_factories
 
-from ..download.base import Exporter
+from ..download.base import Exporter, RowProjection
 from ..download.resources import ResourceExporter
 from ..download.shape import ShapeExporter
 from ..download.xls import XLSExporter
@@ -35,6 +38,21 @@ class BaseExporterTest(UserTestCase, TestCase):
         project = ProjectFactory.build()
         exporter = Exporter(project)
         assert exporter.project == project
+        assert exporter.progress is None
+
+    @patch('organization.download.base.PROGRESS_BATCH_SIZE', 2)
+    def test_track(self):
+        calls = []
+        exporter = Exporter(ProjectFactory.build(),
+                            progress=lambda: calls.append(len(rows)))
+        rows = []
+        for row in exporter.track(range(5)):
+            rows.append(row)
+        assert rows == [0, 1, 2, 3, 4]
+        assert calls == [2, 4]
+
+        exporter = Exporter(ProjectFactory.build())
+        assert list(exporter.track(range(5))) == [0, 1, 2, 3, 4]
 
     def test_get_schema_attrs_empty(self):
         project = ProjectFactory.create()
@@ -212,6 +230,69 @@ class BaseExporterTest(UserTestCase, TestCase):
             'key': 'text', 'gr_key': 'Test Group Field'
         }
 
+    def test_get_values_does_not_query(self):
+        project = ProjectFactory.create(current_questionnaire='123abc')
+        exporter = Exporter(project)
+        content_type = ContentType.objects.get(app_label='party',
+                                               model='party')
+        schema_attrs = exporter.get_schema_attrs(content_type)
+        items = PartyFactory.create_batch(3, project=project)
+        exporter.get_values(items[0], ('id', 'name'), schema_attrs)
+        with self.assertNumQueries(0):
+            for item in items:
+                exporter.get_values(item, ('id', 'name'), schema_attrs)
+
+
+class RowProjectionTest(UserTestCase, TestCase):
+
+    def test_columns_from_values(self):
+        project = ProjectFactory.create()
+        su = SpatialUnitFactory.create(
+            project=project, geometry='SRID=4326;POINT (30 10)',
+            attributes={'key': 'value'})
+        empty = SpatialUnitFactory.create(project=project, geometry=None)
+        projection = RowProjection(
+            SpatialUnit, ('id', 'geometry.ewkt', 'type'),
+            {'DEFAULT': OrderedDict([('key', None)])})
+        assert projection.use_values is True
+        assert projection.fields == ['id', 'geometry', 'type', 'attributes']
+
+        rows = list(projection.iterate(
+            SpatialUnit.objects.filter(id=su.id)))
+        assert rows == [{'id': su.id, 'geometry.ewkt': su.geometry.ewkt,
+                         'type': su.type, 'key': 'value'}]
+        rows = list(projection.iterate(
+            SpatialUnit.objects.filter(id=empty.id)))
+        assert rows == [{'id': empty.id, 'geometry.ewkt': None,
+                         'type': empty.type, 'key': ''}]
+
+    def test_conditional_selector(self):
+        project = ProjectFactory.create()
+        party = PartyFactory.create(
+            project=project, type='GR',
+            attributes={'gr_key': ['a', 'b'], 'in_key': 'x'})
+        projection = RowProjection(
+            Party, ('id', 'name'),
+            {'IN': OrderedDict([('in_key', None)]),
+             'GR': OrderedDict([('gr_key', None)])},
+            selector='type')
+        assert projection.fields == ['id', 'name', 'attributes', 'type']
+        rows = list(projection.iterate(Party.objects.all()))
+        assert rows == [{'id': party.id, 'name': party.name,
+                         'gr_key': 'a, b'}]
+
+    def test_columns_from_instances(self):
+        project = ProjectFactory.create()
+        tenure = TenureRelationshipFactory.create(project=project)
+        projection = RowProjection(
+            TenureRelationship, ('id', 'party_id', 'party.name'), {})
+        assert projection.use_values is False
+        expected = [{'id': tenure.id, 'party_id': tenure.party_id,
+                     'party.name': tenure.party.name}]
+        assert list(projection.iterate(
+            TenureRelationship.objects.all())) == expected
+        assert list(projection.iterate([tenure])) == expected
+
 
 @pytest.mark.usefixtures('clear_temp')
 class ShapeTest(UserTestCase, TestCase):
@@ -491,6 +572,33 @@ class ShapeTest(UserTestCase, TestCase):
         # remove this so other tests pass
         os.remove(filename)
 
+    def test_write_features_in_batches(self):
+        ensure_dirs()
+        project = ProjectFactory.create()
+        exporter = ShapeExporter(project)
+        locations = SpatialUnitFactory.create_batch(
+            5, project=project, geometry='SRID=4326;POINT (30 10)')
+        SpatialUnitFactory.create(
+            project=project,
+            geometry='SRID=4326;LINESTRING (30 10, 10 30, 40 40)')
+
+        dst_dir = os.path.join(settings.MEDIA_ROOT, 'temp/batches')
+        ds = exporter.create_datasource(dst_dir)
+        filename = os.path.join(dst_dir, 'locations.csv')
+        with patch('organization.download.shape.FEATURE_BATCH_SIZE', 2):
+            layers = exporter.write_features(ds, filename)
+
+        assert sorted(layers.keys()) == ['linestring', 'point']
+        assert layers['point'].GetFeatureCount() == 5
+        assert layers['linestring'].GetFeatureCount() == 1
+        ids = {layers['point'].GetNextFeature().GetFieldAsString('id')
+               for _ in range(5)}
+        assert ids == {su.id for su in locations}
+        ds.Destroy()
+
+        with open(filename) as csvfile:
+            assert len(list(csv.reader(csvfile))) == 7
+
     def test_write_features_empty(self):
         project = ProjectFactory.create()
         dst_dir = os.path.join(settings.MEDIA_ROOT, 'temp/file4')
@@ -773,6 +881,23 @@ class XLSTest(UserTestCase, TestCase):
         assert worksheet['D3'].value == '2'
         assert worksheet['E3'].value == '2.0'
 
+    def test_write_items_query_count(self):
+        exporter = XLSExporter(self.project)
+        locations = SpatialUnit.objects.filter(project=self.project)
+        exporter.write_items(
+            Workbook().create_sheet(), locations,
+            self.spatial_content_type, self.spatial_attrs)
+
+        SpatialUnitFactory.create_batch(
+            20, project=self.project, geometry='POINT (3 3)',
+            attributes={'key': 'value'})
+        worksheet = Workbook().create_sheet()
+        with self.assertNumQueries(1):
+            exporter.write_items(
+                worksheet, locations, self.spatial_content_type,
+                self.spatial_attrs)
+        assert worksheet.max_row == 23
+
     def test_write_locations(self):
         workbook = Workbook()
         exporter = XLSExporter(self.project)
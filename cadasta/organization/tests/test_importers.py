@@ -1,6 +1,8 @@
+import io
 import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
 
-import pandas as pd
 from core.tests.utils.cases import FileStorageTestCase, UserTestCase
 from core.messages import SANITIZE_ERROR
 from django.contrib.contenttypes.models import ContentType
@@ -8,6 +10,7 @@ from django.contrib.gis.geos import LineString, Point, Polygon
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from jsonattrs.models import Attribute, AttributeType, Schema
+from openpyxl import load_workbook
 from party.models import Party, TenureRelationship
 from party.choices import TENURE_RELATIONSHIP_TYPES
 from questionnaires.models import Questionnaire
@@ -18,6 +21,7 @@ from spatial.choices import TYPE_CHOICES
 
 from ..importers import csv, exceptions, validators, xls
 from ..importers.base import Importer
+from ..importers.mapper import RowMapper
 from ..tests.factories import ProjectFactory
 
 
@@ -103,6 +107,97 @@ class BaseImporterTest(UserTestCase, TestCase):
         assert e.value.message == SANITIZE_ERROR
 
 
+class RowMapperTest(TestCase):
+
+    def _get_attr_map(self):
+        def attribute(name, attr_type, required=False):
+            return (SimpleNamespace(name=name, required=required,
+                                    attr_type=SimpleNamespace(name=attr_type)),
+                    'spatial.spatialunit', 'Location')
+        return {
+            'spatial.spatialunit': {
+                'DEFAULT': {
+                    'count': attribute('count', 'integer'),
+                    'size': attribute('size', 'decimal'),
+                    'tags': attribute('tags', 'select_multiple'),
+                    'notes': attribute('notes', 'text'),
+                },
+                'BU': {
+                    'floors': attribute('floors', 'integer'),
+                }
+            }
+        }
+
+    def test_map_attributes(self):
+        headers = ['location_type', 'count', 'size', 'tags', 'notes',
+                   'floors', 'spatial_unit_id']
+        config = {
+            'type': 'csv',
+            'attributes': [
+                'spatialunit::count', 'spatialunit::size',
+                'spatialunit::tags', 'spatialunit::notes',
+                'spatialunit::floors'
+            ]
+        }
+        mapper = RowMapper(headers, config, self._get_attr_map())
+        assert mapper.spatial_unit_id == 6
+        assert mapper.party_id is None
+
+        row = ['PA', '2.0', 'x', 'a, b', '', '3', 'su1']
+        content_types = {
+            'spatial.spatialunit': {'type': 'PA', 'attributes': {}},
+            'party.party': None
+        }
+        mapper.map_attributes(row, content_types)
+        assert content_types['spatial.spatialunit']['attributes'] == {
+            'count': 2, 'size': 0.0, 'tags': ['a', 'b']
+        }
+        assert mapper.get_spatial_unit_id(row) == 'su1'
+        assert mapper.get_party_id(row) is None
+
+        content_types['spatial.spatialunit'] = {
+            'type': 'BU', 'attributes': {}}
+        mapper.map_attributes(row, content_types)
+        assert content_types['spatial.spatialunit']['attributes'][
+            'floors'] == 3
+
+    def test_map_attributes_skips_unselected(self):
+        headers = ['location_type', 'count', 'size']
+        config = {'type': 'csv', 'attributes': ['spatialunit::count']}
+        mapper = RowMapper(headers, config, {
+            'spatial.spatialunit': {
+                'DEFAULT': self._get_attr_map()[
+                    'spatial.spatialunit']['DEFAULT']
+            }
+        })
+        assert len(mapper.attribute_groups) == 1
+        assert [c[0] for c in mapper.attribute_groups[0][2]] == ['count']
+
+    def test_map_prefixed_attributes(self):
+        headers = ['spatialunit::count', 'tenurerelationship::party_id',
+                   'tenurerelationship::spatial_unit_id']
+        config = {'type': 'xls', 'attributes': ['spatialunit::count']}
+        mapper = RowMapper(headers, config, self._get_attr_map())
+        assert mapper.spatial_unit_id == 2
+        assert mapper.party_id == 1
+        content_types = {
+            'spatial.spatialunit': {'type': 'PA', 'attributes': {}}}
+        mapper.map_attributes(['7', 'pt1', 'su1'], content_types)
+        assert content_types['spatial.spatialunit']['attributes'] == {
+            'count': 7}
+
+    def test_missing_attribute_column(self):
+        headers = ['location_type']
+        config = {'type': 'csv', 'attributes': ['spatialunit::count']}
+        with pytest.raises(ValidationError) as e:
+            RowMapper(headers, config, self._get_attr_map())
+        assert e.value.message == "No 'spatialunit::count' column found."
+
+    def test_get_header_index(self):
+        index = validators.get_header_index(['a', 'b', 'a'])
+        assert index == {'a': 0, 'b': 1}
+
+
 class ImportValidatorTest(TestCase):
 
     def test_validate_invalid_column(self):
@@ -586,6 +681,66 @@ class CSVImportTest(UserTestCase, FileStorageTestCase, TestCase):
             if su.geometry is not None:
                 assert type(su.geometry) is LineString
 
+    def test_import_data_batched(self):
+        importer = csv.CSVImporter(
+            project=self.project, path=self.path + self.valid_csv,
+            batch_size=3)
+        config = {
+            'file': self.path + self.valid_csv,
+            'entity_types': ['PT', 'SU'],
+            'party_name_field': 'name_of_hh',
+            'party_type_field': 'party_type',
+            'location_type_field': 'location_type',
+            'geometry_field': 'location_geometry',
+            'attributes': self.attributes,
+            'project': self.project,
+            'allowed_tenure_types': [t[0] for t in TENURE_RELATIONSHIP_TYPES],
+            'allowed_location_types': [choice[0] for choice in TYPE_CHOICES]
+        }
+        importer.import_data(config)
+        assert Party.objects.all().count() == 10
+        assert SpatialUnit.objects.all().count() == 10
+        assert TenureRelationship.objects.all().count() == 10
+        assert Party.history.filter(history_type='+').count() == 10
+        assert SpatialUnit.history.filter(history_type='+').count() == 10
+        assert TenureRelationship.history.filter(
+            history_type='+').count() == 10
+
+        su = SpatialUnit.objects.get(
+            attributes__contains={'nid_number': '3913647224045'})
+        assert su.type == 'PA'
+        assert len(su.attributes) == 20
+        assert su.attributes['female_member'] == 4
+
+        party = Party.objects.get(
+            attributes__contains={'Mobile_No': '০১৭৭২৫৬০১৯১'})
+        tenure = TenureRelationship.objects.get(party=party)
+        assert tenure.attributes == {
+            'tenure_name': 'Customary', 'tenure_notes': 'a few notes'}
+        assert tenure.spatial_unit.project == self.project
+
+    def test_import_data_batched_reports_line_number(self):
+        importer = csv.CSVImporter(
+            project=self.project, path=self.path + self.valid_csv,
+            batch_size=3)
+        config = {
+            'file': self.path + self.valid_csv,
+            'entity_types': ['PT', 'SU'],
+            'party_name_field': 'name_of_hh',
+            'party_type_field': 'party_type',
+            'location_type_field': 'location_type',
+            'geometry_field': 'location_geometry',
+            'attributes': self.attributes,
+            'project': self.project,
+            'allowed_tenure_types': [t[0] for t in TENURE_RELATIONSHIP_TYPES],
+            'allowed_location_types': ['BU']
+        }
+        with pytest.raises(exceptions.DataImportError) as e:
+            importer.import_data(config)
+        assert e.value.line_num == 2
+        assert Party.objects.all().count() == 0
+        assert SpatialUnit.objects.all().count() == 0
+
     def _run_import_test(self, filename):
         importer = csv.CSVImporter(
             project=self.project, path=self.path + filename)
@@ -839,34 +994,73 @@ class XLSImportTest(UserTestCase, FileStorageTestCase, TestCase):
         party = parties[0]
         assert party.tenure_relationships.all().count() == 3
 
+    def _load_workbook(self, workbook):
+        f = io.BytesIO()
+        workbook.save(f)
+        f.seek(0)
+        return load_workbook(f, read_only=True)
+
+    def test_get_rows(self):
+        workbook = load_workbook(
+            self.path + self.one_to_many_xls, read_only=True)
+        rows = list(xls.get_rows(workbook, ['SU', 'PT']))
+        line_nums = [line_num for line_num, _ in rows]
+        assert line_nums == list(range(1, 18))
+
+        headers = rows[0][1]
+        assert 'spatialunit::id' not in headers
+        assert 'party::id' not in headers
+        assert 'tenurerelationship::spatial_unit_id' in headers
+        assert all(len(row) == len(headers) for _, row in rows)
+
+        party_id = headers.index('tenurerelationship::party_id')
+        party_name = headers.index('party::name')
+        linked = [row for _, row in rows[1:] if row[party_id]]
+        assert len(linked) == 6
+        assert len([row for row in linked
+                    if row[party_name] == 'অাব্দুল জলিল মন্ডল']) == 3
+
+    def test_get_header_map_reads_workbook_once(self):
+        importer = xls.XLSImporter(
+            project=self.project, path=self.path + self.valid_xls)
+        with patch('organization.importers.xls.load_workbook',
+                   wraps=load_workbook) as load:
+            header_map = importer.get_header_map()
+            importer.get_attribute_map('xls', ['SU', 'PT'])
+        assert load.call_count == 1
+        assert 'id' not in header_map['locations']
+        assert 'geometry.ewkt' in header_map['locations']
+
     def test_missing_relationship_tab(self):
-        df = pd.read_excel(self.path + self.valid_xls, sheetname=None)
-        del df['relationships']
+        workbook = load_workbook(self.path + self.valid_xls)
+        del workbook['relationships']
+        workbook = self._load_workbook(workbook)
         entity_types = ['SU', 'PT']
         with pytest.raises(exceptions.DataImportError) as e:
-            xls.get_csv_from_dataframe(df, entity_types)
+            list(xls.get_rows(workbook, entity_types))
         assert e is not None
         assert str(e.value) == (
             "Error importing file: Missing 'relationships' worksheet."
         )
 
     def test_empty_party_data(self):
-        df = pd.read_excel(self.path + self.valid_xls, sheetname=None)
-        empty_parties = pd.DataFrame()
-        df['parties'] = empty_parties
+        workbook = load_workbook(self.path + self.valid_xls)
+        del workbook['parties']
+        workbook.create_sheet('parties')
+        workbook = self._load_workbook(workbook)
         entity_types = ['SU', 'PT']
         with pytest.raises(exceptions.DataImportError) as e:
-            xls.get_csv_from_dataframe(df, entity_types)
+            list(xls.get_rows(workbook, entity_types))
         assert e is not None
         assert str(e.value) == (
             'Error importing file: Empty worksheet.'
         )
 
     def test_invalid_entity_type(self):
-        df = pd.read_excel(self.path + self.valid_xls, sheetname=None)
+        workbook = load_workbook(self.path + self.valid_xls, read_only=True)
         entity_types = ['INVALID']
         with pytest.raises(exceptions.DataImportError) as e:
-            xls.get_csv_from_dataframe(df, entity_types)
+            list(xls.get_rows(workbook, entity_types))
         assert e is not None
         assert str(e.value) == (
             'Error importing file: Unsupported import format.'
@@ -0,0 +1,433 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from core.jobs import run_worker
+from core.tests.utils.cases import FileStorageTestCase, UserTestCase
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from party.choices import TENURE_RELATIONSHIP_TYPES
+from party.models import Party, TenureRelationship
+from questionnaires.models import Questionnaire
+from resources.tests.utils import clear_temp  # noqa
+from resources.utils.io import ensure_dirs
+from search.models import IndexUpdate
+from spatial.choices import TYPE_CHOICES
+from spatial.models import SpatialUnit
+from spatial.tests.factories import SpatialUnitFactory
+
+from ..download.cache import evict_exports, get_data_version, get_export_job
+from ..importers import csv
+from ..jobs import run_export_job, run_import_job
+from ..models import ExportJob, ImportJob
+from .factories import ProjectFactory
+
+
+class BackgroundJobTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+
+    def create_job(self, **kwargs):
+        return ImportJob.objects.create(
+            project=self.project, type='csv', path='/tmp/import.csv',
+            **kwargs)
+
+    def test_claim_next(self):
+        first = self.create_job()
+        self.create_job()
+        job = ImportJob.claim_next()
+        assert job == first
+        assert job.status == ImportJob.RUNNING
+        assert job.started is not None
+        first.refresh_from_db()
+        assert first.status == ImportJob.RUNNING
+
+    def test_claim_is_exclusive(self):
+        job = self.create_job()
+        copy = ImportJob.objects.get(pk=job.pk)
+        assert job.claim() is True
+        assert copy.claim() is False
+        assert ImportJob.claim_next() is None
+
+    def test_claim_stale_job(self):
+        job = self.create_job()
+        job.claim()
+        stale = timezone.now() - timedelta(
+            seconds=ImportJob.STALE_AFTER + 1)
+        ImportJob.objects.filter(pk=job.pk).update(updated=stale)
+        assert ImportJob.claim_next() == job
+
+    def test_is_stale(self):
+        job = self.create_job()
+        assert job.is_stale is False
+        job.updated = timezone.now() - timedelta(
+            seconds=ImportJob.STALE_AFTER + 1)
+        assert job.is_stale is True
+        job.status = ImportJob.RUNNING
+        assert job.is_stale is True
+        job.status = ImportJob.DONE
+        assert job.is_stale is False
+
+    def test_finish(self):
+        job = self.create_job()
+        job.claim()
+        job.finish(ImportJob.FAILED)
+        job.refresh_from_db()
+        assert job.status == ImportJob.FAILED
+        assert job.finished >= job.started
+        assert job.elapsed >= 0
+        assert ImportJob.claim_next() is None
+
+    def test_elapsed_and_rate(self):
+        job = self.create_job(rows_processed=100)
+        assert job.elapsed == 0
+        assert job.rows_per_second == 0
+        job.started = timezone.now() - timedelta(seconds=10)
+        job.finished = job.started + timedelta(seconds=4)
+        assert job.elapsed == 4
+        assert job.rows_per_second == 25
+        assert repr(job) == (
+            '<ImportJob id={} project={} type=csv status=pending>'.format(
+                job.id, self.project.slug))
+
+    def test_run_worker(self):
+        jobs = [self.create_job(), self.create_job()]
+        handled = []
+
+        def handler(job):
+            handled.append(job)
+            if len(handled) == 1:
+                raise RuntimeError('boom')
+            job.finish()
+
+        assert run_worker(ImportJob, handler, once=True) == 2
+        assert handled == jobs
+        failed, done = [ImportJob.objects.get(pk=job.pk) for job in jobs]
+        assert done.status == ImportJob.DONE
+        # the failed job is retried later
+        assert failed.status == ImportJob.PENDING
+        assert failed.attempts == 1
+        assert failed.errors == [{'line': None, 'message': 'boom'}]
+
+    def test_retry(self):
+        job = self.create_job()
+        job.claim()
+        assert job.retry('boom') is True
+        job.refresh_from_db()
+        assert job.status == ImportJob.PENDING
+        assert job.retry_after > timezone.now()
+        assert job.errors == [{'line': None, 'message': 'boom'}]
+        assert ImportJob.claim_next() is None
+
+        ImportJob.objects.filter(pk=job.pk).update(
+            retry_after=timezone.now())
+        assert ImportJob.claim_next() == job
+
+    def test_retry_delay(self):
+        job = self.create_job()
+        job.retry('boom')
+        first_delay = job.retry_after - timezone.now()
+        job.retry('boom')
+        second_delay = job.retry_after - timezone.now()
+        assert first_delay <= timedelta(seconds=ImportJob.RETRY_DELAY)
+        assert second_delay > timedelta(seconds=ImportJob.RETRY_DELAY)
+
+    def test_retry_fails_after_max_attempts(self):
+        job = self.create_job(attempts=ImportJob.MAX_ATTEMPTS - 1)
+        assert job.retry('boom') is False
+        job.refresh_from_db()
+        assert job.status == ImportJob.FAILED
+        assert job.attempts == ImportJob.MAX_ATTEMPTS
+
+
+@pytest.mark.usefixtures('clear_temp')
+@override_settings(IMPORT_BATCH_SIZE=3)
+class RunImportJobTest(UserTestCase, FileStorageTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create(name='Test Import Job')
+        xlscontent = self.get_file(
+            '/organization/tests/files/uttaran_test.xlsx', 'rb')
+        form = self.storage.save('xls-forms/uttaran_test.xlsx',
+                                 xlscontent.read())
+        Questionnaire.objects.create_from_form(
+            xls_form=form,
+            project=self.project
+        )
+
+        fd, self.import_file = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        shutil.copy(self.path + '/organization/tests/files/test.csv',
+                    self.import_file)
+        self.addCleanup(
+            lambda: os.path.exists(self.import_file) and
+            os.remove(self.import_file))
+
+        self.config = {
+            'file': self.import_file,
+            'type': 'csv',
+            'entity_types': ['PT', 'SU'],
+            'party_name_field': 'name_of_hh',
+            'party_type_field': 'party_type',
+            'location_type_field': 'location_type',
+            'geometry_field': 'location_geometry',
+            'attributes': [],
+            'allowed_tenure_types': [t[0] for t in TENURE_RELATIONSHIP_TYPES],
+            'allowed_location_types': [choice[0] for choice in TYPE_CHOICES]
+        }
+
+    def create_job(self, **kwargs):
+        return ImportJob.objects.create(
+            project=self.project, user=self.user, type='csv',
+            path=self.import_file, config=self.config, **kwargs)
+
+    @override_settings(ES_INDEX_UPDATES=True)
+    def test_run_import_job(self):
+        job = self.create_job()
+        job.claim()
+        run_import_job(job)
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.DONE
+        assert job.rows_processed == 10
+        assert job.errors == []
+        assert not job.chunks.exists()
+        assert not os.path.exists(self.import_file)
+
+        assert Party.objects.count() == 10
+        assert SpatialUnit.objects.count() == 10
+        assert TenureRelationship.objects.count() == 10
+        assert Party.history.filter(history_user=self.user).count() == 10
+        assert IndexUpdate.objects.filter(model='party').count() == 10
+
+    def test_checkpoints_hold_changes_only(self):
+        checkpoints = []
+        importer = csv.CSVImporter(
+            project=self.project, path=self.import_file, batch_size=3)
+        config = dict(self.config, project=self.project)
+        importer.import_data(
+            config, on_commit=lambda checkpoint, rows: checkpoints.append(
+                checkpoint))
+
+        assert [c['line_num'] for c in checkpoints] == [4, 7, 10, 11]
+        assert [len(c['locations']) for c in checkpoints] == [3, 3, 3, 1]
+        assert [len(c['created']['party.party'])
+                for c in checkpoints] == [3, 3, 3, 1]
+        assert sorted(pk for c in checkpoints
+                      for pk in c['created']['spatial.spatialunit']) == sorted(
+            SpatialUnit.objects.values_list('pk', flat=True))
+
+    def test_resume_import_job(self):
+        job = self.create_job()
+
+        def on_commit(checkpoint, rows):
+            if job.chunks.count() == 1:
+                raise RuntimeError('worker stopped')
+            job.add_chunk(checkpoint, rows)
+
+        importer = csv.CSVImporter(
+            project=self.project, path=self.import_file, batch_size=3)
+        config = dict(self.config, project=self.project)
+        with pytest.raises(RuntimeError):
+            importer.import_data(config, on_commit=on_commit)
+        assert Party.objects.count() == 3
+        assert job.get_checkpoint()['line_num'] == 4
+
+        job.claim()
+        run_import_job(job)
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.DONE
+        assert job.rows_processed == 10
+        assert Party.objects.count() == 10
+        assert SpatialUnit.objects.count() == 10
+        assert TenureRelationship.objects.count() == 10
+
+    def test_chunked_import_requires_batch_size(self):
+        importer = csv.CSVImporter(
+            project=self.project, path=self.import_file)
+        config = dict(self.config, project=self.project)
+        with pytest.raises(ValueError):
+            importer.import_data(config, on_commit=lambda *args: None)
+
+    def test_run_import_job_with_invalid_data(self):
+        self.config['allowed_location_types'] = ['BU']
+        job = self.create_job()
+        job.claim()
+        run_import_job(job)
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.FAILED
+        assert job.errors[0]['line'] == 2
+        assert 'location_type' in job.errors[0]['message']
+        assert os.path.exists(self.import_file)
+        assert Party.objects.count() == 0
+
+    def test_run_import_job_rolls_back_invalid_data(self):
+        with open(self.import_file, encoding='utf-8') as f:
+            lines = f.readlines()
+        lines[7] = lines[7].replace(',FH,BU,', ',FH,ZZ,', 1)
+        with open(self.import_file, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+
+        job = self.create_job()
+        job.claim()
+        run_import_job(job)
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.FAILED
+        assert job.errors[0]['line'] == 8
+        assert job.rows_processed == 0
+        assert not job.chunks.exists()
+        assert Party.objects.count() == 0
+        assert SpatialUnit.objects.count() == 0
+        assert TenureRelationship.objects.count() == 0
+
+    def test_run_import_job_retries_transient_errors(self):
+        job = self.create_job()
+        add_chunk = ImportJob.add_chunk
+
+        def lose_connection(job, checkpoint, rows):
+            if job.chunks.count() == 2:
+                raise OperationalError('connection lost')
+            add_chunk(job, checkpoint, rows)
+
+        with patch.object(ImportJob, 'add_chunk', lose_connection):
+            run_worker(ImportJob, run_import_job, once=True)
+        job.refresh_from_db()
+        assert job.status == ImportJob.PENDING
+        assert job.attempts == 1
+        assert job.errors == [{'line': None, 'message': 'connection lost'}]
+        assert job.rows_processed == 6
+        assert Party.objects.count() == 6
+
+        ImportJob.objects.filter(pk=job.pk).update(
+            retry_after=timezone.now())
+        run_worker(ImportJob, run_import_job, once=True)
+        job.refresh_from_db()
+        assert job.status == ImportJob.DONE
+        assert job.rows_processed == 10
+        assert Party.objects.count() == 10
+        assert SpatialUnit.objects.count() == 10
+
+    def test_processimports_command(self):
+        job = self.create_job()
+        call_command('processimports', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        assert job.status == ImportJob.DONE
+        assert SpatialUnit.objects.count() == 10
+
+
+@pytest.mark.usefixtures('clear_temp')
+class ExportJobTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        ensure_dirs()
+        self.project = ProjectFactory.create()
+        self.su = SpatialUnitFactory.create(
+            project=self.project, geometry='SRID=4326;POINT (30 10)')
+
+    def test_get_data_version(self):
+        version = get_data_version(self.project)
+        assert version == get_data_version(self.project)
+
+        self.su.type = 'BU'
+        self.su.save()
+        updated = get_data_version(self.project)
+        assert updated != version
+
+        self.su.delete()
+        assert get_data_version(self.project) != updated
+
+    def test_get_export_job(self):
+        job = get_export_job(self.project, 'xls')
+        assert job.status == ExportJob.PENDING
+        assert job.version == get_data_version(self.project)
+        assert get_export_job(self.project, 'xls') == job
+        assert get_export_job(self.project, 'shp') != job
+
+        job.claim()
+        run_export_job(job)
+        assert get_export_job(self.project, 'xls') == job
+
+        os.remove(job.path)
+        fresh = get_export_job(self.project, 'xls')
+        assert fresh != job
+        assert not ExportJob.objects.filter(pk=job.pk).exists()
+
+    def test_get_export_job_skips_stale_jobs(self):
+        job = get_export_job(self.project, 'xls')
+        stale = timezone.now() - timedelta(
+            seconds=ExportJob.STALE_AFTER + 1)
+        ExportJob.objects.filter(pk=job.pk).update(updated=stale)
+        assert get_export_job(self.project, 'xls') != job
+
+        job.claim()
+        ExportJob.objects.filter(pk=job.pk).update(updated=stale)
+        assert get_export_job(self.project, 'xls') != job
+
+    def test_run_export_job(self):
+        job = get_export_job(self.project, 'shp')
+        job.claim()
+        run_export_job(job)
+        job.refresh_from_db()
+        assert job.status == ExportJob.DONE
+        assert job.path.endswith('.zip')
+        assert job.mime_type == 'application/zip'
+        assert job.size == os.path.getsize(job.path)
+        assert not os.path.exists(os.path.splitext(job.path)[0])
+
+    @patch('organization.download.base.PROGRESS_BATCH_SIZE', 1)
+    def test_run_export_job_reports_progress(self):
+        job = get_export_job(self.project, 'xls')
+        job.claim()
+        stale = timezone.now() - timedelta(
+            seconds=ExportJob.STALE_AFTER + 1)
+        ExportJob.objects.filter(pk=job.pk).update(updated=stale)
+        touched = []
+
+        def touch():
+            ExportJob.touch(job)
+            touched.append(ExportJob.objects.get(pk=job.pk).is_stale)
+
+        with patch.object(job, 'touch', touch):
+            run_export_job(job)
+        # one touch per exported location
+        assert touched == [False]
+
+    def test_evict_exports(self):
+        jobs = []
+        for type in ('xls', 'shp'):
+            job = get_export_job(self.project, type)
+            job.claim()
+            run_export_job(job)
+            jobs.append(job)
+        xls, shp = jobs
+        # the xls export is the least recently used one
+        ExportJob.objects.filter(pk=xls.pk).update(
+            updated=timezone.now() - timedelta(hours=1))
+
+        evict_exports(xls.size + shp.size)
+        assert ExportJob.objects.count() == 2
+
+        evict_exports(shp.size)
+        assert not os.path.exists(xls.path)
+        assert os.path.exists(shp.path)
+        assert list(ExportJob.objects.all()) == [shp]
+
+    @override_settings(EXPORT_CACHE_SIZE=0)
+    def test_processexports_command(self):
+        job = get_export_job(self.project, 'xls')
+        call_command('processexports', once=True, stdout=StringIO())
+        assert not ExportJob.objects.filter(pk=job.pk).exists()
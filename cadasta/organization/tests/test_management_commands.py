@@ -0,0 +1,15 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class BenchmarkImportTest(TestCase):
+
+    def test_benchmark_import(self):
+        out = StringIO()
+        call_command('benchmarkimport', columns=8, rows=20, stdout=out)
+        output = out.getvalue()
+        assert 'Compiled 13 columns' in output
+        assert 'Mapped 20 rows' in output
+        assert 'rows/sec' in output
@@ -133,6 +133,24 @@ class ProjectUrlTest(TestCase):
         assert resolved.kwargs['project'] == '123abc'
         assert resolved.kwargs['username'] == 'barbara-@+.'
 
+    def test_project_import(self):
+        actual = reverse(
+            version_ns('organization:project_import'),
+            kwargs={'organization': 'habitat',
+                    'project': '123abc',
+                    'import_job': 'abc123'}
+        )
+        expected = version_url(
+            '/organizations/habitat/projects/123abc/imports/abc123/')
+        assert actual == expected
+
+        resolved = resolve(version_url(
+            '/organizations/habitat/projects/123abc/imports/abc123/'))
+        assert resolved.func.__name__ == api.ProjectImportDetail.__name__
+        assert resolved.kwargs['organization'] == 'habitat'
+        assert resolved.kwargs['project'] == '123abc'
+        assert resolved.kwargs['import_job'] == 'abc123'
+
 
 class UserUrlsTest(TestCase):
     def test_user_list(self):
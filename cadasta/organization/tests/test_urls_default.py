@@ -187,6 +187,20 @@ class ProjectUrlsTest(TestCase):
         assert resolved.kwargs['organization'] == 'org-slug'
         assert resolved.kwargs['project'] == 'prj'
 
+    def test_project_export(self):
+        url = reverse('organization:project-export',
+                      kwargs={'organization': 'org-slug', 'project': 'prj',
+                              'export': 'abc123'})
+        assert (url == '/organizations/org-slug/projects/prj/download/abc123/')
+
+        resolved = resolve(
+            '/organizations/org-slug/projects/prj/download/abc123/')
+        assert (resolved.func.__name__ ==
+                default.ProjectExportDownload.__name__)
+        assert resolved.kwargs['organization'] == 'org-slug'
+        assert resolved.kwargs['project'] == 'prj'
+        assert resolved.kwargs['export'] == 'abc123'
+
 
 class OrganizationMembersUrlsTest(TestCase):
     def test_member_list(self):
@@ -9,7 +9,7 @@ from core.tests.utils.cases import UserTestCase
 from accounts.tests.factories import UserFactory
 from accounts.models import User
 from .factories import OrganizationFactory, ProjectFactory, clause
-from ..models import Project, ProjectRole, OrganizationRole
+from ..models import Project, ProjectRole, OrganizationRole, ImportJob
 from ..views import api
 
 from tutelary.models import Role
@@ -922,3 +922,85 @@ class ProjectDetailAPITest(APITestCase, UserTestCase, TestCase):
         assert response.status_code == 405
         self.project.refresh_from_db()
         assert Project.objects.filter(id=self.project.id).exists()
+
+
+class ProjectImportListAPITest(APITestCase, UserTestCase, TestCase):
+    view_class = api.ProjectImportList
+
+    def setup_models(self):
+        self.user = UserFactory.create()
+        assign_policies(self.user)
+        self.project = ProjectFactory.create()
+        self.pending = ImportJob.objects.create(
+            project=self.project, user=self.user, type='csv',
+            path='/tmp/import.csv')
+        ImportJob.objects.create(
+            project=self.project, user=self.user, type='xls',
+            path='/tmp/import.xlsx', status=ImportJob.DONE)
+        ImportJob.objects.create(
+            project=ProjectFactory.create(), user=self.user, type='csv',
+            path='/tmp/other.csv')
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.project.organization.slug,
+            'project': self.project.slug,
+        }
+
+    def test_list_imports(self):
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.content['count'] == 2
+
+    def test_list_pending_imports(self):
+        response = self.request(user=self.user,
+                                get_data={'status': ImportJob.PENDING})
+        assert response.status_code == 200
+        job, = response.content['results']
+        assert job['id'] == self.pending.id
+        assert job['type'] == 'csv'
+        assert job['attempts'] == 0
+
+    def test_list_imports_with_unauthorized_user(self):
+        response = self.request()
+        assert response.status_code == 403
+
+
+class ProjectImportDetailAPITest(APITestCase, UserTestCase, TestCase):
+    view_class = api.ProjectImportDetail
+
+    def setup_models(self):
+        self.user = UserFactory.create()
+        assign_policies(self.user)
+        self.project = ProjectFactory.create()
+        self.job = ImportJob.objects.create(
+            project=self.project, user=self.user, type='csv',
+            path='/tmp/import.csv', rows_processed=120)
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.project.organization.slug,
+            'project': self.project.slug,
+            'import_job': self.job.id
+        }
+
+    def test_get_import(self):
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.content['id'] == self.job.id
+        assert response.content['status'] == ImportJob.PENDING
+        assert response.content['rows_processed'] == 120
+        assert response.content['rows_per_second'] == 0
+        assert response.content['errors'] == []
+
+    def test_get_import_with_unauthorized_user(self):
+        response = self.request()
+        assert response.status_code == 403
+
+    def test_get_import_from_other_project(self):
+        other = ProjectFactory.create()
+        job = ImportJob.objects.create(
+            project=other, user=self.user, type='csv', path='/tmp/other.csv')
+        response = self.request(user=self.user,
+                                url_kwargs={'import_job': job.id})
+        assert response.status_code == 404
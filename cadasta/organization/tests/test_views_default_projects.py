@@ -1,5 +1,7 @@
 import json
 import os
+from datetime import timedelta
+from unittest.mock import patch
 
 import pytest
 
@@ -15,9 +17,12 @@ from django.core.urlresolvers import reverse
 from django.http import Http404, HttpRequest
 from django.template.loader import render_to_string
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
 from jsonattrs.models import Attribute, Schema
 from skivvy import remove_csrf
-from organization.models import OrganizationRole, Project, ProjectRole
+from organization.models import (OrganizationRole, Project, ProjectRole,
+                                 ExportJob, ImportJob)
 from party.models import Party, TenureRelationship
 from party.tests.factories import PartyFactory
 from questionnaires.models import Questionnaire
@@ -1440,6 +1445,46 @@ class ProjectDataDownloadTest(ViewTestCase, UserTestCase, TestCase):
                 'application/vnd.openxmlformats-officedocument.'
                 'spreadsheetml.sheet')
 
+    def test_post_served_from_cache(self):
+        assign_policies(self.user)
+        response = self.request(user=self.user, method='POST')
+        assert response.status_code == 200
+        job = ExportJob.objects.get(project=self.project)
+        assert job.status == ExportJob.DONE
+
+        response = self.request(user=self.user, method='POST')
+        assert response.status_code == 200
+        assert ExportJob.objects.get(project=self.project) == job
+
+        SpatialUnitFactory.create(project=self.project)
+        response = self.request(user=self.user, method='POST')
+        assert response.status_code == 200
+        assert ExportJob.objects.filter(project=self.project).count() == 2
+
+    @override_settings(EXPORT_ASYNC=True)
+    def test_post_queued(self):
+        assign_policies(self.user)
+        response = self.request(user=self.user, method='POST')
+        job = ExportJob.objects.get(project=self.project)
+        assert job.status == ExportJob.PENDING
+        assert response.status_code == 302
+        assert response.location == (
+            '/organizations/{}/projects/{}/download/{}/'.format(
+                self.project.organization.slug, self.project.slug, job.id))
+
+    def test_post_failed_export(self):
+        assign_policies(self.user)
+        with patch('organization.views.default.run_export_job',
+                   side_effect=OSError('disk full')):
+            response = self.request(user=self.user, method='POST')
+        job = ExportJob.objects.get(project=self.project)
+        assert job.status == ExportJob.FAILED
+        assert job.finished is not None
+        assert response.status_code == 302
+        assert response.location == (
+            '/organizations/{}/projects/{}/download/{}/'.format(
+                self.project.organization.slug, self.project.slug, job.id))
+
     def test_post_with_unauthorized_user(self):
         response = self.request(user=self.user, method='POST')
         assert response.status_code == 302
@@ -1452,6 +1497,83 @@ class ProjectDataDownloadTest(ViewTestCase, UserTestCase, TestCase):
         assert '/account/login/' in response.location
 
 
+class ProjectExportDownloadTest(ViewTestCase, UserTestCase, TestCase):
+    view_class = default.ProjectExportDownload
+    template = 'organization/project_export.html'
+
+    def setup_models(self):
+        ensure_dirs()
+        self.project = ProjectFactory.create()
+        self.user = UserFactory.create()
+        self.job = ExportJob.objects.create(
+            project=self.project, user=self.user, type='xls', version='v1')
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.project.organization.slug,
+            'project': self.project.slug,
+            'export': self.job.id
+        }
+
+    def setup_template_context(self):
+        return {'project': self.project,
+                'object': self.project,
+                'export': self.job,
+                'is_allowed_import': True}
+
+    def test_get_pending_export(self):
+        assign_policies(self.user)
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.content == self.expected_content
+
+    def test_get_finished_export(self):
+        assign_policies(self.user)
+        path = os.path.join(settings.MEDIA_ROOT, 'temp/export.xlsx')
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        self.job.path = path
+        self.job.mime_type = 'application/test'
+        self.job.size = 4
+        self.job.finish(ExportJob.DONE)
+
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert (response.headers['content-disposition'][1] ==
+                'attachment; filename={}.xlsx'.format(self.project.slug))
+        assert response.headers['content-type'][1] == 'application/test'
+        assert response.headers['content-length'][1] == '4'
+
+    def test_get_failed_export(self):
+        assign_policies(self.user)
+        self.job.finish(ExportJob.FAILED)
+        response = self.request(user=self.user)
+        assert response.status_code == 302
+        assert 'The export failed. Please try again.' in response.messages
+
+    def test_get_stale_export(self):
+        assign_policies(self.user)
+        stale = timezone.now() - timedelta(
+            seconds=ExportJob.STALE_AFTER + 1)
+        ExportJob.objects.filter(pk=self.job.pk).update(updated=stale)
+        response = self.request(user=self.user)
+        assert response.status_code == 302
+        assert 'The export failed. Please try again.' in response.messages
+
+    def test_get_export_from_other_project(self):
+        assign_policies(self.user)
+        self.job.project = ProjectFactory.create()
+        self.job.save()
+        with pytest.raises(Http404):
+            self.request(user=self.user)
+
+    def test_get_with_unauthorized_user(self):
+        response = self.request(user=self.user)
+        assert response.status_code == 302
+        assert ("You don't have permission to export data from this project"
+                in response.messages)
+
+
 @pytest.mark.usefixtures('make_dirs')
 @pytest.mark.usefixtures('clear_temp')
 class ProjectDataImportTest(UserTestCase, FileStorageTestCase, TestCase):
@@ -1663,6 +1785,34 @@ class ProjectDataImportTest(UserTestCase, FileStorageTestCase, TestCase):
         assert random_filename.endswith('.csv')
         assert len(random_filename.split('.')[0].strip('/')) == 24
 
+    @override_settings(IMPORT_ASYNC=True)
+    def test_full_flow_queued(self):
+        self.client.force_login(self.user)
+        csvfile = self.get_file(self.valid_csv, 'rb')
+        file = SimpleUploadedFile('test.csv', csvfile.read(), 'text/csv')
+        csvfile.close()
+        post_data = self.SELECT_FILE_POST_DATA.copy()
+        post_data['select_file-file'] = file
+        url = reverse('organization:project-import',
+                      kwargs={'organization': self.org.slug,
+                              'project': self.project.slug})
+        assert self.client.post(url, post_data).status_code == 200
+        assert self.client.post(
+            url, self.MAP_ATTRIBUTES_POST_DATA).status_code == 200
+        response = self.client.post(url, self.SELECT_DEFAULTS_POST_DATA)
+        assert response.status_code == 302
+
+        job = ImportJob.objects.get(project=self.project)
+        self.addCleanup(os.remove, job.path)
+        assert job.status == ImportJob.PENDING
+        assert job.user == self.user
+        assert job.type == 'csv'
+        assert job.config['file'] == job.path
+        assert job.config['party_name_field'] == 'name_of_hh'
+        assert 'project' not in job.config
+        assert os.path.exists(job.path)
+        assert Party.objects.filter(project=self.project).count() == 0
+
     def test_full_flow_valid_custom_types(self):
         questionnaire = q_factories.QuestionnaireFactory.create(
             project=self.project)
@@ -36,4 +36,13 @@ urlpatterns = [
         '(?P<project>[-\w]+)/users/(?P<username>[-@+.\w]+)/$',
         api.ProjectUsersDetail.as_view(),
         name='project_users_detail'),
+    url(
+        r'^(?P<organization>[-\w]+)/projects/(?P<project>[-\w]+)/imports/$',
+        api.ProjectImportList.as_view(),
+        name='project_imports'),
+    url(
+        r'^(?P<organization>[-\w]+)/projects/'
+        '(?P<project>[-\w]+)/imports/(?P<import_job>[-\w]+)/$',
+        api.ProjectImportDetail.as_view(),
+        name='project_import'),
 ]
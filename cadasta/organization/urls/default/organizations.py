@@ -65,6 +65,11 @@ urlpatterns = [
         r'^(?P<organization>[-\w]+)/projects/(?P<project>[-\w]+)/download/$',
         default.ProjectDataDownload.as_view(),
         name='project-download'),
+    url(
+        r'^(?P<organization>[-\w]+)/projects/(?P<project>[-\w]+)/download/'
+        '(?P<export>[-\w]+)/$',
+        default.ProjectExportDownload.as_view(),
+        name='project-export'),
     url(
         r'^(?P<organization>[-\w]+)/projects/(?P<project>[-\w]+)/import/$',
         default.ProjectDataImportWizard.as_view(),
@@ -9,7 +9,7 @@ from core.mixins import update_permissions
 
 from accounts.models import User
 
-from ..models import Organization, OrganizationRole, ProjectRole
+from ..models import Organization, OrganizationRole, ProjectRole, ImportJob
 from .. import serializers
 from . import mixins
 
@@ -290,3 +290,34 @@ class ProjectUsersDetail(APIPermissionRequiredMixin,
         ).delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProjectImportList(APIPermissionRequiredMixin,
+                        mixins.ProjectMixin,
+                        generics.ListAPIView):
+    """Lists the data imports of a project, newest first."""
+
+    serializer_class = serializers.ImportJobSerializer
+    filter_backends = (filters.DjangoFilterBackend,)
+    filter_fields = ('status',)
+    permission_required = 'project.import'
+
+    def get_perms_objects(self):
+        return [self.get_project()]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(project=self.get_project())
+
+
+class ProjectImportDetail(APIPermissionRequiredMixin,
+                          mixins.ProjectMixin,
+                          generics.RetrieveAPIView):
+    serializer_class = serializers.ImportJobSerializer
+    lookup_url_kwarg = 'import_job'
+    permission_required = 'project.import'
+
+    def get_perms_objects(self):
+        return [self.get_project()]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(project=self.get_project())
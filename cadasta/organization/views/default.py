@@ -1,4 +1,4 @@
-import importlib
+import logging
 import os
 from collections import OrderedDict
 
@@ -11,11 +11,12 @@ from core.mixins import (LoginPermissionRequiredMixin, PermissionRequiredMixin,
 from core.util import random_id
 from core.views import mixins as core_mixins
 from django.conf import settings
+from django.contrib import messages
 from django.core.files.storage import DefaultStorage, FileSystemStorage
 from django.core.urlresolvers import reverse
 from django.db import transaction
 from django.db.models import Sum, When, Case, IntegerField
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import ugettext as _
 from questionnaires.exceptions import InvalidQuestionnaire
@@ -29,8 +30,13 @@ from . import mixins
 from ..choices import ROLE_CHOICES
 from .. import messages as error_messages
 from .. import forms
+from ..importers.base import get_importer
+from ..jobs import run_export_job
 from ..importers.exceptions import DataImportError
-from ..models import Organization, OrganizationRole, Project, ProjectRole
+from ..models import (Organization, OrganizationRole, Project, ProjectRole,
+                      ExportJob, ImportJob)
+
+logger = logging.getLogger('organization.exports')
 
 
 class OrganizationList(PermissionRequiredMixin, generic.ListView):
@@ -735,12 +741,59 @@ class ProjectDataDownload(mixins.ProjectMixin,
         self.object = self.get_object()
         form = self.get_form()
         if form.is_valid():
-            path, mime_type = form.get_file()
-            filename, ext = os.path.splitext(path)
-            response = HttpResponse(open(path, 'rb'), content_type=mime_type)
-            response['Content-Disposition'] = ('attachment; filename=' +
-                                               self.object.slug + ext)
-            return response
+            job = form.get_export_job()
+            if (job.status == ExportJob.PENDING and
+                    not settings.EXPORT_ASYNC and job.claim()):
+                try:
+                    run_export_job(job)
+                except Exception:
+                    logger.exception("Export %s failed", job.id)
+                    job.finish(ExportJob.FAILED)
+            if job.status == ExportJob.DONE:
+                return export_response(job)
+            return redirect('organization:project-export',
+                            organization=self.object.organization.slug,
+                            project=self.object.slug,
+                            export=job.id)
+
+
+def export_response(job):
+    filename, ext = os.path.splitext(job.path)
+    response = FileResponse(open(job.path, 'rb'), content_type=job.mime_type)
+    response['Content-Disposition'] = ('attachment; filename=' +
+                                       job.project.slug + ext)
+    response['Content-Length'] = job.size
+    return response
+
+
+class ProjectExportDownload(mixins.ProjectMixin,
+                            LoginPermissionRequiredMixin,
+                            mixins.ProjectAdminCheckMixin,
+                            generic.DetailView):
+    template_name = 'organization/project_export.html'
+    permission_required = 'project.download'
+    permission_denied_message = error_messages.PROJ_DOWNLOAD
+
+    def get_object(self):
+        return self.get_project()
+
+    def get_export(self):
+        return get_object_or_404(ExportJob,
+                                 project=self.get_project(),
+                                 id=self.kwargs['export'])
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        export = self.get_export()
+        if export.status == ExportJob.DONE:
+            return export_response(export)
+        if export.status == ExportJob.FAILED or export.is_stale:
+            messages.error(request, _("The export failed. Please try again."))
+            return redirect('organization:project-download',
+                            organization=self.object.organization.slug,
+                            project=self.object.slug)
+        context = self.get_context_data(object=self.object, export=export)
+        return self.render_to_response(context)
 
 
 DATA_IMPORT_FORMS = [('select_file', forms.SelectImportForm),
@@ -763,6 +816,8 @@ class ProjectDataImportWizard(mixins.ProjectMixin,
     form_list = DATA_IMPORT_FORMS
     file_storage = FileSystemStorage(
         location=os.path.join(settings.MEDIA_ROOT, 'temp'))
+    import_storage = FileSystemStorage(
+        location=os.path.join(settings.MEDIA_ROOT, 'imports'))
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
@@ -918,8 +973,12 @@ class ProjectDataImportWizard(mixins.ProjectMixin,
             'allowed_location_types': allowed_location_types
         }
 
-        importer = self._get_importer(type, path)
-        importer.import_data(config_dict)
+        if settings.IMPORT_ASYNC:
+            self._queue_import(type, file, config_dict)
+        else:
+            importer = self._get_importer(
+                type, path, batch_size=settings.IMPORT_BATCH_SIZE)
+            importer.import_data(config_dict)
 
         if is_resource:
             default_storage = DefaultStorage()
@@ -980,10 +1039,23 @@ class ProjectDataImportWizard(mixins.ProjectMixin,
         self.storage.reset()
         return done_response
 
-    def _get_importer(self, type, path):
-        fqn = settings.IMPORTERS.get(type)
-        parts = fqn.rpartition('.')
-        module = importlib.import_module(parts[0])
-        clazz = parts[-1]
-        importer = getattr(module, clazz)
-        return importer(project=self.get_project(), path=path)
+    def _get_importer(self, type, path, **kwargs):
+        return get_importer(
+            type, project=self.get_project(), path=path, **kwargs)
+
+    def _queue_import(self, type, file, config_dict):
+        # the wizard's temporary files are removed once it completes,
+        # so the upload is kept in a separate location for the worker
+        file.seek(0)
+        path = self.import_storage.path(
+            self.import_storage.save(file.name, file))
+        config = {key: value for key, value in config_dict.items()
+                  if key != 'project'}
+        config['file'] = path
+        job = ImportJob.objects.create(
+            project=self.get_project(), user=self.request.user,
+            type=type, path=path, config=config)
+        messages.info(self.request,
+                      _("Your data is being imported (import {id}). It will "
+                        "appear in the project once the import has "
+                        "finished.").format(id=job.id))
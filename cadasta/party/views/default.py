@@ -7,7 +7,7 @@ from core.mixins import LoginPermissionRequiredMixin, update_permissions
 from organization.views import mixins as organization_mixins
 from resources.forms import AddResourceFromLibraryForm
 from resources.views import mixins as resource_mixins
-from questionnaires.models import Question, QuestionOption
+from questionnaires import labels
 from . import mixins
 from .. import forms
 from .. import messages as error_messages
@@ -27,18 +27,12 @@ class PartiesList(LoginPermissionRequiredMixin,
         project = context['object']
 
         if project.current_questionnaire:
-            try:
-                party_type = Question.objects.get(
-                    name='party_type',
-                    questionnaire_id=project.current_questionnaire)
-                party_opts = QuestionOption.objects.filter(question=party_type)
-                party_opts = dict(party_opts.values_list('name', 'label_xlat'))
-
+            party_type = labels.get_question(project.current_questionnaire,
+                                             'party_type')
+            if party_type:
                 for party in context['object_list']:
                     party.type_labels = template_xlang_labels(
-                        party_opts.get(party.type))
-            except Question.DoesNotExist:
-                pass
+                        party_type['options'].get(party.type))
 
         return context
 
@@ -81,54 +75,27 @@ class PartiesDetail(LoginPermissionRequiredMixin,
         ).select_related('spatial_unit').defer('spatial_unit__attributes')
 
         project = context['object']
-        if project.current_questionnaire:
-            try:
-                name = Question.objects.get(
-                    name='party_name',
-                    questionnaire_id=project.current_questionnaire)
-                context['name_labels'] = template_xlang_labels(name.label_xlat)
-            except Question.DoesNotExist:
-                pass
-
-            try:
-                party_type = Question.objects.get(
-                    name='party_type',
-                    questionnaire_id=project.current_questionnaire)
+        questionnaire_id = project.current_questionnaire
+        if questionnaire_id:
+            name = labels.get_question(questionnaire_id, 'party_name')
+            if name:
+                context['name_labels'] = template_xlang_labels(name['label'])
+
+            party_type = labels.get_question(questionnaire_id, 'party_type')
+            if party_type:
                 context['type_labels'] = template_xlang_labels(
-                    party_type.label_xlat)
-            except Question.DoesNotExist:
-                pass
-            else:
-                try:
-                    option = QuestionOption.objects.get(
-                        question=party_type,
-                        name=context['party'].type)
+                    party_type['label'])
+                option = party_type['options'].get(context['party'].type)
+                if option is not None:
                     context['type_choice_labels'] = template_xlang_labels(
-                        option.label_xlat)
-                except QuestionOption.DoesNotExist:
-                    pass
-
-            try:
-                tenure_type = Question.objects.get(
-                    name='tenure_type',
-                    questionnaire_id=project.current_questionnaire)
-                tenure_opts = QuestionOption.objects.filter(
-                    question=tenure_type)
-                tenure_opts = dict(tenure_opts.values_list(
-                    'name', 'label_xlat'))
-            except Question.DoesNotExist:
-                tenure_opts = None
-
-            try:
-                location_type = Question.objects.get(
-                    name='location_type',
-                    questionnaire_id=project.current_questionnaire)
-                location_opts = QuestionOption.objects.filter(
-                    question=location_type)
-                location_opts = dict(
-                    location_opts.values_list('name', 'label_xlat'))
-            except Question.DoesNotExist:
-                location_opts = None
+                        option)
+
+            tenure_type = labels.get_question(questionnaire_id, 'tenure_type')
+            tenure_opts = tenure_type['options'] if tenure_type else None
+
+            location_type = labels.get_question(questionnaire_id,
+                                                'location_type')
+            location_opts = location_type['options'] if location_type else None
 
             for rel in context['relationships']:
                 if tenure_opts:
@@ -162,16 +129,13 @@ class PartiesEdit(LoginPermissionRequiredMixin,
 
         project = context['object']
         if project.current_questionnaire:
-            try:
-                party_type = Question.objects.get(
-                    name='party_type',
-                    questionnaire_id=project.current_questionnaire)
-                option = QuestionOption.objects.get(question=party_type,
-                                                    name=context['party'].type)
-                context['type_choice_labels'] = template_xlang_labels(
-                    option.label_xlat)
-            except Question.DoesNotExist:
-                pass
+            party_type = labels.get_question(project.current_questionnaire,
+                                             'party_type')
+            if party_type:
+                option = party_type['options'].get(context['party'].type)
+                if option is not None:
+                    context['type_choice_labels'] = template_xlang_labels(
+                        option)
 
         return context
 
@@ -235,23 +199,16 @@ class PartyRelationshipDetail(LoginPermissionRequiredMixin,
 
         project = context['object']
         if project.current_questionnaire:
-            try:
-                tenure_type = Question.objects.get(
-                    name='tenure_type',
-                    questionnaire_id=project.current_questionnaire)
+            tenure_type = labels.get_question(project.current_questionnaire,
+                                              'tenure_type')
+            if tenure_type:
                 context['type_labels'] = template_xlang_labels(
-                    tenure_type.label_xlat)
-            except Question.DoesNotExist:
-                pass
-            else:
-                try:
-                    option = QuestionOption.objects.get(
-                        question=tenure_type,
-                        name=context['relationship'].tenure_type)
+                    tenure_type['label'])
+                option = tenure_type['options'].get(
+                    context['relationship'].tenure_type)
+                if option is not None:
                     context['type_choice_labels'] = template_xlang_labels(
-                        option.label_xlat)
-                except QuestionOption.DoesNotExist:
-                    pass
+                        option)
 
         return context
 
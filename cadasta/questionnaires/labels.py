@@ -0,0 +1,108 @@
+"""Cached labels of questionnaire questions and their options.
+
+Questionnaires never change once they are uploaded; a new upload
+creates a new questionnaire. All questions and options of a
+questionnaire are therefore loaded with a single query, stored in the
+Django cache and kept in a per-process LRU cache, keyed by
+``(questionnaire_id, question_name, language)``. Repeated label lookups,
+e.g. one per listed location, run no queries at all.
+"""
+from collections import OrderedDict
+
+from core.util import LRUCache
+from django.apps import apps
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_CACHE_SIZE = 2048
+
+_local = LRUCache(LOCAL_CACHE_SIZE)
+_missing = object()
+
+
+def _cache_key(questionnaire_id):
+    return 'questionnaires.labels.{}'.format(questionnaire_id)
+
+
+def translate(label_xlat, language, default_language):
+    """Return the label for ``language``, falling back to the default
+    language of the questionnaire."""
+    if isinstance(label_xlat, dict):
+        return label_xlat.get(language, label_xlat.get(default_language))
+    return label_xlat
+
+
+def load_vocabulary(questionnaire_id):
+    """Load the labels of all questions of a questionnaire, with the
+    labels of their options, in one query."""
+    Question = apps.get_model('questionnaires', 'Question')
+    rows = Question.objects.filter(
+        questionnaire_id=questionnaire_id
+    ).order_by('index', 'options__index').values_list(
+        'name', 'label_xlat', 'questionnaire__default_language',
+        'options__name', 'options__label_xlat')
+
+    vocabulary = {'default_language': None, 'questions': {}}
+    for name, label, default_language, option, option_label in rows:
+        vocabulary['default_language'] = default_language
+        question = vocabulary['questions'].setdefault(
+            name, {'label': label, 'options': OrderedDict()})
+        if option is not None:
+            question['options'].setdefault(option, option_label)
+    return vocabulary
+
+
+def get_vocabulary(questionnaire_id):
+    key = _cache_key(questionnaire_id)
+    vocabulary = cache.get(key)
+    if vocabulary is None:
+        vocabulary = load_vocabulary(questionnaire_id)
+        cache.set(key, vocabulary, CACHE_TIMEOUT)
+    return vocabulary
+
+
+def get_question(questionnaire_id, question_name):
+    """Return the untranslated labels of a question as a dict with the
+    question ``label`` and an ordered dict of ``options``, or ``None``
+    if the questionnaire has no such question.
+
+    The returned dicts are shared and must not be modified.
+    """
+    key = (questionnaire_id, question_name, None)
+    question = _local.get(key, _missing)
+    if question is _missing:
+        vocabulary = get_vocabulary(questionnaire_id)
+        question = vocabulary['questions'].get(question_name)
+        if question is not None:
+            question = dict(question,
+                            default_language=vocabulary['default_language'])
+        _local.set(key, question)
+    return question
+
+
+def get_option_labels(questionnaire_id, question_name, language=None):
+    """Return an ordered dict that maps the option names of a question
+    to their labels in ``language`` (the active language by default),
+    or ``None`` if the questionnaire has no such question."""
+    if language is None:
+        language = get_language()
+    key = (questionnaire_id, question_name, language)
+    labels = _local.get(key, _missing)
+    if labels is _missing:
+        question = get_question(questionnaire_id, question_name)
+        if question is None:
+            labels = None
+        else:
+            labels = OrderedDict(
+                (name, translate(label, language,
+                                 question['default_language']))
+                for name, label in question['options'].items())
+        _local.set(key, labels)
+    return labels
+
+
+def invalidate(questionnaire_id):
+    """Discard all cached labels of a questionnaire."""
+    cache.delete(_cache_key(questionnaire_id))
+    _local.delete_matching(lambda key: key[0] == questionnaire_id)
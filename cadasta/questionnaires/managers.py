@@ -13,6 +13,7 @@ from pyxform.errors import PyXFormError
 from pyxform.xls2json import parse_file_to_json
 from core.messages import SANITIZE_ERROR
 from core.validators import sanitize_string
+from . import labels
 from .choices import QUESTION_TYPES, XFORM_GEOM_FIELDS
 from .exceptions import InvalidQuestionnaire
 from .messages import MISSING_RELEVANT, INVALID_ACCURACY
@@ -247,6 +248,7 @@ class QuestionnaireManager(models.Manager):
                     kwargs={'questionnaire': instance}
                 )
                 project.save()
+                labels.invalidate(instance.id)
 
                 # all these errors handled by PyXForm so turning off for now
                 # if errors:
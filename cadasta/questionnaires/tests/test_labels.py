@@ -0,0 +1,95 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.translation import activate
+
+from .. import labels
+from . import factories
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class LabelsTest(TestCase):
+
+    def setUp(self):
+        self.questionnaire = factories.QuestionnaireFactory.create(
+            default_language='en')
+        self.question = factories.QuestionFactory.create(
+            questionnaire=self.questionnaire,
+            name='location_type',
+            type='S1',
+            label={'en': 'Location type', 'de': 'Ortstyp'})
+        factories.QuestionOptionFactory.create(
+            question=self.question, name='HOUSE', index=1,
+            label={'en': 'House', 'de': 'Haus'})
+        factories.QuestionOptionFactory.create(
+            question=self.question, name='FIELD', index=2,
+            label={'en': 'Field'})
+        factories.QuestionFactory.create(
+            questionnaire=self.questionnaire, name='party_name', type='TX')
+
+    def tearDown(self):
+        labels.invalidate(self.questionnaire.id)
+        activate('en')
+
+    def test_translate(self):
+        assert labels.translate('House', 'de', 'en') == 'House'
+        assert labels.translate({'en': 'House', 'de': 'Haus'},
+                                'de', 'en') == 'Haus'
+        assert labels.translate({'en': 'House'}, 'de', 'en') == 'House'
+        assert labels.translate(None, 'de', 'en') is None
+
+    def test_load_vocabulary(self):
+        with self.assertNumQueries(1):
+            vocabulary = labels.load_vocabulary(self.questionnaire.id)
+        assert vocabulary['default_language'] == 'en'
+        location_type = vocabulary['questions']['location_type']
+        assert location_type['label'] == {'en': 'Location type',
+                                          'de': 'Ortstyp'}
+        assert list(location_type['options']) == ['HOUSE', 'FIELD']
+        assert vocabulary['questions']['party_name']['options'] == {}
+
+    def test_get_option_labels(self):
+        with self.assertNumQueries(1):
+            options = labels.get_option_labels(self.questionnaire.id,
+                                               'location_type', 'de')
+            assert list(options.items()) == [('HOUSE', 'Haus'),
+                                             ('FIELD', 'Field')]
+            assert labels.get_option_labels(
+                self.questionnaire.id, 'location_type', 'de') is options
+            activate('en')
+            assert labels.get_option_labels(
+                self.questionnaire.id, 'location_type') == {
+                'HOUSE': 'House', 'FIELD': 'Field'}
+            assert labels.get_question(
+                self.questionnaire.id, 'party_name')['options'] == {}
+
+    def test_get_missing_question(self):
+        with self.assertNumQueries(1):
+            assert labels.get_question(self.questionnaire.id,
+                                       'tenure_type') is None
+            assert labels.get_option_labels(self.questionnaire.id,
+                                            'tenure_type') is None
+
+    def test_invalidate(self):
+        labels.get_option_labels(self.questionnaire.id, 'location_type')
+        factories.QuestionOptionFactory.create(
+            question=self.question, name='SHED', index=3, label='Shed')
+        assert 'SHED' not in labels.get_option_labels(
+            self.questionnaire.id, 'location_type')
+
+        labels.invalidate(self.questionnaire.id)
+        assert 'SHED' in labels.get_option_labels(
+            self.questionnaire.id, 'location_type')
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_shared_cache(self):
+        labels.get_question(self.questionnaire.id, 'location_type')
+        labels._local.clear()
+        with self.assertNumQueries(0):
+            question = labels.get_question(self.questionnaire.id,
+                                           'location_type')
+        assert list(question['options']) == ['HOUSE', 'FIELD']
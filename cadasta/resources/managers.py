@@ -3,9 +3,10 @@ from django.apps import apps
 
 
 class ResourceManager(models.Manager):
-    def create(self, content_object=None, *args, **kwargs):
+    def create(self, content_object=None, local_file=None, *args, **kwargs):
         with transaction.atomic():
             resource = self.model(**kwargs)
+            resource._local_file = local_file
             resource.save()
 
             if content_object:
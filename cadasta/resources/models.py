@@ -1,9 +1,7 @@
 import os
-import tempfile
 
 from datetime import datetime
 
-import magic
 from buckets.fields import S3FileField
 from core.models import ID_FIELD_LENGTH, RandomIDModel
 from django.conf import settings
@@ -82,6 +80,7 @@ class Resource(RandomIDModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._original_url = self.file.url
+        self._local_file = None
 
     def __repr__(self):
         repr_string = ('<Resource id={obj.id} name={obj.name}'
@@ -155,6 +154,18 @@ def archive_file(sender, instance, **kwargs):
         ContentObject.objects.filter(resource=instance).delete()
 
 
+def open_file(instance):
+    """Returns the file of a resource, rewound. A resource created from an
+    upload keeps the uploaded file in ``_local_file``, so that its
+    thumbnail and GPX layers are made without downloading the file from
+    storage again."""
+    file = instance._local_file
+    if file is None:
+        file = instance.file.open()
+    file.seek(0)
+    return file
+
+
 def create_thumbnails(instance, created):
     if created or instance._original_url != instance.file.url:
         if 'image' in instance.mime_type and 'svg' not in instance.mime_type:
@@ -168,39 +179,35 @@ def create_thumbnails(instance, created):
 
             size = 128, 128
 
-            file = instance.file.open()
-            thumb = thumbnail.make(file, size)
+            thumb = thumbnail.make(open_file(instance), size)
             thumb.save(write_path)
             if instance.file.field.upload_to:
                 name = instance.file.field.upload_to + '/' + name
-            instance.file.storage.save(name + '-128x128.' + ext,
-                                       open(write_path, 'rb').read())
+            with open(write_path, 'rb') as f:
+                instance.file.storage.save(name + '-128x128.' + ext, f.read())
 
 
 @receiver(models.signals.post_save, sender=Resource)
 def create_spatial_resource(sender, instance, created, **kwargs):
     if created or instance._original_url != instance.file.url:
         if instance.mime_type in GPX_MIME_TYPES:
-            temp = io.ensure_dirs()
-            with tempfile.NamedTemporaryFile(mode='wb', dir=temp) as f:
-                f.write(instance.file.open().read())
-                f.seek(0)
-                # need to double check the mime-type here as browser detection
-                # of gpx mime type is not reliable
-                mime_type = magic.from_file(f.name, mime=True)
-                if mime_type in GPX_MIME_TYPES:
-                    processor = GPXProcessor(f.name)
-                    layers = processor.get_layers()
-                    for layer in layers.keys():
-                        if len(layers[layer]) > 0:
-                            SpatialResource.objects.create(
-                                resource=instance, name=layer,
-                                geom=layers[layer])
-                else:
-                    raise InvalidGPXFile(
-                        _("Invalid GPX mime type: {error}".format(
-                            error=mime_type))
-                    )
+            file = open_file(instance)
+            # need to double check the mime-type here as browser detection
+            # of gpx mime type is not reliable
+            mime_type = io.sniff_mime_type(file)
+            if mime_type in GPX_MIME_TYPES:
+                processor = GPXProcessor(file)
+                layers = processor.get_layers()
+                for layer in layers.keys():
+                    if len(layers[layer]) > 0:
+                        SpatialResource.objects.create(
+                            resource=instance, name=layer,
+                            geom=layers[layer])
+            else:
+                raise InvalidGPXFile(
+                    _("Invalid GPX mime type: {error}".format(
+                        error=mime_type))
+                )
 
 
 class ContentObject(RandomIDModel):
@@ -1,3 +1,5 @@
+import io
+
 from django.contrib.gis.geos import (GeometryCollection, LineString,
                                      MultiLineString, MultiPoint, Point)
 from django.utils.translation import ugettext as _
@@ -21,12 +23,19 @@ class GPXParser(parser.GPXParser):
 class GPXProcessor:
 
     def __init__(self, gpx_file):
-        with open(gpx_file, 'r') as f:
-            try:
-                parser = GPXParser(f)
-                self.gpx = parser.parse(f)
-            except gpx.GPXException as e:
-                raise InvalidGPXFile(_("Invalid GPX file: %s" % str(e)))
+        """``gpx_file`` is the path of a GPX file or an open binary file."""
+        if isinstance(gpx_file, str):
+            with open(gpx_file, 'r') as f:
+                self.gpx = self._parse(f)
+        else:
+            self.gpx = self._parse(io.StringIO(gpx_file.read().decode()))
+
+    def _parse(self, f):
+        try:
+            parser = GPXParser(f)
+            return parser.parse(f)
+        except gpx.GPXException as e:
+            raise InvalidGPXFile(_("Invalid GPX file: %s" % str(e)))
 
     def get_layers(self):
         layers = {}
@@ -72,3 +72,10 @@ class GPXProcessorTest(TestCase):
         g = GPXProcessor(file_path)
         layers = g.get_layers()
         assert len(layers.keys()) == 2
+
+    def test_open_file(self):
+        file_path = path + '/resources/tests/files/waypoints.gpx'
+        with open(file_path, 'rb') as f:
+            g = GPXProcessor(f)
+        layers = g.get_layers()
+        assert len(layers['waypoints'][0]) == 16
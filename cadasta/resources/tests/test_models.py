@@ -241,6 +241,25 @@ class ResourceTest(UserTestCase, FileStorageTestCase, TestCase):
         assert spatial_resources[0].name == 'waypoints'
         assert spatial_resources[0].attributes == {}
 
+    def test_create_spatial_resource_from_local_file(self):
+        # The local file is read, the file in storage does not exist
+        with self.get_file('/resources/tests/files/deramola.xml', 'rb') as f:
+            resource = ResourceFactory.create(
+                file='/media/s3/uploads/resources/missing.xml',
+                mime_type='text/xml', local_file=f)
+        spatial_resources = resource.spatial_resources.all()
+        assert spatial_resources.count() == 1
+        assert len(spatial_resources[0].geom[0]) == 18
+
+    def test_create_thumbnail_from_local_file(self):
+        with self.get_file('/resources/tests/files/image.jpg', 'rb') as f:
+            ResourceFactory.create(
+                file='/media/s3/uploads/resources/local.jpg',
+                mime_type='image/jpeg', local_file=f)
+        assert os.path.isfile(os.path.join(
+            settings.MEDIA_ROOT, 's3/uploads/resources/local-128x128.jpg')
+        )
+
     def test_invalid_gpx_mime_type(self):
         file = self.get_file('/resources/tests/files/mp3.xml', 'rb')
         file_name = self.storage.save('resources/mp3.xml', file.read())
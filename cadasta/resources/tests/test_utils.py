@@ -1,8 +1,13 @@
 import os
+import tempfile
+from io import BytesIO
+
 from PIL import Image
+from buckets.test.storage import FakeS3Storage
+from django.core.files.storage import FileSystemStorage
 from django.test import TestCase
 from django.conf import settings
-from ..utils import thumbnail
+from ..utils import io, thumbnail
 
 path = os.path.dirname(settings.BASE_DIR)
 
@@ -35,3 +40,28 @@ class ThumbnailTest(TestCase):
         thumb = thumbnail.make(image, (100, 100))
         assert thumb.size[0] == 100
         assert thumb.size[1] == 100
+
+
+class IOTest(TestCase):
+    def test_sniff_mime_type(self):
+        with open(path + '/resources/tests/files/image.jpg', 'rb') as f:
+            f.read(10)
+            assert io.sniff_mime_type(f) == 'image/jpeg'
+            assert f.tell() == 0
+
+        with open(path + '/resources/tests/files/mp3.xml', 'rb') as f:
+            assert io.sniff_mime_type(f) == 'audio/mpeg'
+
+    def test_save_file(self):
+        file = BytesIO(b'content')
+        file.read()
+        with tempfile.TemporaryDirectory() as dir:
+            name = io.save_file(FileSystemStorage(location=dir),
+                                'resources/file.txt', file)
+            with open(os.path.join(dir, name), 'rb') as f:
+                assert f.read() == b'content'
+
+    def test_save_file_to_fake_storage(self):
+        url = io.save_file(FakeS3Storage(), 'resources/file.txt',
+                           BytesIO(b'content'))
+        assert url == '/media/s3/uploads/resources/file.txt'
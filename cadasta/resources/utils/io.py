@@ -1,5 +1,11 @@
 import os
+
+import magic
 from django.conf import settings
+from django.core.files.storage import Storage
+
+# Number of bytes read from the start of a file to detect its type
+MIME_SNIFF_SIZE = 8192
 
 
 def ensure_dirs():
@@ -7,3 +13,24 @@ def ensure_dirs():
     if not os.path.exists(path):
         os.makedirs(path)
     return path
+
+
+def sniff_mime_type(file):
+    """Detects the MIME type of an open binary file from its first bytes
+    and rewinds the file."""
+    file.seek(0)
+    head = file.read(MIME_SNIFF_SIZE)
+    file.seek(0)
+    return magic.from_buffer(head, mime=True)
+
+
+def save_file(storage, name, file):
+    """Saves an open file to ``storage`` and returns its URL.
+
+    Storages implementing Django's storage API, like the S3 storage, read
+    the file from its handle while uploading it. The fake S3 storage used
+    in development and tests only writes bytes."""
+    file.seek(0)
+    if isinstance(storage, Storage):
+        return storage.save(name, file)
+    return storage.save(name, file.read())
@@ -30,9 +30,12 @@ def crop(img):
 
 
 def make(img, size):
-    im = fix_orientation(Image.open(img))
-    copy = im.copy()
-    cropped_img = crop(copy)
+    im = Image.open(img)
+    # JPEGs are decoded at the smallest scale that still covers the
+    # thumbnail, rather than at the full size of the photo.
+    im.draft(im.mode, size)
+    im = fix_orientation(im)
+    cropped_img = crop(im)
     cropped_img.thumbnail(size, Image.ANTIALIAS)
     return cropped_img
 
@@ -0,0 +1,219 @@
+"""Search backends.
+
+The search view asks the backends listed in ``SEARCH_BACKENDS`` for
+results in order and uses the first one that answers, so a PostgreSQL
+backend can stand in while Elasticsearch is unavailable, or replace
+it in deployments that do not run Elasticsearch.
+
+Backends return results in the shape of an ES ``_search`` response:
+``{'hits': {'total': ..., 'hits': [{'_type': ..., '_source': ...}]}}``
+with the documents of ``search.documents`` as sources.
+"""
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from party.models import Party, TenureRelationship
+from resources.models import Resource
+from spatial.models import SpatialUnit
+from .client import get_client
+from .documents import get_document
+from .exceptions import ESUnavailable
+from .indexing import get_entities
+from .parser import is_phrase, parse_query, split_terms, tokenize
+
+
+def get_backends():
+    return [import_string(path)() for path in settings.SEARCH_BACKENDS]
+
+
+class SearchBackend:
+    """Interface of search backends."""
+
+    # Whether pages of results can be cached until the index timestamp
+    # or the index version of the project changes
+    cache_results = False
+
+    def search(self, project_id, query, start_idx, page_size):
+        """Returns a page of the results of the UI query string ``query``
+        in a project, or ``None`` if the backend is unavailable."""
+        raise NotImplementedError
+
+    def get_timestamp(self, project_id):
+        """Returns the time the search index of a project was built, or
+        ``None`` if it is not known."""
+        return None
+
+
+class ElasticsearchBackend(SearchBackend):
+
+    cache_results = True
+
+    def search(self, project_id, query, start_idx, page_size):
+        body = {
+            'query': parse_query(query),
+            'from': start_idx,
+            'size': page_size,
+            'sort': {'_score': {'order': 'desc'}},
+        }
+        try:
+            r = get_client().post(
+                'project-{}/spatial,party,resource/_search/'.format(
+                    project_id),
+                data=json.dumps(body, sort_keys=True),
+                headers={'content-type': 'application/json'},
+            )
+        except ESUnavailable:
+            return None
+        if r.status_code == 200:
+            return r.json()
+        else:
+            return None
+
+    def get_timestamp(self, project_id):
+        try:
+            r = get_client().get(
+                'project-{}/project/_search/?q=*'.format(project_id))
+        except ESUnavailable:
+            return None
+        if r.status_code == 200:
+            return r.json()['hits']['hits'][0]['_source'].get('@timestamp')
+        else:
+            return None
+
+
+# The columns that make up the search document of each model. The
+# document expressions built from them must stay identical to the
+# expressions of the indexes in migration 0002, or the indexes are not
+# used.
+DOCUMENT_COLUMNS = (
+    (SpatialUnit, ('type', 'attributes')),
+    (Party, ('name', 'type', 'attributes')),
+    (TenureRelationship, ('tenure_type', 'attributes')),
+    (Resource, ('name', 'description', 'original_file', 'mime_type')),
+)
+
+
+def column_text(column):
+    """Returns the text of a column in a search document. Only the values
+    of JSON attributes are searched, see ``search_attribute_values`` in
+    migration 0002."""
+    quoted = connection.ops.quote_name(column)
+    if column == 'attributes':
+        return 'search_attribute_values({})'.format(quoted)
+    return "coalesce({}::text, '')".format(quoted)
+
+
+def document_text(columns):
+    return '({})'.format(" || ' ' || ".join(
+        column_text(column) for column in columns))
+
+
+def escape_like(value):
+    return '%{}%'.format(
+        value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+
+
+class PostgresBackend(SearchBackend):
+    """Searches the database with PostgreSQL full-text search.
+
+    Queries mean the same as for Elasticsearch: a document must match
+    all ``+`` terms and none of the ``-`` terms and, if there are no
+    ``+`` terms, at least one of the other terms. Terms match words of
+    the document, phrases match consecutive text. Where ES also finds
+    misspelled terms, this backend finds terms inside longer words.
+    """
+
+    def search(self, project_id, query, start_idx, page_size):
+        must, must_not, should = split_terms(tokenize(query))
+        window = start_idx + page_size
+
+        total = 0
+        ranked = []
+        for order, (model, columns) in enumerate(DOCUMENT_COLUMNS):
+            matches = self.get_matches(
+                model, columns, project_id, must, must_not, should)
+            total += matches.count()
+            ranks = self.rank(matches, columns, must + should)
+            ranked.extend(
+                (-rank, order, pk, model._meta.model_name)
+                for pk, rank in ranks.values_list('id', 'rank')[:window])
+        ranked.sort()
+
+        keys = [(model_name, pk)
+                for _, _, pk, model_name in ranked[start_idx:window]]
+        entities = get_entities(keys)
+        timestamp = timezone.now().isoformat()
+        hits = []
+        for key in keys:
+            entity = entities.get(key)
+            if entity is not None:
+                es_type, source = get_document(entity, timestamp)
+                hits.append({'_type': es_type, '_id': key[1],
+                             '_source': source})
+        return {'hits': {'total': total, 'hits': hits}}
+
+    def get_matches(self, model, columns, project_id, must, must_not,
+                    should):
+        """Returns the entities of ``model`` in a project that match the
+        query terms."""
+        text = document_text(columns)
+        vector = "to_tsvector('simple', {})".format(text)
+
+        where = []
+        params = []
+        for term in must:
+            sql, term_params = self.match(vector, text, term)
+            where.append(sql)
+            params.extend(term_params)
+        for term in must_not:
+            sql, term_params = self.match(vector, text, term)
+            where.append('NOT {}'.format(sql))
+            params.extend(term_params)
+        if should and not must:
+            clauses = [self.match(vector, text, term, fuzzy=True)
+                       for term in should]
+            where.append('({})'.format(' OR '.join(c[0] for c in clauses)))
+            params.extend(p for c in clauses for p in c[1])
+
+        queryset = model.objects.filter(project_id=project_id)
+        if model is Resource:
+            queryset = queryset.filter(archived=False)
+        if where:
+            queryset = queryset.extra(where=where, params=params)
+        return queryset
+
+    def rank(self, queryset, columns, terms):
+        """Orders ``queryset`` by how well its documents match ``terms``,
+        best first, and adds the ``rank`` of the entities."""
+        terms = [term[1:-1] if is_phrase(term) else term for term in terms]
+        if terms:
+            rank = "ts_rank(to_tsvector('simple', {}), {})".format(
+                document_text(columns),
+                ' || '.join(["plainto_tsquery('simple', %s)"] * len(terms)))
+        else:
+            rank = '0'
+        return queryset.extra(
+            select={'rank': rank}, select_params=terms
+        ).order_by('-rank', 'id')
+
+    def match(self, vector, text, term, fuzzy=False):
+        """Returns the SQL condition of a document matching ``term`` and
+        its parameters. Phrases are looked up in the full-text index
+        and then checked for in the text; fuzzy terms of more than one
+        character also match parts of words, through the trigram
+        index."""
+        if is_phrase(term):
+            phrase = term[1:-1]
+            return ("({} @@ plainto_tsquery('simple', %s)"
+                    " AND {} ILIKE %s)".format(vector, text),
+                    [phrase, escape_like(phrase)])
+        if fuzzy and len(term) > 1:
+            return ("({} @@ plainto_tsquery('simple', %s)"
+                    " OR {} ILIKE %s)".format(vector, text),
+                    [term, escape_like(term)])
+        return ("{} @@ plainto_tsquery('simple', %s)".format(vector),
+                [term])
@@ -0,0 +1,289 @@
+"""A small Elasticsearch HTTP client shared by the search views.
+
+Requests go through one pooled, keep-alive ``requests.Session`` per
+process. Connection errors and 5xx responses are retried with
+exponential backoff; a request that timed out while waiting for the
+response is not, since Elasticsearch may still be processing it.
+Repeated failures open a circuit breaker: while it is open, requests
+fail immediately with ``ESUnavailable`` instead of waiting for a
+timeout, until a single trial request after ``reset_timeout`` seconds
+shows that Elasticsearch has recovered. The request and latency
+counts of the client are logged every ``metrics_interval`` seconds.
+"""
+import json
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from .exceptions import ESUnavailable
+
+logger = logging.getLogger('search')
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of a remote service.
+
+    The breaker opens after ``failure_threshold`` consecutive failures.
+    Once ``reset_timeout`` seconds have passed, one caller is let
+    through to probe the service (half-open); its outcome closes the
+    breaker again or restarts the timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if (self.state == self.OPEN and
+                    self.clock() - self.opened_at >= self.reset_timeout):
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.reset()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class LatencyMetrics:
+    """Counts requests to Elasticsearch and how long they took."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = None
+
+    def record(self, elapsed, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            self.last_time = elapsed
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'total_time': self.total_time,
+                'mean_time': (self.total_time / self.requests
+                              if self.requests else 0.0),
+                'max_time': self.max_time,
+                'last_time': self.last_time,
+            }
+
+
+class ESClient:
+    """Sends requests to the Elasticsearch server at ``base_url``."""
+
+    def __init__(self, base_url, connect_timeout=3.05, read_timeout=10,
+                 max_retries=2, backoff=0.1, pool_size=10,
+                 failure_threshold=5, reset_timeout=30,
+                 metrics_interval=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = LatencyMetrics()
+        self.metrics_interval = metrics_interval
+        self._metrics_lock = threading.Lock()
+        self._metrics_logged_at = time.monotonic()
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def reset(self):
+        """Close the circuit breaker and clear the metrics."""
+        self.breaker.reset()
+        self.metrics.reset()
+
+    def log_metrics(self):
+        """Log the metrics if ``metrics_interval`` seconds have passed
+        since they were last logged."""
+        if not self.metrics_interval:
+            return
+        now = time.monotonic()
+        with self._metrics_lock:
+            if now - self._metrics_logged_at < self.metrics_interval:
+                return
+            self._metrics_logged_at = now
+        logger.info("Elasticsearch client metrics: %s",
+                    json.dumps(self.metrics.as_dict(), sort_keys=True))
+
+    def url(self, path):
+        return '{}/{}'.format(self.base_url, path.lstrip('/'))
+
+    def request(self, method, path, **kwargs):
+        """Send a request to Elasticsearch and return the response.
+
+        Raises ``ESUnavailable`` if the circuit breaker is open or if
+        the request still fails after all retries. Only connection
+        errors and 5xx responses are retried. Responses with a 4xx
+        status are returned to the caller.
+        """
+        self.log_metrics()
+        if not self.breaker.allow_request():
+            self.metrics.record_rejected()
+            raise ESUnavailable("Elasticsearch circuit breaker is open")
+
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self._send(method, self.url(path), **kwargs)
+        except BaseException:
+            # every outcome has to reach the breaker, or an unexpected
+            # error in a half-open trial request would keep it half-open
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def _send(self, method, url, **kwargs):
+        """Send a request with retries and raise ``ESUnavailable`` if it
+        still fails."""
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                response = None
+                error = e
+            else:
+                error = None
+            failed = response is None or response.status_code >= 500
+            self.metrics.record(time.monotonic() - start, failed=failed)
+
+            if not failed:
+                return response
+            retriable = (error is None or isinstance(
+                error, requests.exceptions.ConnectionError))
+            if not retriable or attempt >= self.max_retries:
+                break
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+        if error is not None:
+            raise ESUnavailable(str(error)) from error
+        raise ESUnavailable("Elasticsearch responded with status {}".format(
+            response.status_code))
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def scroll(self, path, body, keep_alive='1m'):
+        """Runs the search ``body`` against ``path`` with the scroll API
+        and yields its hits one batch (of ``body['size']`` hits) at a
+        time, so any number of results can be read with bounded memory.
+
+        Raises ``ESUnavailable`` if a request fails or Elasticsearch
+        does not return a result. The scroll context is cleared when
+        the generator finishes or is closed.
+        """
+        headers = {'content-type': 'application/json'}
+        response = self.post(path, params={'scroll': keep_alive},
+                             data=json.dumps(body, sort_keys=True),
+                             headers=headers)
+        scroll_id = None
+        try:
+            while True:
+                if response.status_code != 200:
+                    raise ESUnavailable(
+                        "Elasticsearch responded with status {}".format(
+                            response.status_code))
+                result = response.json()
+                scroll_id = result.get('_scroll_id')
+                hits = result['hits']['hits']
+                if hits:
+                    yield hits
+                if not hits or not scroll_id:
+                    break
+                response = self.post(
+                    '_search/scroll',
+                    data=json.dumps({'scroll': keep_alive,
+                                     'scroll_id': scroll_id}),
+                    headers=headers)
+        finally:
+            if scroll_id:
+                try:
+                    self.delete('_search/scroll',
+                                data=json.dumps({'scroll_id': [scroll_id]}),
+                                headers=headers)
+                except ESUnavailable:
+                    pass
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the Elasticsearch client of this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ESClient(
+                    '{}://{}:{}'.format(settings.ES_SCHEME, settings.ES_HOST,
+                                        settings.ES_PORT),
+                    connect_timeout=settings.ES_CONNECT_TIMEOUT,
+                    read_timeout=settings.ES_READ_TIMEOUT,
+                    max_retries=settings.ES_MAX_RETRIES,
+                    backoff=settings.ES_RETRY_BACKOFF,
+                    pool_size=settings.ES_POOL_SIZE,
+                    failure_threshold=settings.ES_CIRCUIT_FAILURES,
+                    reset_timeout=settings.ES_CIRCUIT_RESET_TIMEOUT,
+                    metrics_interval=settings.ES_METRICS_INTERVAL,
+                )
+    return _client
@@ -0,0 +1,86 @@
+"""Search documents of project entities.
+
+Every location, party, tenure relationship and resource of a project
+is stored as one document in the ``project-<id>`` index. Tenure
+relationships are indexed as ``party`` documents that carry the party
+fields plus the ``tenure_*`` fields of the relationship.
+"""
+import json
+
+from party.models import Party, TenureRelationship
+from resources.models import Resource
+from spatial.models import SpatialUnit
+
+
+def jsonb(attributes):
+    return {
+        'type': 'jsonb',
+        'value': json.dumps(dict(attributes), sort_keys=True),
+    }
+
+
+def get_document(entity, timestamp):
+    """Returns the ES type and the source of the search document of a
+    project entity, or ``None`` for entities that are not indexed."""
+
+    if type(entity) is SpatialUnit:
+        if entity.geometry is None:
+            geometry = None
+        else:
+            geometry = {
+                'type': 'geometry',
+                'value': ''.join(
+                    ['{:02X}'.format(x) for x in entity.geometry.ewkb]
+                ),
+            }
+        return 'spatial', {
+            'id': entity.id,
+            'type': entity.type,
+            'geometry': geometry,
+            'attributes': jsonb(entity.attributes),
+            '@timestamp': timestamp,
+        }
+
+    if type(entity) is Party:
+        return 'party', {
+            'id': entity.id,
+            'name': entity.name,
+            'type': entity.type,
+            'attributes': jsonb(entity.attributes),
+            'tenure_id': None,
+            'tenure_attributes': None,
+            'tenure_partyid': None,
+            'spatial_unit_id': None,
+            'tenure_type': None,
+            '@timestamp': timestamp,
+        }
+
+    if type(entity) is TenureRelationship:
+        return 'party', {
+            'id': entity.party.id,
+            'name': entity.party.name,
+            'type': entity.party.type,
+            'attributes': jsonb(entity.party.attributes),
+            'tenure_id': entity.id,
+            'tenure_attributes': jsonb(entity.attributes),
+            'tenure_partyid': entity.party.id,
+            'spatial_unit_id': entity.spatial_unit.id,
+            'tenure_type': entity.tenure_type,
+            '@timestamp': timestamp,
+        }
+
+    if type(entity) is Resource:
+        return 'resource', {
+            'id': entity.id,
+            'name': entity.name,
+            'description': entity.description,
+            'file': entity.file.url,
+            'original_file': entity.original_file,
+            'mime_type': entity.mime_type,
+            'archived': entity.archived,
+            'last_updated': entity.last_updated.isoformat(),
+            'contributor_id': entity.contributor.id,
+            '@timestamp': timestamp,
+        }
+
+    return None
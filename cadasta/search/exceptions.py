@@ -3,3 +3,7 @@ class NotWgs84EwkbValueError(Exception):
     def __init__(self, value):
         super().__init__("Provided value is not a PostGIS hex EWKB value "
                          "in WGS84 datum: " + value)
+
+
+class ESUnavailable(Exception):
+    """Raised when Elasticsearch cannot be reached or keeps failing."""
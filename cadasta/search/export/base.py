@@ -6,7 +6,28 @@ from django.contrib.contenttypes.models import ContentType
 from core.mixins import SchemaSelectorMixin
 from party.models import TENURE_RELATIONSHIP_TYPES
 from core.form_mixins import get_types
-from .utils import convert_postgis_ewkb_to_ewkt
+from .utils import convert_postgis_ewkb_to_wkb, convert_wkb_to_ewkt
+
+
+def read_es_dump(es_dump_path):
+    """Yields the ``(es_type, source)`` pairs of an ES bulk dump file,
+    which holds an action line followed by a source line per entity."""
+    with open(es_dump_path, encoding='utf-8') as f:
+        while True:
+            type_line = f.readline()
+            source_line = f.readline()
+            if not type_line:
+                break
+            yield (json.loads(type_line)['index']['_type'],
+                   json.loads(source_line))
+
+
+def iter_hits(batches):
+    """Yields the ``(es_type, source)`` pairs of batches of ES search
+    hits, as returned by ``ESClient.scroll``."""
+    for hits in batches:
+        for hit in hits:
+            yield hit['_type'], hit['_source']
 
 
 class Exporter(SchemaSelectorMixin):
@@ -83,11 +104,15 @@ class Exporter(SchemaSelectorMixin):
         return attr_values
 
     def process_entity(self, es_type_line, es_source_line, write_callback):
-        # Extract ES type and source and skip if not loc/party/rel
+        # Extract ES type and source
         es_type = json.loads(es_type_line)['index']['_type']
+        source = json.loads(es_source_line)
+        self.process_hit(es_type, source, write_callback)
+
+    def process_hit(self, es_type, source, write_callback):
+        # Skip if not loc/party/rel
         if es_type not in ('spatial', 'party'):
             return
-        source = json.loads(es_source_line)
 
         # Get corresponding metadatum
         if es_type == 'spatial':
@@ -101,15 +126,16 @@ class Exporter(SchemaSelectorMixin):
         # Reformat data to match model_attrs
         source['attributes'] = json.loads(source['attributes']['value'])
         if metadatum['model_name'] == 'SpatialUnit':
+            # Geometries are passed on as WKB; EWKT is only created for
+            # exporters that write it as a column
             if source['geometry'] is None:
-                ewkt = ''
-                wkt = ''
+                wkb = None
             else:
-                ewkt = convert_postgis_ewkb_to_ewkt(
-                    source['geometry']['value'])
-                wkt = ewkt[10:]  # Remove SRID
-            source['geometry.ewkt'] = ewkt
-            source['geometry.wkt'] = wkt
+                wkb = convert_postgis_ewkb_to_wkb(source['geometry']['value'])
+            source['geometry.wkb'] = wkb
+            if 'geometry.ewkt' in metadatum['model_attrs']:
+                source['geometry.ewkt'] = (
+                    convert_wkb_to_ewkt(wkb) if wkb is not None else '')
         elif metadatum['model_name'] == 'TenureRelationship':
             source['id'] = source['tenure_id']
             source['party_id'] = source['tenure_partyid']
@@ -5,7 +5,7 @@ from zipfile import ZipFile
 from osgeo import ogr, osr
 from django.template.loader import render_to_string
 
-from .base import Exporter
+from .base import Exporter, read_es_dump
 
 MIME_TYPE = 'application/zip'
 shp_types = {
@@ -24,7 +24,10 @@ class ShapeExporter(Exporter):
         self.is_standalone = is_standalone
         super().__init__(project)
 
-    def make_download(self, es_dump_path):
+    def make_download(self, es_dump_path, hits=None):
+        """Writes the entities of the ES dump file, or the
+        ``(es_type, source)`` pairs of ``hits`` if given, to CSV and
+        shape files next to ``es_dump_path``."""
         base_path = os.path.splitext(es_dump_path)[0]
 
         # CSV files do not need the EWKT geometry
@@ -34,15 +37,10 @@ class ShapeExporter(Exporter):
         self.dir_path = base_path + '-shp-dir'
         self.shp_datasource = self.create_shp_datasource()
 
-        f = open(es_dump_path, encoding='utf-8')
-        while True:
-            # Read 2 lines in the dump file
-            type_line = f.readline()
-            source_line = f.readline()
-            if not type_line:
-                break
-            self.process_entity(
-                type_line, source_line, self.write_csv_row_and_shp)
+        if hits is None:
+            hits = read_es_dump(es_dump_path)
+        for es_type, source in hits:
+            self.process_hit(es_type, source, self.write_csv_row_and_shp)
 
         # Clean up
         for metadatum in self.metadata.values():
@@ -98,9 +96,9 @@ class ShapeExporter(Exporter):
             self.write_shp_layer(entity)
 
     def write_shp_layer(self, loc_data):
-        if loc_data['geometry.wkt'] == '':
+        if loc_data['geometry.wkb'] is None:
             return
-        geom = ogr.CreateGeometryFromWkt(loc_data['geometry.wkt'])
+        geom = ogr.CreateGeometryFromWkb(loc_data['geometry.wkb'])
         layer_type = geom.GetGeometryName().lower()
         layer = self.shp_layers.get(layer_type, None)
         if layer is None:
@@ -3,9 +3,18 @@ from django.contrib.gis.gdal import OGRGeometry
 from ..exceptions import NotWgs84EwkbValueError
 
 
-def convert_postgis_ewkb_to_ewkt(ewkb_hex):
+def convert_postgis_ewkb_to_wkb(ewkb_hex):
+    """Returns the WKB bytes of a PostGIS hex EWKB value, which has to be
+    in WGS84. Only the SRID is removed; the geometry is not parsed."""
     # Assert that format is little endian, capitalized, and SRID=4326
     if ewkb_hex[6:18] != '0020E6100000':
         raise NotWgs84EwkbValueError(ewkb_hex)
-    wkb_hex = ewkb_hex[0:6] + '0000' + ewkb_hex[18:]
-    return 'SRID=4326;' + OGRGeometry(wkb_hex).wkt
+    return bytes.fromhex(ewkb_hex[0:6] + '0000' + ewkb_hex[18:])
+
+
+def convert_wkb_to_ewkt(wkb):
+    return 'SRID=4326;' + OGRGeometry(memoryview(wkb)).wkt
+
+
+def convert_postgis_ewkb_to_ewkt(ewkb_hex):
+    return convert_wkb_to_ewkt(convert_postgis_ewkb_to_wkb(ewkb_hex))
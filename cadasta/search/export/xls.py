@@ -2,25 +2,23 @@ import os
 
 from openpyxl import Workbook
 
-from .base import Exporter
+from .base import Exporter, read_es_dump
 
 MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
 
 class XLSExporter(Exporter):
 
-    def make_download(self, es_dump_path):
+    def make_download(self, es_dump_path, hits=None):
+        """Writes the entities of the ES dump file, or the
+        ``(es_type, source)`` pairs of ``hits`` if given, to a workbook
+        named after ``es_dump_path``."""
         self.workbook = Workbook(write_only=True)
 
-        # Process ES dump file
-        f = open(es_dump_path, encoding='utf-8')
-        while True:
-            # Read 2 lines in the dump file
-            type_line = f.readline()
-            source_line = f.readline()
-            if not type_line:
-                break
-            self.process_entity(type_line, source_line, self.write_xls_row)
+        if hits is None:
+            hits = read_es_dump(es_dump_path)
+        for es_type, source in hits:
+            self.process_hit(es_type, source, self.write_xls_row)
 
         # Finalize
         xls_path = os.path.splitext(es_dump_path)[0] + '.xlsx'
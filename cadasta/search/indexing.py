@@ -0,0 +1,170 @@
+"""Incremental updates of the search index.
+
+Saving or deleting an indexed entity queues an ``IndexUpdate``. The
+``processindex`` worker reads the queue in batches, loads the current
+state of the queued entities and sends one request to the ES ``_bulk``
+API per batch: entities that still exist are (re)indexed, the others
+are deleted from the index. Since documents are always built from the
+database, processing an update twice is harmless.
+
+Updates address documents by the ID of their entity. Indices written by
+the original indexing pipeline hold documents with IDs generated by ES,
+so ``rebuildindex`` has to rebuild every project before updates are
+turned on with ``settings.ES_INDEX_UPDATES``.
+"""
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.util import random_id
+from .client import get_client
+from .documents import get_document
+from .exceptions import ESUnavailable
+from .models import INDEXED_MODELS, IndexUpdate
+
+logger = logging.getLogger('search')
+
+MODELS = {model._meta.model_name: model for model in INDEXED_MODELS}
+
+ES_TYPES = {
+    'spatialunit': 'spatial',
+    'party': 'party',
+    'tenurerelationship': 'party',
+    'resource': 'resource',
+}
+
+# Indices built by ``rebuildindex`` are named after the alias of their
+# project and the time of the rebuild
+APP_INDEX = re.compile(r'^project-\w+-\d{20}$')
+
+# Related objects needed to build a document, loaded with the entities
+RELATED = {
+    'tenurerelationship': ('party', 'spatial_unit'),
+    'resource': ('contributor',),
+}
+
+
+def get_index_version(project_id):
+    """Returns a token that changes whenever the search index of a
+    project is updated by the app."""
+    key = 'search.index.version.{}'.format(project_id)
+    version = cache.get(key)
+    if version is None:
+        version = random_id()
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate_index_version(project_id):
+    cache.delete('search.index.version.{}'.format(project_id))
+
+
+def get_entities(keys):
+    """Loads the entities of ``(model name, object ID)`` keys with one
+    query per model. Deleted entities are missing from the result."""
+    entities = {}
+    for model_name, model in MODELS.items():
+        object_ids = [object_id for name, object_id in keys
+                      if name == model_name]
+        if not object_ids:
+            continue
+        queryset = model.objects.filter(id__in=object_ids).select_related(
+            *RELATED.get(model_name, ()))
+        for entity in queryset:
+            entities[(model_name, entity.id)] = entity
+    return entities
+
+
+def build_bulk_body(updates, timestamp):
+    """Returns the newline-delimited JSON body of an ES ``_bulk`` request
+    that applies ``updates``. Updates of the same entity are merged."""
+    keys = OrderedDict()
+    for update in updates:
+        keys[(update.model, update.object_id)] = update.project_id
+    entities = get_entities(keys)
+
+    lines = []
+    for (model_name, object_id), project_id in keys.items():
+        action = {
+            '_index': 'project-{}'.format(project_id),
+            '_type': ES_TYPES[model_name],
+            '_id': object_id,
+        }
+        entity = entities.get((model_name, object_id))
+        if entity is None:
+            lines.append({'delete': action})
+        else:
+            _, source = get_document(entity, timestamp)
+            lines.append({'index': action})
+            lines.append(source)
+    return ''.join(json.dumps(line, sort_keys=True) + '\n' for line in lines)
+
+
+def log_bulk_errors(result):
+    if not result.get('errors'):
+        return
+    for item in result['items']:
+        for action, info in item.items():
+            status = info.get('status', 200)
+            if status < 300:
+                continue
+            # Documents that were never indexed cannot be deleted. In an
+            # index that was not built by rebuildindex the document may
+            # still be there under an ID generated by ES.
+            if (action == 'delete' and status == 404 and
+                    APP_INDEX.match(info.get('_index', ''))):
+                continue
+            logger.error("Could not %s %s document %s: %s", action,
+                         info.get('_type'), info.get('_id'),
+                         info.get('error'))
+
+
+def flush_index_updates(batch_size):
+    """Sends up to ``batch_size`` queued updates to ES and removes them
+    from the queue. Returns the number of updates that were sent.
+
+    Raises ``ESUnavailable`` if ES cannot be reached; the updates then
+    stay in the queue.
+    """
+    updates = list(IndexUpdate.objects.all()[:batch_size])
+    if not updates:
+        return 0
+
+    body = build_bulk_body(updates, timezone.now().isoformat())
+    response = get_client().post(
+        '_bulk', data=body.encode(),
+        headers={'content-type': 'application/x-ndjson'})
+    if response.status_code != 200:
+        raise ESUnavailable("Elasticsearch responded with status {}".format(
+            response.status_code))
+    log_bulk_errors(response.json())
+
+    IndexUpdate.objects.filter(id__in=[u.id for u in updates]).delete()
+    for project_id in {u.project_id for u in updates}:
+        invalidate_index_version(project_id)
+    return len(updates)
+
+
+def run_indexer(batch_size, poll_interval=2, once=False):
+    """Flushes queued index updates until the queue is empty. With
+    ``once`` the number of flushed updates is returned then, otherwise
+    the queue is polled forever."""
+    processed = 0
+    while True:
+        try:
+            flushed = flush_index_updates(batch_size)
+        except ESUnavailable:
+            if once:
+                raise
+            logger.exception("Could not update the search index")
+            flushed = 0
+        processed += flushed
+        if flushed < batch_size:
+            if once:
+                return processed
+            time.sleep(poll_interval)
@@ -0,0 +1,76 @@
+import math
+import struct
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from osgeo import ogr
+
+from search.export.utils import (convert_postgis_ewkb_to_ewkt,
+                                 convert_postgis_ewkb_to_wkb)
+
+# Number of distinct polygons; features cycle through them
+SAMPLE_SIZE = 100
+
+
+def make_polygon_ewkb(index, vertices):
+    """Returns a PostGIS hex EWKB polygon in WGS84, as found in the
+    ``geometry`` field of ES location documents."""
+    x, y = (index % 360) - 180 + 0.5, (index % 170) - 85 + 0.5
+    points = [(x + 0.25 * math.cos(2 * math.pi * i / vertices),
+               y + 0.25 * math.sin(2 * math.pi * i / vertices))
+              for i in range(vertices)]
+    points.append(points[0])
+    ewkb = struct.pack('<BIIII', 1, 0x20000003, 4326, 1, len(points))
+    ewkb += b''.join(struct.pack('<dd', *point) for point in points)
+    return ewkb.hex().upper()
+
+
+def wkt_geometry(ewkb_hex):
+    ewkt = convert_postgis_ewkb_to_ewkt(ewkb_hex)
+    return ogr.CreateGeometryFromWkt(ewkt[10:])
+
+
+def wkb_geometry(ewkb_hex):
+    return ogr.CreateGeometryFromWkb(convert_postgis_ewkb_to_wkb(ewkb_hex))
+
+
+def time_calls(func, values, features):
+    start = time.perf_counter()
+    for i in range(features):
+        func(values[i % len(values)])
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = """Compares decoding the EWKB geometries of search results
+            for a shapefile export through WKT with handing the WKB
+            straight to OGR."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--features', type=int, default=100000,
+            help='Number of polygons to decode')
+        parser.add_argument(
+            '--vertices', type=int, default=32,
+            help='Number of vertices of every polygon')
+
+    def handle(self, *args, **options):
+        features = options['features']
+        values = [make_polygon_ewkb(i, options['vertices'])
+                  for i in range(min(features, SAMPLE_SIZE))]
+
+        for value in values:
+            if not wkt_geometry(value).Equals(wkb_geometry(value)):
+                raise CommandError(
+                    'WKT and WKB geometries differ for {}'.format(value))
+
+        timings = [
+            ('wkt', time_calls(wkt_geometry, values, features)),
+            ('wkb', time_calls(wkb_geometry, values, features)),
+        ]
+        baseline = timings[0][1]
+        for name, elapsed in timings:
+            self.stdout.write(
+                '{:<5} {:>8.3f}s {:>9.2f} us/feature {:>6.1f}x'.format(
+                    name, elapsed, elapsed / features * 1e6,
+                    baseline / elapsed if elapsed else 0))
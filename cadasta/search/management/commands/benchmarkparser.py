@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from search import parser
+
+SAMPLE_QUERIES = [
+    'house',
+    'parcel 1234',
+    '+"customary rights" -archived',
+    'north field +owner -"right of way" 42 hamlet',
+    'house +"customary rights" -archived parcel 1234 "north field" +owner '
+    '-"right of way" community forest -leasehold "water point" village',
+]
+
+
+def time_calls(func, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            func(query)
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = """Compares the pyparsing grammar, the hand-written scanner and
+            the memoized parse_query on a set of sample search
+            queries."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=2000,
+            help='Number of times every sample query is parsed')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        calls = repeat * len(SAMPLE_QUERIES)
+
+        for query in SAMPLE_QUERIES:
+            if (parser.tokenize(query) !=
+                    parser.query.parseString(query).asList()):
+                raise CommandError(
+                    'Scanner and grammar disagree on {!r}'.format(query))
+
+        timings = [
+            ('pyparsing', time_calls(
+                lambda q: parser.build_dsl(
+                    parser.query.parseString(q).asList()),
+                SAMPLE_QUERIES, repeat)),
+            ('scanner', time_calls(
+                lambda q: parser.build_dsl(parser.tokenize(q)),
+                SAMPLE_QUERIES, repeat)),
+            ('memoized', time_calls(
+                parser.parse_query, SAMPLE_QUERIES, repeat)),
+        ]
+        baseline = timings[0][1]
+        for name, elapsed in timings:
+            self.stdout.write(
+                '{:<10} {:>9.2f} us/query {:>8.1f}x'.format(
+                    name, elapsed / calls * 1e6,
+                    baseline / elapsed if elapsed else 0))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from search.indexing import run_indexer
+
+
+class Command(BaseCommand):
+    help = """Sends queued changes of locations, parties, relationships
+            and resources to the search index."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='Exit when no updates are left in the queue')
+        parser.add_argument(
+            '--poll-interval', type=float, default=2, dest='poll_interval',
+            help='Seconds to wait between polls of an empty queue')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ES_INDEX_BATCH_SIZE,
+            dest='batch_size',
+            help='Number of updates sent to Elasticsearch per request')
+
+    def handle(self, *args, **options):
+        run_indexer(options['batch_size'],
+                    poll_interval=options['poll_interval'],
+                    once=options['once'])
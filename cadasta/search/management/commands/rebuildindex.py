@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from organization.models import Project
+from search.reindex import reindex_projects
+
+
+class Command(BaseCommand):
+    help = """Rebuilds the search indices of all projects, or of the
+            projects with the given slugs, without search downtime."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'projects', nargs='*', metavar='project',
+            help='Slugs of the projects to reindex')
+        parser.add_argument(
+            '--processes', type=int, default=settings.ES_REINDEX_PROCESSES,
+            help='Number of projects indexed in parallel')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ES_INDEX_BATCH_SIZE,
+            dest='batch_size',
+            help='Number of documents sent to Elasticsearch per request')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['projects']:
+            projects = projects.filter(slug__in=options['projects'])
+            missing = set(options['projects']) - set(
+                projects.values_list('slug', flat=True))
+            if missing:
+                raise CommandError('Unknown projects: {}'.format(
+                    ', '.join(sorted(missing))))
+        slugs = dict(projects.values_list('id', 'slug'))
+
+        failed = []
+        total = 0
+        for project_id, count, elapsed, error, warnings in reindex_projects(
+                list(slugs), options['batch_size'], options['processes']):
+            if error:
+                failed.append(slugs[project_id])
+                self.stderr.write('{}: {}'.format(slugs[project_id], error))
+                continue
+            total += count
+            self.stdout.write('{}: {} documents in {:.1f}s'.format(
+                slugs[project_id], count, elapsed))
+            for warning in warnings:
+                self.stderr.write('{}: warning: {}'.format(
+                    slugs[project_id], warning))
+
+        self.stdout.write('Indexed {} documents of {} projects'.format(
+            total, len(slugs) - len(failed)))
+        if failed:
+            raise CommandError('Could not reindex {}'.format(
+                ', '.join(sorted(failed))))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Joins the values of a JSON attributes object, and the elements of
+# values that are arrays, so the search documents hold no JSON keys or
+# punctuation. Index expressions can only call immutable functions.
+CREATE_ATTRIBUTE_VALUES = """
+    CREATE FUNCTION search_attribute_values(attributes jsonb)
+    RETURNS text LANGUAGE sql IMMUTABLE AS $$
+        SELECT coalesce(string_agg(
+            CASE jsonb_typeof(value)
+                WHEN 'array' THEN (
+                    SELECT string_agg(element, ' ')
+                    FROM jsonb_array_elements_text(value) AS element)
+                ELSE value #>> '{}'
+            END, ' '), '')
+        FROM jsonb_each(CASE jsonb_typeof(attributes)
+                            WHEN 'object' THEN attributes
+                            ELSE '{}'::jsonb
+                        END)
+    $$;
+"""
+
+# The search document expressions of search.backends.PostgresBackend
+DOCUMENTS = (
+    ('spatial_spatialunit', ('type', 'attributes')),
+    ('party_party', ('name', 'type', 'attributes')),
+    ('party_tenurerelationship', ('tenure_type', 'attributes')),
+    ('resources_resource',
+     ('name', 'description', 'original_file', 'mime_type')),
+)
+
+
+def column_text(column):
+    if column == 'attributes':
+        return 'search_attribute_values("{}")'.format(column)
+    return "coalesce(\"{}\"::text, '')".format(column)
+
+
+def document_text(columns):
+    return '({})'.format(" || ' ' || ".join(
+        column_text(column) for column in columns))
+
+
+def create_indexes(table, columns):
+    return """
+        CREATE INDEX {table}_search_vector ON {table}
+            USING gin (to_tsvector('simple', {text}));
+        CREATE INDEX {table}_search_trgm ON {table}
+            USING gin ({text} gin_trgm_ops);
+    """.format(table=table, text=document_text(columns))
+
+
+def drop_indexes(table):
+    return """
+        DROP INDEX {table}_search_vector;
+        DROP INDEX {table}_search_trgm;
+    """.format(table=table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('spatial', '0005_recalculate_area'),
+        ('party', '0003_convert_tenuretype_to_charfield'),
+        ('resources', '0006_randomize_imported_filenames'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+            reverse_sql=migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            CREATE_ATTRIBUTE_VALUES,
+            reverse_sql='DROP FUNCTION search_attribute_values(jsonb);'
+        ),
+    ] + [
+        migrations.RunSQL(
+            create_indexes(table, columns),
+            reverse_sql=drop_indexes(table)
+        )
+        for table, columns in DOCUMENTS
+    ]
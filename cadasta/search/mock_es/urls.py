@@ -17,4 +17,12 @@ urlpatterns = [
     url(
         r'^project-(?P<projectid>[-\w]+)/(?P<type>[-\w,]+)/',
         include(urls, namespace='mock_es')),
+    url(
+        r'^_search/scroll$',
+        views.Scroll.as_view(),
+        name='mock_es_scroll'),
+    url(
+        r'^_bulk$',
+        views.Bulk.as_view(),
+        name='mock_es_bulk'),
 ]
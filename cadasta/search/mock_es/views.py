@@ -1,3 +1,4 @@
+import base64
 import json
 
 from django.http import HttpResponse
@@ -11,94 +12,28 @@ from organization.models import Project
 from spatial.models import SpatialUnit
 from party.models import Party, TenureRelationship
 from resources.models import Resource
+from ..documents import get_document
 
 
 def transform(entity, bulk=False):
+    es_type, source = get_document(entity, '2017-01-01T01:23:45.678Z')
+    if es_type == 'resource':
+        # Files are served by the development server
+        source['file'] = 'http://localhost:8000' + source['file']
+    if bulk:
+        return [{'index': {'_type': es_type}}, source]
+    else:
+        return {'_type': es_type, '_source': source}
+
+
+def encode_scroll_id(projectid, query_dsl):
+    """Scroll IDs hold the project and the query of the next page."""
+    state = json.dumps([projectid, query_dsl], sort_keys=True)
+    return base64.urlsafe_b64encode(state.encode()).decode()
 
-    if type(entity) is SpatialUnit:
-        source = {
-            'id': entity.id,
-            'type': entity.type,
-            'geometry': {
-                'type': 'geometry',
-                'value': ''.join(
-                    ['{:02X}'.format(x) for x in entity.geometry.ewkb]
-                ),
-            },
-            'attributes': {
-                'type': 'jsonb',
-                'value': json.dumps(dict(entity.attributes), sort_keys=True),
-            },
-            '@timestamp': '2017-01-01T01:23:45.678Z',
-        }
-        if bulk:
-            return [{'index': {'_type': 'spatial'}}, source]
-        else:
-            return {'_type': 'spatial', '_source': source}
-
-    if type(entity) is Party:
-        source = {
-            'id': entity.id,
-            'name': entity.name,
-            'type': entity.type,
-            'attributes': {
-                'type': 'jsonb',
-                'value': json.dumps(dict(entity.attributes), sort_keys=True),
-            },
-            'tenure_id': None,
-            'tenure_attributes': None,
-            'tenure_partyid': None,
-            'spatial_unit_id': None,
-            'tenure_type': None,
-            '@timestamp': '2017-01-01T01:23:45.678Z',
-        }
-        if bulk:
-            return [{'index': {'_type': 'party'}}, source]
-        else:
-            return {'_type': 'party', '_source': source}
-
-    if type(entity) is TenureRelationship:
-        source = {
-            'id': entity.party.id,
-            'name': entity.party.name,
-            'type': entity.party.type,
-            'attributes': {
-                'type': 'jsonb',
-                'value': json.dumps(dict(entity.party.attributes),
-                                    sort_keys=True),
-            },
-            'tenure_id': entity.id,
-            'tenure_attributes': {
-                'type': 'jsonb',
-                'value': json.dumps(dict(entity.attributes), sort_keys=True),
-            },
-            'tenure_partyid': entity.party.id,
-            'spatial_unit_id': entity.spatial_unit.id,
-            'tenure_type': entity.tenure_type,
-            '@timestamp': '2017-01-01T01:23:45.678Z',
-        }
-        if bulk:
-            return [{'index': {'_type': 'party'}}, source]
-        else:
-            return {'_type': 'party', '_source': source}
-
-    if type(entity) is Resource:
-        source = {
-            'id': entity.id,
-            'name': entity.name,
-            'description': entity.description,
-            'file': 'http://localhost:8000' + entity.file.url,
-            'original_file': entity.original_file,
-            'mime_type': entity.mime_type,
-            'archived': entity.archived,
-            'last_updated': entity.last_updated.isoformat(),
-            'contributor_id': entity.contributor.id,
-            '@timestamp': '2017-01-01T01:23:45.678Z',
-        }
-        if bulk:
-            return [{'index': {'_type': 'resource'}}, source]
-        else:
-            return {'_type': 'resource', '_source': source}
+
+def decode_scroll_id(scroll_id):
+    return json.loads(base64.urlsafe_b64decode(scroll_id.encode()).decode())
 
 
 class BaseSearch(APIView):
@@ -117,6 +52,8 @@ class BaseSearch(APIView):
             return Response({}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         if magic_word == 'bulkerror' and self.bulk:
             return Response({}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if magic_word == 'scrollerror' and self.scroll:
+            return Response({}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         entities = []
         page = []
@@ -161,11 +98,24 @@ class BaseSearch(APIView):
                 },
             })
 
+    def search_and_scroll(self, query_dsl):
+        """Returns a page of results with the scroll ID of the next
+        page."""
+        response = self.search(query_dsl)
+        if response.status_code == 200:
+            next_query_dsl = dict(query_dsl)
+            next_query_dsl['from'] = (query_dsl.get('from', 0) +
+                                      query_dsl.get('size', 10))
+            response.data['_scroll_id'] = encode_scroll_id(
+                self.kwargs['projectid'], next_query_dsl)
+        return response
+
 
 class Search(BaseSearch):
 
     def __init__(self):
         self.bulk = False
+        self.scroll = False
 
     def get(self, request, *args, **kwargs):
         if self.kwargs['type'] == 'project':
@@ -183,14 +133,52 @@ class Search(BaseSearch):
 
     def post(self, request, *args, **kwargs):
         assert self.kwargs['type'] == 'spatial,party,resource'
+        if 'scroll' in request.query_params:
+            return self.search_and_scroll(request.data)
         return self.search(request.data)
 
 
+class Scroll(BaseSearch):
+
+    def __init__(self):
+        self.bulk = False
+        self.scroll = True
+
+    def post(self, request, *args, **kwargs):
+        projectid, query_dsl = decode_scroll_id(request.data['scroll_id'])
+        self.kwargs['projectid'] = projectid
+        return self.search_and_scroll(query_dsl)
+
+    def delete(self, request, *args, **kwargs):
+        return Response({'succeeded': True})
+
+
 class Dump(BaseSearch):
 
     def __init__(self):
         self.bulk = True
+        self.scroll = False
 
     def get(self, request, *args, **kwargs):
         assert self.kwargs['type'] == 'spatial,party,resource'
         return self.search(json.loads(request.query_params['source']))
+
+
+class Bulk(APIView):
+
+    authentication_classes = []
+    permission_classes = (AllowAny,)
+    parser_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        lines = [json.loads(line)
+                 for line in request.body.decode().splitlines() if line]
+        items = []
+        for line in lines:
+            action = next(iter(line))
+            if action not in ('index', 'delete'):
+                continue
+            info = dict(line[action])
+            info['status'] = 200 if action == 'index' else 404
+            items.append({action: info})
+        return Response({'errors': False, 'items': items})
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import models
+from django.dispatch import receiver
+
+from party.models import Party, TenureRelationship
+from resources.models import Resource
+from spatial.models import SpatialUnit
+
+INDEXED_MODELS = (SpatialUnit, Party, TenureRelationship, Resource)
+
+
+class IndexUpdate(models.Model):
+    """A project entity whose search document is out of date.
+
+    Rows are added when an entity is saved or deleted and removed by
+    the ``processindex`` worker once the current state of the entity
+    has been sent to Elasticsearch. The project is stored by ID only,
+    so rows can be written while a project is being deleted.
+    """
+
+    project_id = models.CharField(max_length=24)
+    model = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=24)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __repr__(self):
+        repr_string = ('<IndexUpdate id={obj.id} project={obj.project_id}'
+                       ' model={obj.model} object={obj.object_id}>')
+        return repr_string.format(obj=self)
+
+    @classmethod
+    def enqueue(cls, model, instances):
+        """Queue the search documents of ``instances`` for an update.
+        Instances only need an ``id`` and a ``project_id``, so historical
+        records can be queued as well."""
+        if not settings.ES_INDEX_UPDATES:
+            return
+        model_name = model._meta.model_name
+        updates = [cls(project_id=instance.project_id, model=model_name,
+                       object_id=instance.id)
+                   for instance in instances]
+        if model is Party:
+            # Tenure relationship documents include the party fields
+            party_ids = [instance.id for instance in instances]
+            updates.extend(
+                cls(project_id=project_id, model='tenurerelationship',
+                    object_id=rel_id)
+                for rel_id, project_id in TenureRelationship.objects.filter(
+                    party_id__in=party_ids).values_list('id', 'project_id'))
+        cls.objects.bulk_create(updates)
+
+
+@receiver(models.signals.post_save, sender=SpatialUnit)
+@receiver(models.signals.post_save, sender=Party)
+@receiver(models.signals.post_save, sender=TenureRelationship)
+@receiver(models.signals.post_save, sender=Resource)
+@receiver(models.signals.post_delete, sender=SpatialUnit)
+@receiver(models.signals.post_delete, sender=Party)
+@receiver(models.signals.post_delete, sender=TenureRelationship)
+@receiver(models.signals.post_delete, sender=Resource)
+def enqueue_index_update(sender, instance, raw=False, **kwargs):
+    if not raw:
+        IndexUpdate.enqueue(sender, [instance])
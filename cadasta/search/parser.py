@@ -1,5 +1,9 @@
+import re
+
 import pyparsing
 
+from core.util import LRUCache
+
 
 # Specify the ES fields for all ES types for full-text search
 fields = ['type', 'name', 'attributes.value', 'tenure_attributes.value',
@@ -14,13 +18,73 @@ must_not_term = pyparsing.Group('-' + term)
 token = must_term | must_not_term | term
 query = pyparsing.OneOrMore(token)
 
+# Patterns of the hand-written scanner; they match what the pyparsing
+# grammar above accepts.
+_space = re.compile(r'\s*')
+_exact = re.compile(r'"[^"\n\r]*"')
+_fuzzy = re.compile(r'\S+')
+
+PARSE_CACHE_SIZE = 1024
+_parsed = LRUCache(PARSE_CACHE_SIZE)
+
+
+def tokenize(raw_query_str):
+    """Splits a raw UI search query string into the same tokens as
+    ``query.parseString(raw_query_str).asList()``, without pyparsing.
+
+    Terms are runs of non-whitespace characters or double-quoted
+    phrases, which keep their quotes. A term prefixed with ``+`` or
+    ``-`` becomes a ``[sign, term]`` pair; a lone sign is a term.
+
+    Unlike pyparsing, tabs inside phrases are kept rather than expanded
+    to spaces, and all Unicode whitespace separates terms, where
+    pyparsing stops at the first character that is not a space, tab or
+    line break.
+    """
+    tokens = []
+    pos = 0
+    end = len(raw_query_str)
+    while True:
+        pos = _space.match(raw_query_str, pos).end()
+        if pos == end:
+            break
+        sign = raw_query_str[pos]
+        if sign in '+-':
+            term_pos = _space.match(raw_query_str, pos + 1).end()
+            if term_pos < end:
+                term, pos = _scan_term(raw_query_str, term_pos)
+                tokens.append([sign, term])
+                continue
+        term, pos = _scan_term(raw_query_str, pos)
+        tokens.append(term)
+
+    if not tokens:
+        raise pyparsing.ParseException(raw_query_str, 0, "Expected term")
+    return tokens
+
+
+def _scan_term(raw_query_str, pos):
+    match = (_exact.match(raw_query_str, pos) or
+             _fuzzy.match(raw_query_str, pos))
+    return match.group(), match.end()
+
 
 def parse_query(raw_query_str):
     """This function takes the raw UI search query string, parses it, then
-    generates and returns the 'bool' JSON object for the 'query' DSL field."""
+    generates and returns the 'bool' JSON object for the 'query' DSL field.
+
+    Parsed queries are memoized per query string; the returned DSL is
+    shared and must not be modified."""
+    dsl = _parsed.get(raw_query_str)
+    if dsl is None:
+        dsl = build_dsl(tokenize(raw_query_str))
+        _parsed.set(raw_query_str, dsl)
+    return dsl
+
 
-    # Parse query string into tokens and sort them into buckets
-    tokens = query.parseString(raw_query_str).asList()
+def split_terms(tokens):
+    """Sorts a list of query tokens into lists of must, must-not and
+    should terms."""
     must_terms = []
     must_not_terms = []
     should_terms = []
@@ -33,6 +97,16 @@ def parse_query(raw_query_str):
                 must_terms.append(token[1])
         else:
             should_terms.append(token)
+    return must_terms, must_not_terms, should_terms
+
+
+def is_phrase(term):
+    return term[0] == '"' and term[-1] == '"'
+
+
+def build_dsl(tokens):
+    """Generates the 'bool' JSON object for a list of query tokens."""
+    must_terms, must_not_terms, should_terms = split_terms(tokens)
 
     # Go through each bucket and generate the 'bool' clause lists
     must_dsl = transform_to_dsl(must_terms)
@@ -55,7 +129,7 @@ def transform_to_dsl(terms, has_fuzziness=True):
     dsl = []
     for term in terms:
         # Exact phrase clause
-        if term[0] == '"' and term[-1] == '"':
+        if is_phrase(term):
             dsl.append({'multi_match': {
                 'query': term[1:-1],
                 'fields': fields,
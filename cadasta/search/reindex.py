@@ -0,0 +1,245 @@
+"""Rebuilding the search indices of projects.
+
+``project-<id>`` is an alias of the index that holds the documents of a
+project. A rebuild writes all documents to a new index and then moves
+the alias to it in a single ``_aliases`` request, so searches use the
+old index until the new one is complete. Entities that change while a
+project is rebuilt are queued for the incremental indexer afterwards,
+since their updates may have gone to the old index. Once the alias has
+moved, the rebuild has succeeded: errors in the remaining clean-up are
+logged and reported as warnings.
+"""
+import json
+import logging
+import time
+from functools import partial
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import client
+from .documents import get_document
+from .exceptions import ESUnavailable
+from .indexing import RELATED, invalidate_index_version, log_bulk_errors
+from .models import INDEXED_MODELS, IndexUpdate
+
+logger = logging.getLogger('search')
+
+JSON = {'content-type': 'application/json'}
+NDJSON = {'content-type': 'application/x-ndjson'}
+
+
+def check_response(response):
+    if response.status_code >= 300:
+        raise ESUnavailable("Elasticsearch responded with status {}".format(
+            response.status_code))
+    return response
+
+
+def iter_chunks(queryset, chunk_size):
+    """Yields the objects of a queryset in lists of up to ``chunk_size``,
+    in primary key order. Every chunk is read with its own query that
+    continues after the last key of the previous chunk, so memory use
+    does not grow with the size of the queryset."""
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def iter_documents(project_id, timestamp, chunk_size):
+    """Yields the ``(es_type, id, source)`` of all search documents of a
+    project, starting with the project document that holds the index
+    timestamp."""
+    yield 'project', project_id, {'id': project_id, '@timestamp': timestamp}
+    for model in INDEXED_MODELS:
+        queryset = model.objects.filter(project_id=project_id).select_related(
+            *RELATED.get(model._meta.model_name, ()))
+        for chunk in iter_chunks(queryset, chunk_size):
+            for entity in chunk:
+                es_type, source = get_document(entity, timestamp)
+                yield es_type, entity.id, source
+
+
+def send_documents(es, index, documents):
+    lines = []
+    for es_type, doc_id, source in documents:
+        lines.append({'index': {'_type': es_type, '_id': doc_id}})
+        lines.append(source)
+    body = ''.join(json.dumps(line, sort_keys=True) + '\n' for line in lines)
+    response = check_response(es.post('{}/_bulk'.format(index),
+                                      data=body.encode(), headers=NDJSON))
+    log_bulk_errors(response.json())
+
+
+def get_indices(es, alias):
+    """Returns the names of the indices behind ``alias``. If ``alias`` is
+    the name of a plain index, that name is returned."""
+    response = es.get('{}/_alias'.format(alias))
+    if response.status_code == 404:
+        return []
+    return sorted(check_response(response).json())
+
+
+def create_index(es, index, current):
+    """Creates ``index`` for bulk loading, with the mappings and analysis
+    settings of the first of the ``current`` indices of the project."""
+    body = {'settings': {'index': {
+        'refresh_interval': '-1',
+        'number_of_replicas': 0,
+    }}}
+    if current:
+        response = check_response(es.get('{}/_mapping'.format(current[0])))
+        mappings = response.json()[current[0]].get('mappings')
+        if mappings:
+            body['mappings'] = mappings
+        response = check_response(es.get('{}/_settings'.format(current[0])))
+        analysis = response.json()[current[0]]['settings']['index'].get(
+            'analysis')
+        if analysis:
+            body['settings']['index']['analysis'] = analysis
+    check_response(es.put(index, data=json.dumps(body), headers=JSON))
+
+
+def swap_alias(es, alias, index, current):
+    """Points ``alias`` to ``index`` instead of the ``current`` indices.
+
+    A project that was indexed into a plain index with the name of the
+    alias has that index removed in the same ``_aliases`` request that
+    adds the alias, so searches never find the project without an
+    index."""
+    actions = []
+    for name in current:
+        if name == alias:
+            actions.append({'remove_index': {'index': name}})
+        else:
+            actions.append({'remove': {'index': name, 'alias': alias}})
+    actions.append({'add': {'index': index, 'alias': alias}})
+    check_response(es.post('_aliases', data=json.dumps({'actions': actions}),
+                           headers=JSON))
+
+
+def requeue_changes(project_id, since):
+    """Queues index updates for entities of a project that were changed
+    or deleted after ``since``."""
+    for model in INDEXED_MODELS:
+        records = model.history.filter(
+            project_id=project_id, history_date__gte=since
+        ).only('id', 'project_id')
+        IndexUpdate.enqueue(model, list({r.id: r for r in records}.values()))
+
+
+def clean_up(es, project_id, alias, current, since):
+    """Deletes the old indices of a project after its alias was moved to
+    the new one, queues the changes made since the rebuild started and
+    invalidates cached search results. Returns the steps that failed."""
+    warnings = []
+    for name in current:
+        if name == alias:
+            continue
+        try:
+            check_response(es.delete(name))
+        except ESUnavailable as e:
+            warnings.append("old index {} was not deleted: {}".format(
+                name, e))
+    try:
+        requeue_changes(project_id, since)
+    except Exception as e:
+        warnings.append(
+            "changes made during the rebuild were not requeued: {}".format(
+                e))
+    try:
+        invalidate_index_version(project_id)
+    except Exception as e:
+        warnings.append(
+            "cached search results were not invalidated: {}".format(e))
+    for warning in warnings:
+        logger.warning("Rebuilt the index of project %s, but %s",
+                       project_id, warning)
+    return warnings
+
+
+def reindex_project(project_id, batch_size):
+    """Rebuilds the search index of a project and returns the number of
+    documents in the new index and the warnings of ``clean_up``."""
+    es = client.get_client()
+    alias = 'project-{}'.format(project_id)
+    started = timezone.now()
+    index = '{}-{:%Y%m%d%H%M%S%f}'.format(alias, started)
+
+    current = get_indices(es, alias)
+    create_index(es, index, current)
+    count = 0
+    try:
+        batch = []
+        for document in iter_documents(project_id, started.isoformat(),
+                                       batch_size):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                send_documents(es, index, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            send_documents(es, index, batch)
+            count += len(batch)
+
+        check_response(es.put(
+            '{}/_settings'.format(index),
+            data=json.dumps({'index': {
+                'refresh_interval': '1s',
+                'number_of_replicas': settings.ES_INDEX_REPLICAS,
+            }}),
+            headers=JSON))
+        check_response(es.post('{}/_refresh'.format(index)))
+    except Exception:
+        try:
+            es.delete(index)
+        except ESUnavailable:
+            pass
+        raise
+
+    swap_alias(es, alias, index, current)
+    return count, clean_up(es, project_id, alias, current, started)
+
+
+def run_reindex(project_id, batch_size):
+    """Rebuilds the index of a project and returns the project ID, the
+    number of documents, the elapsed time, the error, if any, and the
+    warnings of a successful rebuild."""
+    start = time.perf_counter()
+    try:
+        count, warnings = reindex_project(project_id, batch_size)
+    except Exception as e:
+        logger.exception("Could not rebuild the index of project %s",
+                         project_id)
+        return project_id, 0, time.perf_counter() - start, str(e), []
+    return project_id, count, time.perf_counter() - start, None, warnings
+
+
+def init_worker():
+    # Every worker process creates its own ES connection pool
+    client._client = None
+
+
+def reindex_projects(project_ids, batch_size, processes=1):
+    """Rebuilds the indices of projects in a pool of ``processes`` worker
+    processes and yields the results of ``run_reindex`` as projects are
+    finished."""
+    task = partial(run_reindex, batch_size=batch_size)
+    if processes <= 1:
+        yield from map(task, project_ids)
+        return
+
+    # Forked workers open their own database connections
+    connections.close_all()
+    with Pool(processes, initializer=init_worker) as pool:
+        yield from pool.imap_unordered(task, project_ids)
@@ -0,0 +1,44 @@
+from urllib.parse import urlsplit
+
+import requests
+from django.test import Client
+from requests.structures import CaseInsensitiveDict
+
+from ..client import ESClient
+
+
+class MockESAdapter(requests.adapters.BaseAdapter):
+    """Sends requests through the Django test client, so the ES client
+    can be used against the ``search.mock_es`` views."""
+
+    def __init__(self):
+        super().__init__()
+        self.client = Client()
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        path = url.path + ('?' + url.query if url.query else '')
+        if request.method in ('POST', 'DELETE'):
+            send = getattr(self.client, request.method.lower())
+            r = send(path, data=request.body,
+                     content_type=request.headers.get('content-type'))
+        else:
+            r = self.client.get(path)
+
+        response = requests.Response()
+        response.status_code = r.status_code
+        response._content = r.content
+        response.headers = CaseInsensitiveDict(r.items())
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def mock_es_client(**kwargs):
+    """Returns an ES client that talks to the ``search.mock_es`` views."""
+    client = ESClient('http://mock-es', **kwargs)
+    client.session.mount('http://', MockESAdapter())
+    return client
@@ -0,0 +1,182 @@
+import json
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from core.tests.utils.cases import UserTestCase
+from organization.tests.factories import ProjectFactory
+from party.models import Party
+from party.tests.factories import PartyFactory, TenureRelationshipFactory
+from resources.tests.factories import ResourceFactory
+from spatial.tests.factories import SpatialUnitFactory
+from ..backends import (ElasticsearchBackend, PostgresBackend, escape_like,
+                        get_backends)
+from ..exceptions import ESUnavailable
+from ..parser import parse_query
+
+
+def mock_request_with_exception(*args, **kwargs):
+    raise ESUnavailable
+
+
+class GetBackendsTest(TestCase):
+
+    @override_settings(SEARCH_BACKENDS=('search.backends.PostgresBackend',))
+    def test_get_backends(self):
+        backends = get_backends()
+        assert len(backends) == 1
+        assert isinstance(backends[0], PostgresBackend)
+
+    def test_escape_like(self):
+        assert escape_like('100%_a\\b') == '%100\\%\\_a\\\\b%'
+
+
+class ElasticsearchBackendTest(TestCase):
+
+    def setUp(self):
+        self.backend = ElasticsearchBackend()
+        self.es_endpoint = 'project-prj/spatial,party,resource/_search/'
+        self.es_body = json.dumps({
+            'query': parse_query('searching'),
+            'from': 10,
+            'size': 20,
+            'sort': {'_score': {'order': 'desc'}},
+        }, sort_keys=True)
+
+    @patch('search.client.ESClient.post')
+    def test_search(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'hits': {
+                'total': 0,
+                'hits': [],
+            },
+        }
+
+        raw_results = self.backend.search('prj', 'searching', 10, 20)
+        assert raw_results == mock_post.return_value.json.return_value
+        mock_post.assert_called_once_with(
+            self.es_endpoint,
+            data=self.es_body,
+            headers={'content-type': 'application/json'},
+        )
+
+    @patch('search.client.ESClient.post')
+    def test_search_not_ok(self, mock_post):
+        mock_post.return_value.status_code = 404
+
+        raw_results = self.backend.search('prj', 'searching', 10, 20)
+        assert raw_results is None
+        mock_post.assert_called_once_with(
+            self.es_endpoint,
+            data=self.es_body,
+            headers={'content-type': 'application/json'},
+        )
+
+    @patch('search.client.ESClient.post', new=mock_request_with_exception)
+    def test_search_connection_not_ok(self):
+        raw_results = self.backend.search('prj', 'searching', 10, 20)
+        assert raw_results is None
+
+    @patch('search.client.ESClient.get')
+    def test_get_timestamp(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'hits': {
+                'hits': [{
+                    '_source': {
+                        '@timestamp': 'TIMESTAMP',
+                    },
+                }],
+            },
+        }
+
+        assert self.backend.get_timestamp('prj') == 'TIMESTAMP'
+        mock_get.assert_called_once_with('project-prj/project/_search/?q=*')
+
+    @patch('search.client.ESClient.get')
+    def test_get_timestamp_not_ok(self, mock_get):
+        mock_get.return_value.status_code = 404
+
+        assert self.backend.get_timestamp('prj') is None
+        mock_get.assert_called_once_with('project-prj/project/_search/?q=*')
+
+    @patch('search.client.ESClient.get', new=mock_request_with_exception)
+    def test_get_timestamp_connection_not_ok(self):
+        assert self.backend.get_timestamp('prj') is None
+
+
+class PostgresBackendTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+        self.jane = PartyFactory.create(project=self.project, name='Jane Doe')
+        self.janet = PartyFactory.create(project=self.project,
+                                         name='Janet Smith')
+        self.john = PartyFactory.create(project=self.project,
+                                        name='John Doe Farms')
+        self.deed = ResourceFactory.create(
+            project=self.project, name='Deed', description='Jane Doe, 1998')
+        ResourceFactory.create(project=self.project, name='Jane Doe',
+                               archived=True)
+        PartyFactory.create(name='Jane Doe')
+
+    def search(self, query, start_idx=0, page_size=10):
+        results = PostgresBackend().search(
+            self.project.id, query, start_idx, page_size)
+        ids = [hit['_source']['id'] for hit in results['hits']['hits']]
+        return results['hits']['total'], ids
+
+    def test_search_terms(self):
+        total, ids = self.search('jane')
+        assert total == 3
+        assert set(ids[:2]) == {self.jane.id, self.deed.id}
+        assert ids[2] == self.janet.id
+
+        assert self.search('nobody') == (0, [])
+
+    def test_search_must_and_must_not(self):
+        assert self.search('+doe -jane') == (1, [self.john.id])
+        assert self.search('+jane +smith') == (0, [])
+        assert self.search('-doe -smith') == (0, [])
+
+    def test_search_phrase(self):
+        assert self.search('"john doe"') == (1, [self.john.id])
+        assert self.search('"doe john"') == (0, [])
+        assert self.search('-"jane doe" doe') == (1, [self.john.id])
+
+    def test_search_pages(self):
+        total, ids = self.search('doe')
+        assert total == 3
+        assert len(ids) == 3
+        assert self.search('doe', 1, 1) == (3, ids[1:2])
+        assert self.search('doe', 3, 1) == (3, [])
+
+    def test_search_attribute_values(self):
+        Party.objects.filter(pk=self.janet.pk).update(attributes={
+            'notes': 'orchard owner', 'crops': ['maize', 'beans']})
+        assert self.search('orchard') == (1, [self.janet.id])
+        assert self.search('beans') == (1, [self.janet.id])
+        assert self.search('notes') == (0, [])
+        assert self.search('crops') == (0, [])
+
+    def test_search_documents(self):
+        su = SpatialUnitFactory.create(project=self.project, type='RW')
+        rel = TenureRelationshipFactory.create(
+            project=self.project, spatial_unit=su, party=self.janet,
+            tenure_type='LH')
+
+        results = PostgresBackend().search(self.project.id, 'rw', 0, 10)
+        hit, = results['hits']['hits']
+        assert hit['_type'] == 'spatial'
+        assert hit['_source']['id'] == su.id
+        assert hit['_source']['type'] == 'RW'
+        assert hit['_source']['@timestamp']
+
+        results = PostgresBackend().search(self.project.id, 'lh', 0, 10)
+        hit, = results['hits']['hits']
+        assert hit['_type'] == 'party'
+        assert hit['_source']['tenure_id'] == rel.id
+        assert hit['_source']['name'] == 'Janet Smith'
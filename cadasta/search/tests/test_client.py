@@ -0,0 +1,237 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from django.test import TestCase
+
+from core.tests.utils.cases import UserTestCase
+from organization.tests.factories import ProjectFactory
+from party.tests.factories import PartyFactory
+from spatial.tests.factories import SpatialUnitFactory
+from ..client import CircuitBreaker, ESClient
+from ..exceptions import ESUnavailable
+from .mock_es import mock_es_client
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    def test_half_open_after_reset_timeout(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30,
+                                 clock=clock)
+        breaker.record_failure()
+        clock.now = 29
+        assert not breaker.allow_request()
+
+        clock.now = 30
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # only one trial request is let through
+        assert not breaker.allow_request()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 60
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+
+def make_response(status_code):
+    response = MagicMock()
+    response.status_code = status_code
+    return response
+
+
+@patch('time.sleep')
+class ESClientTest(TestCase):
+
+    def setUp(self):
+        self.es = ESClient('http://es:9200/', connect_timeout=1,
+                           read_timeout=2, max_retries=2, backoff=0.5,
+                           failure_threshold=2, reset_timeout=30)
+
+    def test_request(self, sleep):
+        with patch.object(self.es.session, 'request',
+                          return_value=make_response(200)) as request:
+            response = self.es.get('project-1/_search/', params={})
+        assert response.status_code == 200
+        request.assert_called_once_with(
+            'GET', 'http://es:9200/project-1/_search/', params={},
+            timeout=(1, 2))
+        sleep.assert_not_called()
+
+        metrics = self.es.metrics.as_dict()
+        assert metrics['requests'] == 1
+        assert metrics['failures'] == 0
+        assert metrics['max_time'] >= metrics['mean_time'] >= 0
+
+    def test_client_errors_are_returned(self, sleep):
+        with patch.object(self.es.session, 'request',
+                          return_value=make_response(404)) as request:
+            assert self.es.post('x').status_code == 404
+        assert request.call_count == 1
+        assert self.es.breaker.failures == 0
+
+    def test_retry_with_backoff(self, sleep):
+        responses = [requests.exceptions.ConnectionError(),
+                     make_response(503), make_response(200)]
+        with patch.object(self.es.session, 'request',
+                          side_effect=responses) as request:
+            assert self.es.get('x').status_code == 200
+        assert request.call_count == 3
+        assert [c[0][0] for c in sleep.call_args_list] == [0.5, 1.0]
+        assert self.es.metrics.as_dict()['failures'] == 2
+        assert self.es.breaker.state == CircuitBreaker.CLOSED
+
+    def test_read_timeout_is_not_retried(self, sleep):
+        with patch.object(self.es.session, 'request',
+                          side_effect=requests.exceptions.ReadTimeout()
+                          ) as request:
+            with pytest.raises(ESUnavailable):
+                self.es.post('x')
+        assert request.call_count == 1
+        sleep.assert_not_called()
+        assert self.es.breaker.failures == 1
+
+    def test_connect_timeout_is_retried(self, sleep):
+        responses = [requests.exceptions.ConnectTimeout(),
+                     make_response(200)]
+        with patch.object(self.es.session, 'request',
+                          side_effect=responses) as request:
+            assert self.es.get('x').status_code == 200
+        assert request.call_count == 2
+
+    def test_circuit_breaker_fails_fast(self, sleep):
+        error = requests.exceptions.ConnectionError()
+        with patch.object(self.es.session, 'request',
+                          side_effect=error) as request:
+            for _ in range(2):
+                with pytest.raises(ESUnavailable):
+                    self.es.get('x')
+            assert request.call_count == 6
+
+            with pytest.raises(ESUnavailable):
+                self.es.get('x')
+            assert request.call_count == 6
+        assert self.es.metrics.as_dict()['rejected'] == 1
+
+        self.es.reset()
+        assert self.es.breaker.state == CircuitBreaker.CLOSED
+        assert self.es.metrics.as_dict()['requests'] == 0
+
+    def test_log_metrics(self, sleep):
+        with patch('search.client.logger') as logger:
+            self.es.log_metrics()
+            logger.info.assert_not_called()
+
+            self.es.metrics_interval = 60
+            self.es.log_metrics()
+            logger.info.assert_not_called()
+
+            self.es._metrics_logged_at -= 60
+            with patch.object(self.es.session, 'request',
+                              return_value=make_response(200)):
+                self.es.get('x')
+                assert logger.info.call_count == 1
+                metrics = json.loads(logger.info.call_args[0][1])
+                assert metrics['requests'] == 0
+
+                self.es.get('x')
+                assert logger.info.call_count == 1
+        assert self.es.metrics.as_dict()['requests'] == 2
+
+    def test_unexpected_error_reaches_circuit_breaker(self, sleep):
+        self.es.breaker.state = CircuitBreaker.HALF_OPEN
+        with patch.object(self.es.session, 'request',
+                          side_effect=ValueError('Invalid URL')):
+            with pytest.raises(ValueError):
+                self.es.get('x')
+        assert self.es.breaker.state == CircuitBreaker.OPEN
+
+
+@patch('time.sleep')
+class ESClientMockESTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+        SpatialUnitFactory.create(project=self.project,
+                                  geometry='SRID=4326;POINT(0 0)')
+        self.es = mock_es_client(max_retries=1)
+
+    def query(self, word):
+        return {'bool': {'should': [{'multi_match': {'query': word}}]}}
+
+    def search(self, word):
+        return self.es.post(
+            'project-{}/spatial,party,resource/_search/'.format(
+                self.project.id),
+            data=json.dumps({'query': self.query(word)}),
+            headers={'content-type': 'application/json'})
+
+    def scroll(self, word, size):
+        return self.es.scroll(
+            'project-{}/spatial,party,resource/_search/'.format(
+                self.project.id),
+            {'query': self.query(word), 'size': size, 'sort': ['_doc']})
+
+    def test_search(self, sleep):
+        response = self.search('house')
+        assert response.status_code == 200
+        assert response.json()['hits']['total'] == 1
+
+    def test_timestamp(self, sleep):
+        response = self.es.get(
+            'project-{}/project/_search/?q=*'.format(self.project.id))
+        assert response.status_code == 200
+        hits = response.json()['hits']['hits']
+        assert hits[0]['_source']['@timestamp']
+
+    def test_unavailable(self, sleep):
+        with pytest.raises(ESUnavailable):
+            self.search('error')
+        assert self.es.metrics.as_dict()['failures'] == 2
+
+    def test_scroll(self, sleep):
+        PartyFactory.create_batch(2, project=self.project)
+        with patch.object(self.es, 'delete',
+                          wraps=self.es.delete) as delete:
+            batches = list(self.scroll('house', 2))
+        assert [len(hits) for hits in batches] == [2, 1]
+        assert [hit['_type'] for hits in batches for hit in hits] == [
+            'spatial', 'party', 'party']
+        assert delete.call_count == 1
+
+    def test_scroll_unavailable(self, sleep):
+        batches = self.scroll('scrollerror', 1)
+        assert len(next(batches)) == 1
+        with pytest.raises(ESUnavailable):
+            next(batches)
+
+    def test_scroll_client_error(self, sleep):
+        with patch.object(self.es, 'post',
+                          return_value=make_response(400)):
+            with pytest.raises(ESUnavailable):
+                list(self.scroll('house', 1))
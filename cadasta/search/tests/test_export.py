@@ -32,6 +32,8 @@ from ..export.resource import ResourceExporter
 from ..export.shape import ShapeExporter
 from ..export.xls import XLSExporter
 from ..export.utils import (convert_postgis_ewkb_to_ewkt,
+                            convert_postgis_ewkb_to_wkb,
+                            convert_wkb_to_ewkt,
                             NotWgs84EwkbValueError)
 
 
@@ -207,7 +209,8 @@ class ExporterTest(BaseTestClass):
             assert metadatum == exporter.metadata['location']
             assert source['id'] == dummies[1].id
             assert source['geometry.ewkt'] == 'SRID=4326;POINT (1 1)'
-            assert source['geometry.wkt'] == 'POINT (1 1)'
+            assert source['geometry.wkb'] == bytes.fromhex(
+                '0101000000000000000000F03F000000000000F03F')
             assert source['attributes']['name'] == "Long Island"
             assert source['attributes']['acquired_how'] == 'LH'
 
@@ -231,12 +234,31 @@ class ExporterTest(BaseTestClass):
             assert metadatum == exporter.metadata['location']
             assert source['id'] == dummies[1].id
             assert source['geometry.ewkt'] == ''
-            assert source['geometry.wkt'] == ''
+            assert source['geometry.wkb'] is None
             assert source['attributes']['name'] == "Long Island"
             assert source['attributes']['acquired_how'] == 'LH'
 
         exporter.process_entity(es_type_line, es_source_line, callback)
 
+    def test_process_location_entity_without_ewkt(self):
+        dummies = []
+        for _ in range(5):
+            obj = RandomIDModel()
+            obj.id = random_id()
+            dummies.append(obj)
+        raw_source = (
+            get_fake_es_api_results(*dummies)['hits']['hits'][1]['_source'])
+
+        exporter = ShapeExporter(self.project)
+        exporter.metadata['location']['model_attrs'] = ['id', 'type']
+
+        def callback(source, metadatum):
+            assert 'geometry.ewkt' not in source
+            assert source['geometry.wkb'] == bytes.fromhex(
+                '0101000000000000000000F03F000000000000F03F')
+
+        exporter.process_hit('spatial', raw_source, callback)
+
     def test_process_party_entity(self):
         es_type_line = '{"index": {"_type": "party"} }'
         dummies = []
@@ -828,3 +850,12 @@ class UtilsTest(TestCase):
         with pytest.raises(NotWgs84EwkbValueError):
             convert_postgis_ewkb_to_ewkt(ewkb.lower())
         assert convert_postgis_ewkb_to_ewkt(ewkb) == 'SRID=4326;POINT (1 1)'
+
+    def test_convert_postgis_ewkb_to_wkb(self):
+        ewkb = '0101000020E6100000000000000000F03F000000000000F03F'
+        with pytest.raises(NotWgs84EwkbValueError):
+            convert_postgis_ewkb_to_wkb(ewkb.lower())
+        wkb = convert_postgis_ewkb_to_wkb(ewkb)
+        assert wkb == bytes.fromhex(
+            '0101000000000000000000F03F000000000000F03F')
+        assert convert_wkb_to_ewkt(wkb) == 'SRID=4326;POINT (1 1)'
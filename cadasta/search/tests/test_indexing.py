@@ -0,0 +1,149 @@
+import json
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from core.tests.utils.cases import UserTestCase
+from organization.tests.factories import ProjectFactory
+from party.tests.factories import PartyFactory, TenureRelationshipFactory
+from resources.tests.factories import ResourceFactory
+from spatial.tests.factories import SpatialUnitFactory
+from .. import indexing
+from ..exceptions import ESUnavailable
+from ..models import IndexUpdate
+from .mock_es import mock_es_client
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def queued(model=None):
+    updates = IndexUpdate.objects.all()
+    if model:
+        updates = updates.filter(model=model)
+    return [u.object_id for u in updates]
+
+
+@override_settings(ES_INDEX_UPDATES=True)
+class IndexUpdateTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+
+    def test_enqueue_on_save_and_delete(self):
+        su = SpatialUnitFactory.create(project=self.project)
+        resource = ResourceFactory.create(project=self.project)
+        assert queued('spatialunit') == [su.id]
+        assert queued('resource') == [resource.id]
+
+        su_id = su.id
+        su.delete()
+        assert queued('spatialunit') == [su_id, su_id]
+        update = IndexUpdate.objects.last()
+        assert update.project_id == self.project.id
+        assert repr(update) == (
+            '<IndexUpdate id={} project={} model=spatialunit object={}>'
+            .format(update.id, self.project.id, su_id))
+
+    def test_enqueue_party_relationships(self):
+        rel = TenureRelationshipFactory.create(project=self.project)
+        IndexUpdate.objects.all().delete()
+
+        rel.party.name = 'New name'
+        rel.party.save()
+        assert queued('party') == [rel.party.id]
+        assert queued('tenurerelationship') == [rel.id]
+
+    @override_settings(ES_INDEX_UPDATES=False)
+    def test_enqueue_disabled(self):
+        PartyFactory.create(project=self.project)
+        assert queued() == []
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ES_INDEX_UPDATES=True)
+@patch('search.indexing.get_client', new=mock_es_client)
+class FlushIndexUpdatesTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+        self.su = SpatialUnitFactory.create(
+            project=self.project, geometry='SRID=4326;POINT(1 1)')
+        self.rel = TenureRelationshipFactory.create(
+            project=self.project, spatial_unit=self.su)
+        self.party = PartyFactory.create(project=self.project)
+
+    def test_build_bulk_body(self):
+        self.su.save()
+        party_id = self.party.id
+        self.party.delete()
+
+        body = indexing.build_bulk_body(IndexUpdate.objects.all(), 'NOW')
+        lines = [json.loads(line) for line in body.splitlines()]
+        index = 'project-{}'.format(self.project.id)
+
+        actions = [line for line in lines
+                   if 'index' in line or 'delete' in line]
+        assert len(actions) == 4
+        assert actions[0] == {'index': {
+            '_index': index, '_type': 'spatial', '_id': self.su.id}}
+        assert actions[-1] == {'delete': {
+            '_index': index, '_type': 'party', '_id': party_id}}
+
+        location = lines[1]
+        assert location['id'] == self.su.id
+        assert location['@timestamp'] == 'NOW'
+        assert location['geometry']['value'].startswith('0101000020E6100000')
+        relationship = lines[lines.index({'index': {
+            '_index': index, '_type': 'party', '_id': self.rel.id}}) + 1]
+        assert relationship['tenure_id'] == self.rel.id
+        assert relationship['id'] == self.rel.party.id
+
+    def test_flush_index_updates(self):
+        version = indexing.get_index_version(self.project.id)
+        assert len(queued()) == 4
+        assert indexing.flush_index_updates(3) == 3
+        assert len(queued()) == 1
+        assert indexing.get_index_version(self.project.id) != version
+
+        assert indexing.run_indexer(3, once=True) == 1
+        assert queued() == []
+        assert indexing.flush_index_updates(2) == 0
+
+    def test_flush_with_es_error(self):
+        client = MagicMock()
+        client.post.return_value.status_code = 400
+        with patch('search.indexing.get_client', return_value=client):
+            with pytest.raises(ESUnavailable):
+                indexing.run_indexer(10, once=True)
+        assert len(queued()) == 4
+
+    def test_log_bulk_errors(self):
+        result = {'errors': True, 'items': [
+            {'index': {'_type': 'spatial', '_id': 'a', 'status': 201}},
+            {'delete': {'_index': 'project-abc-20170102030405000000',
+                        '_type': 'party', '_id': 'b', 'status': 404}},
+            {'delete': {'_index': 'project-abc', '_type': 'party',
+                        '_id': 'd', 'status': 404, 'error': 'not_found'}},
+            {'index': {'_type': 'party', '_id': 'c', 'status': 400,
+                       'error': 'mapper_parsing_exception'}},
+        ]}
+        with patch.object(indexing.logger, 'error') as error:
+            indexing.log_bulk_errors(result)
+        assert error.call_count == 2
+        assert error.call_args_list[0][0][1:] == (
+            'delete', 'party', 'd', 'not_found')
+        assert error.call_args_list[1][0][1:] == (
+            'index', 'party', 'c', 'mapper_parsing_exception')
+
+    def test_processindex_command(self):
+        call_command('processindex', once=True, stdout=StringIO())
+        assert queued() == []
@@ -0,0 +1,25 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class BenchmarkParserTest(TestCase):
+
+    def test_benchmark_parser(self):
+        out = StringIO()
+        call_command('benchmarkparser', repeat=2, stdout=out)
+        output = out.getvalue()
+        assert 'pyparsing' in output
+        assert 'scanner' in output
+        assert 'memoized' in output
+
+
+class BenchmarkExportTest(TestCase):
+
+    def test_benchmark_export(self):
+        out = StringIO()
+        call_command('benchmarkexport', features=10, vertices=8, stdout=out)
+        output = out.getvalue()
+        assert 'wkt' in output
+        assert 'wkb' in output
@@ -1,3 +1,4 @@
+import pyparsing
 import pytest
 
 from django.test import TestCase
@@ -69,6 +70,29 @@ class ParserTest(TestCase):
         assert p('+a   "-b+c"').asList() == [['+', 'a'], '"-b+c"']
         assert p('-a   "+b-c"').asList() == [['-', 'a'], '"+b-c"']
 
+    def test_tokenize(self):
+        queries = [
+            'a', '    a    ', 'a             b', 'a___ b--- c+++',
+            '"a    b"', 'a "b c" d', '"b +a"', 'b+a', '+a', '-a',
+            '+"a  b"', '-"a  b"', '+a -"b +c"', '+a-"b +c"', '-a+"b -c"',
+            '+a   "-b+c"', '+ a', '- "a b"', 'a +', '-', '+ -', '""',
+            '"a', 'a"b c"', '"a b"c', '"a\nb"', 'a\r\nb',
+        ]
+        for query in queries:
+            assert parser.tokenize(query) == (
+                parser.query.parseString(query).asList()), query
+
+    def test_tokenize_empty(self):
+        for query in ('', '   '):
+            with pytest.raises(pyparsing.ParseException):
+                parser.tokenize(query)
+
+    def test_parse_query_is_memoized(self):
+        dsl = parser.parse_query('memo +"a b"')
+        assert parser.parse_query('memo +"a b"') is dsl
+        assert dsl == parser.build_dsl(
+            parser.query.parseString('memo +"a b"').asList())
+
     def test_parse_query(self):
         f = parser.fields
 
@@ -0,0 +1,229 @@
+import json
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.tests.utils.cases import UserTestCase
+from organization.tests.factories import ProjectFactory
+from party.models import Party
+from party.tests.factories import PartyFactory, TenureRelationshipFactory
+from resources.tests.factories import ResourceFactory
+from spatial.tests.factories import SpatialUnitFactory
+from .. import reindex
+from ..exceptions import ESUnavailable
+from ..models import IndexUpdate
+
+
+def make_response(status_code=200, data=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = data or {}
+    return response
+
+
+class FakeES:
+    """Records the requests of a rebuild. ``aliases`` maps alias names
+    to the indices behind them."""
+
+    def __init__(self, aliases=None, bulk_status=200, delete_status=200):
+        self.aliases = aliases or {}
+        self.bulk_status = bulk_status
+        self.delete_status = delete_status
+        self.requests = []
+        self.bodies = {}
+        self.documents = []
+
+    def get(self, path, **kwargs):
+        self.requests.append(('GET', path))
+        name, _, endpoint = path.partition('/')
+        if endpoint == '_alias':
+            if name not in self.aliases:
+                return make_response(404)
+            return make_response(data={
+                index: {'aliases': {}} for index in self.aliases[name]})
+        if endpoint == '_mapping':
+            return make_response(data={
+                name: {'mappings': {'spatial': {'properties': {}}}}})
+        if endpoint == '_settings':
+            return make_response(data={name: {'settings': {'index': {
+                'number_of_shards': '5',
+                'analysis': {'analyzer': {'default': {}}},
+            }}}})
+
+    def post(self, path, data=None, **kwargs):
+        self.requests.append(('POST', path))
+        if path.endswith('/_bulk'):
+            self.documents.extend(
+                json.loads(line) for line in data.decode().splitlines())
+            return make_response(self.bulk_status,
+                                 {'errors': False, 'items': []})
+        if data:
+            self.bodies[path] = json.loads(data)
+        return make_response()
+
+    def put(self, path, data=None, **kwargs):
+        self.requests.append(('PUT', path))
+        self.bodies[path] = json.loads(data)
+        return make_response()
+
+    def delete(self, path, **kwargs):
+        self.requests.append(('DELETE', path))
+        return make_response(self.delete_status)
+
+
+class IterChunksTest(UserTestCase, TestCase):
+
+    def test_iter_chunks(self):
+        project = ProjectFactory.create()
+        parties = PartyFactory.create_batch(5, project=project)
+        with self.assertNumQueries(4):
+            chunks = list(reindex.iter_chunks(Party.objects.all(), 2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [p.id for chunk in chunks for p in chunk] == sorted(
+            p.id for p in parties)
+
+
+@override_settings(ES_INDEX_UPDATES=True)
+class ReindexProjectTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create(slug='test-project')
+        self.alias = 'project-{}'.format(self.project.id)
+        su = SpatialUnitFactory.create(project=self.project,
+                                       geometry='SRID=4326;POINT(1 1)')
+        TenureRelationshipFactory.create(project=self.project,
+                                         spatial_unit=su)
+        ResourceFactory.create(project=self.project)
+        # Entities of other projects are not indexed
+        PartyFactory.create()
+        IndexUpdate.objects.all().delete()
+
+    def reindex(self, es, batch_size=2):
+        with patch('search.client.get_client', return_value=es):
+            return reindex.reindex_project(self.project.id, batch_size)
+
+    def test_iter_documents(self):
+        documents = list(reindex.iter_documents(self.project.id, 'NOW', 1))
+        assert [d[0] for d in documents] == [
+            'project', 'spatial', 'party', 'party', 'resource']
+        assert documents[0] == ('project', self.project.id, {
+            'id': self.project.id, '@timestamp': 'NOW'})
+        assert documents[3][2]['tenure_id'] == documents[3][1]
+
+    def test_reindex_new_project(self):
+        es = FakeES()
+        assert self.reindex(es) == (5, [])
+
+        index = es.requests[1][1]
+        assert index.startswith(self.alias + '-')
+        assert es.requests[:2] == [('GET', self.alias + '/_alias'),
+                                   ('PUT', index)]
+        assert es.bodies[index] == {'settings': {'index': {
+            'refresh_interval': '-1', 'number_of_replicas': 0}}}
+        assert es.requests.count(('POST', index + '/_bulk')) == 3
+        assert len(es.documents) == 10
+        assert es.documents[0] == {
+            'index': {'_type': 'project', '_id': self.project.id}}
+        assert es.bodies[index + '/_settings']['index'][
+            'refresh_interval'] == '1s'
+        assert es.bodies['_aliases'] == {'actions': [
+            {'add': {'index': index, 'alias': self.alias}}]}
+        assert not [r for r in es.requests if r[0] == 'DELETE']
+        assert IndexUpdate.objects.count() == 0
+
+    def test_reindex_alias(self):
+        old_index = self.alias + '-1'
+        es = FakeES({self.alias: [old_index]})
+        self.reindex(es)
+
+        index = es.requests[3][1]
+        assert es.bodies[index]['mappings'] == {'spatial': {'properties': {}}}
+        assert es.bodies[index]['settings']['index']['analysis'] == {
+            'analyzer': {'default': {}}}
+        assert es.bodies['_aliases'] == {'actions': [
+            {'remove': {'index': old_index, 'alias': self.alias}},
+            {'add': {'index': index, 'alias': self.alias}}]}
+        assert es.requests[-1] == ('DELETE', old_index)
+
+    def test_reindex_plain_index(self):
+        es = FakeES({self.alias: [self.alias]})
+        self.reindex(es)
+
+        index = es.requests[3][1]
+        assert es.bodies['_aliases'] == {'actions': [
+            {'remove_index': {'index': self.alias}},
+            {'add': {'index': index, 'alias': self.alias}}]}
+        assert not [r for r in es.requests if r[0] == 'DELETE']
+
+    def test_reindex_with_es_error(self):
+        es = FakeES(bulk_status=500)
+        with pytest.raises(ESUnavailable):
+            self.reindex(es)
+        index = es.requests[1][1]
+        assert es.requests[-1] == ('DELETE', index)
+        assert ('POST', '_aliases') not in es.requests
+
+    def test_reindex_with_clean_up_errors(self):
+        old_index = self.alias + '-1'
+        es = FakeES({self.alias: [old_index]}, delete_status=500)
+        with patch('search.reindex.requeue_changes',
+                   side_effect=Exception('lost connection')):
+            count, warnings = self.reindex(es)
+
+        assert count == 5
+        assert ('POST', '_aliases') in es.requests
+        assert warnings == [
+            "old index {} was not deleted: Elasticsearch responded with "
+            "status 500".format(old_index),
+            "changes made during the rebuild were not requeued: "
+            "lost connection"]
+
+    def test_requeue_changes(self):
+        since = timezone.now()
+        party = PartyFactory.create(project=self.project)
+        party_id = party.id
+        party.delete()
+        IndexUpdate.objects.all().delete()
+
+        reindex.requeue_changes(self.project.id, since)
+        assert [(u.model, u.object_id)
+                for u in IndexUpdate.objects.all()] == [('party', party_id)]
+
+    def test_rebuildindex_command(self):
+        es = FakeES()
+        out = StringIO()
+        with patch('search.client.get_client', return_value=es):
+            call_command('rebuildindex', 'test-project', processes=1,
+                         stdout=out)
+        assert 'test-project: 5 documents' in out.getvalue()
+        assert 'Indexed 5 documents of 1 projects' in out.getvalue()
+
+        with pytest.raises(CommandError):
+            call_command('rebuildindex', 'unknown', stdout=StringIO())
+
+    def test_rebuildindex_command_with_warnings(self):
+        es = FakeES()
+        out = StringIO()
+        err = StringIO()
+        with patch('search.client.get_client', return_value=es):
+            with patch('search.reindex.requeue_changes',
+                       side_effect=Exception('lost connection')):
+                call_command('rebuildindex', 'test-project', processes=1,
+                             stdout=out, stderr=err)
+        assert 'Indexed 5 documents of 1 projects' in out.getvalue()
+        assert ('test-project: warning: changes made during the rebuild '
+                'were not requeued: lost connection') in err.getvalue()
+
+    def test_rebuildindex_command_with_es_error(self):
+        es = FakeES(bulk_status=500)
+        with patch('search.client.get_client', return_value=es):
+            with pytest.raises(CommandError):
+                call_command('rebuildindex', 'test-project', processes=1,
+                             stdout=StringIO(), stderr=StringIO())
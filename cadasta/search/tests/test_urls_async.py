@@ -21,17 +21,17 @@ class SearchUrlTest(TestCase):
         assert resolved.kwargs['organization'] == 'habitat'
         assert resolved.kwargs['project'] == '123'
 
-    # def test_search_export(self):
-    #     actual = reverse('async:search:export',
-    #                      kwargs={
-    #                         'organization': 'habitat',
-    #                         'project': '123',
-    #                      })
-    #     expected = '/async/organizations/habitat/projects/123/search/export/'
-    #     assert actual == expected
+    def test_search_export(self):
+        actual = reverse('async:search:export',
+                         kwargs={
+                            'organization': 'habitat',
+                            'project': '123',
+                         })
+        expected = '/async/organizations/habitat/projects/123/search/export/'
+        assert actual == expected
 
-    #     resolved = resolve(
-    #         '/async/organizations/habitat/projects/123/search/export/')
-    #     assert resolved.func.__name__ == async.SearchExport.__name__
-    #     assert resolved.kwargs['organization'] == 'habitat'
-    #     assert resolved.kwargs['project'] == '123'
+        resolved = resolve(
+            '/async/organizations/habitat/projects/123/search/export/')
+        assert resolved.func.__name__ == async.SearchExport.__name__
+        assert resolved.kwargs['organization'] == 'habitat'
+        assert resolved.kwargs['project'] == '123'
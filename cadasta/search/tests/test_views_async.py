@@ -1,32 +1,28 @@
-# import csv
-# import io
+import csv
+import io
 import json
-import os
-# import pytest
-import requests
-import shutil
-import subprocess
+import pytest
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-# from django.core.exceptions import PermissionDenied
-# from django.core.urlresolvers import reverse
-# from django.http import Http404
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import reverse
+from django.http import Http404
+from django.db import connection
 from django.template.loader import render_to_string
 from django.test import TestCase
-# from openpyxl import load_workbook
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.translation import activate
+from openpyxl import load_workbook
 from rest_framework.exceptions import PermissionDenied as APIPermissionDenied
-from unittest.mock import patch
-# from urllib.parse import quote as url_quote
-# from zipfile import ZipFile
+from unittest.mock import MagicMock, patch
+from zipfile import ZipFile
 
 from tutelary.models import Policy, assign_user_policies
-from skivvy import APITestCase
-# from skivvy import ViewTestCase, APITestCase
+from skivvy import ViewTestCase, APITestCase
 
 from accounts.tests.factories import UserFactory
 from core.tests.utils.cases import UserTestCase
-from core.tests.utils.files import make_dirs  # noqa
 from organization.tests.factories import ProjectFactory
 from spatial.models import SpatialUnit
 from spatial.tests.factories import SpatialUnitFactory
@@ -36,19 +32,14 @@ from party.choices import TENURE_RELATIONSHIP_TYPES
 from party.tests.factories import PartyFactory, TenureRelationshipFactory
 from resources.models import Resource
 from resources.tests.factories import ResourceFactory
-from resources.tests.utils import clear_temp  # noqa
-from resources.utils.io import ensure_dirs
 from questionnaires.managers import create_attrs_schema
 from questionnaires.tests import attr_schemas
 from questionnaires.tests import factories as q_factories
+from ..exceptions import ESUnavailable
 from ..parser import parse_query
 from ..views import async
 from .fake_results import get_fake_es_api_results
-
-
-api_url = (
-    settings.ES_SCHEME + '://' + settings.ES_HOST + ':' + settings.ES_PORT)
-test_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
+from .mock_es import mock_es_client
 
 
 def assign_policies(user):
@@ -67,8 +58,11 @@ def assign_policies(user):
     assign_user_policies(user, policy)
 
 
+ES_ONLY = ('search.backends.ElasticsearchBackend',)
+
+
 def mock_request_with_exception(*args, **kwargs):
-    raise requests.exceptions.ConnectionError
+    raise ESUnavailable
 
 
 class SearchAPITest(APITestCase, UserTestCase, TestCase):
@@ -137,8 +131,10 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             'size': 20,
             'sort': {'_score': {'order': 'desc'}},
         }
-        url = '{}/project-{}/spatial,party,resource/_search/'
-        self.es_endpoint = url.format(api_url, self.project.id)
+        url = 'project-{}/spatial,party,resource/_search/'
+        self.es_endpoint = url.format(self.project.id)
+        self.es_timestamp_path = 'project-{}/project/_search/?q=*'.format(
+            self.project.id)
         self.es_body = json.dumps(self.query_body, sort_keys=True)
 
     def setup_url_kwargs(self):
@@ -147,8 +143,8 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             'project': self.project.slug,
         }
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_results(self, mock_post, mock_get):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {
@@ -185,12 +181,11 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10,
         )
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_results_custom_location_type(self, mock_post, mock_get):
         questionnaire = q_factories.QuestionnaireFactory.create(
             project=self.project)
@@ -238,12 +233,11 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10
         )
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_over_max_results(self, mock_post, mock_get):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {
@@ -280,12 +274,11 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10,
         )
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_no_results(self, mock_post, mock_get):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {
@@ -316,17 +309,12 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10,
         )
         mock_get.assert_called_once_with(
-            '{}/project-{}/project/_search/?q=*'.format(
-                api_url, self.project.id
-            ),
-            timeout=10,
-        )
+            'project-{}/project/_search/?q=*'.format(self.project.id))
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_project_result(self, mock_post, mock_get):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {
@@ -352,12 +340,11 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10,
         )
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_null_id(self, mock_post, mock_get):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {
@@ -384,12 +371,11 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10,
         )
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_missing_query(self, mock_post, mock_get):
         response = self.request(
             user=self.user, method='POST', post_data={'q': None})
@@ -402,8 +388,9 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         mock_post.assert_not_called()
         mock_get.assert_not_called()
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @override_settings(SEARCH_BACKENDS=ES_ONLY)
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_es_not_ok(self, mock_post, mock_get):
         response = self.request(user=self.user, method='POST')
         assert response.status_code == 200
@@ -416,12 +403,12 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
             self.es_endpoint,
             data=self.es_body,
             headers={'content-type': 'application/json'},
-            timeout=10,
         )
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
 
-    @patch('requests.get')
-    @patch('requests.post', new=mock_request_with_exception)
+    @override_settings(SEARCH_BACKENDS=ES_ONLY)
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post', new=mock_request_with_exception)
     def test_post_with_es_connection_not_ok(self, mock_get):
         response = self.request(user=self.user, method='POST')
         assert response.status_code == 200
@@ -430,10 +417,84 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         assert response.content['recordsFiltered'] == 0
         assert response.content['draw'] == 40
         assert response.content['error'] == 'unavailable'
-        mock_get.assert_not_called()
+        mock_get.assert_called_once_with(self.es_timestamp_path)
+
+    @patch('search.client.ESClient.get', new=mock_request_with_exception)
+    @patch('search.client.ESClient.post', new=mock_request_with_exception)
+    def test_post_with_es_connection_not_ok_falls_back(self):
+        post_data = dict(self.post_data, q='homeowner', start=0)
+        response = self.request(user=self.user, method='POST',
+                                post_data=post_data)
+        assert response.status_code == 200
+        assert 'error' not in response.content
+        assert response.content['recordsTotal'] == 1
+        assert response.content['recordsFiltered'] == 1
+        assert len(response.content['data']) == 1
+        assert self.party.get_absolute_url() in (
+            response.content['data'][0][0])
+
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
+    def test_post_cached(self, mock_post, mock_get):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'hits': {
+                'total': 1,
+                'hits': [{
+                    '_type': 'spatial',
+                    '_source': {
+                        'id': self.su.id,
+                        'type': 'AP',
+                        '@timestamp': 'TIMESTAMP',
+                    },
+                }],
+            },
+        }
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'hits': {'hits': [{'_source': {'@timestamp': 'TIMESTAMP'}}]},
+        }
+
+        response = self.request(user=self.user, method='POST')
+        assert response.status_code == 200
+        assert len(response.content['data']) == 1
+
+        post_data = dict(self.post_data, draw=41)
+        cached = self.request(user=self.user, method='POST',
+                              post_data=post_data)
+        assert cached.content['draw'] == 41
+        assert cached.content['data'] == response.content['data']
+        assert mock_post.call_count == 1
+        assert mock_get.call_count == 2
+
+        # a different page is not served from the cache
+        post_data = dict(self.post_data, start=30)
+        self.request(user=self.user, method='POST', post_data=post_data)
+        assert mock_post.call_count == 2
+
+        # reindexing the project invalidates cached results
+        mock_get.return_value.json.return_value = {
+            'hits': {'hits': [{'_source': {'@timestamp': 'REINDEXED'}}]},
+        }
+        self.request(user=self.user, method='POST')
+        assert mock_post.call_count == 3
 
-    @patch('requests.get')
-    @patch('requests.post')
+    def test_get_cache_key(self):
+        view = self.view_class()
+        key = view.get_cache_key('prj', 'foo  bar', 0, 10, 'T1')
+        assert key.startswith('search.results.prj.')
+        assert key == view.get_cache_key('prj', 'foo bar', 0, 10, 'T1')
+        assert key != view.get_cache_key('prj', 'foo bar', 0, 10, 'T2')
+        assert key != view.get_cache_key('prj', 'foo bar', 10, 10, 'T1')
+        assert key != view.get_cache_key('prj', 'foo baz', 0, 10, 'T1')
+        activate('de')
+        try:
+            assert key != view.get_cache_key('prj', 'foo bar', 0, 10, 'T1')
+        finally:
+            activate('en')
+
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_nonexistent_org(self, mock_post, mock_get):
         response = self.request(user=self.user,
                                 method='POST',
@@ -443,8 +504,8 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         mock_post.assert_not_called()
         mock_get.assert_not_called()
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_nonexistent_project(self, mock_post, mock_get):
         response = self.request(user=self.user,
                                 method='POST',
@@ -454,8 +515,8 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         mock_post.assert_not_called()
         mock_get.assert_not_called()
 
-    @patch('requests.get')
-    @patch('requests.post')
+    @patch('search.client.ESClient.get')
+    @patch('search.client.ESClient.post')
     def test_post_with_unauthorized_user(self, mock_post, mock_get):
         response = self.request(method='POST')
         assert response.status_code == 403
@@ -463,97 +524,18 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         mock_post.assert_not_called()
         mock_get.assert_not_called()
 
-    @patch('requests.post')
-    def test_query_es(self, mock_post):
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {
-            'hits': {
-                'total': 0,
-                'hits': [],
-            },
-        }
-
-        raw_results = self.view_class().query_es(
-            self.project.id, self.query, 10, 20)
-        assert raw_results == mock_post.return_value.json.return_value
-        mock_post.assert_called_once_with(
-            self.es_endpoint,
-            data=self.es_body,
-            headers={'content-type': 'application/json'},
-            timeout=10,
-        )
-
-    @patch('requests.post')
-    def test_query_es_not_ok(self, mock_post):
-        mock_post.return_value.status_code = 404
-
-        raw_results = self.view_class().query_es(
-            self.project.id, self.query, 10, 20)
-        assert raw_results is None
-        mock_post.assert_called_once_with(
-            self.es_endpoint,
-            data=self.es_body,
-            headers={'content-type': 'application/json'},
-            timeout=10,
-        )
-
-    @patch('requests.post', new=mock_request_with_exception)
-    def test_query_es_connection_not_ok(self):
-        raw_results = self.view_class().query_es(
-            self.project.id, self.query, 10, 20)
-        assert raw_results is None
-
-    @patch('requests.get')
-    def test_query_es_timestamp(self, mock_get):
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {
-            'hits': {
-                'hits': [{
-                    '_source': {
-                        '@timestamp': 'TIMESTAMP',
-                    },
-                }],
-            },
-        }
-
-        timestamp = self.view_class().query_es_timestamp(self.project.id)
-        assert timestamp == 'TIMESTAMP'
-        mock_get.assert_called_once_with(
-            '{}/project-{}/project/_search/?q=*'.format(
-                api_url, self.project.id
-            ),
-            timeout=10,
-        )
-
-    @patch('requests.get')
-    def test_query_es_timestamp_not_ok(self, mock_get):
-        mock_get.return_value.status_code = 404
-
-        timestamp = self.view_class().query_es_timestamp(self.project.id)
-        assert timestamp == "unknown"
-        mock_get.assert_called_once_with(
-            '{}/project-{}/project/_search/?q=*'.format(
-                api_url, self.project.id
-            ),
-            timeout=10,
-        )
-
-    @patch('requests.get', new=mock_request_with_exception)
-    def test_query_es_timestamp_connection_not_ok(self):
-        timestamp = self.view_class().query_es_timestamp(self.project.id)
-        assert timestamp == "unknown"
-
-    def test_augment_result_location(self):
+    def test_augment_results_location(self):
         view = self.view_class()
         view.spatial_types = dict(SPATIAL_TYPES)
-        augmented_result = view.augment_result(self.su_result)
+        augmented_result, = view.augment_results([self.su_result])
         assert augmented_result['entity_type'] == "Location"
         assert augmented_result['url'] == self.su.get_absolute_url()
         assert augmented_result['main_label'] == "Apartment"
         assert augmented_result['attributes'] == []
 
-    def test_augment_result_party(self):
-        augmented_result = self.view_class().augment_result(self.party_result)
+    def test_augment_results_party(self):
+        augmented_result, = self.view_class().augment_results(
+            [self.party_result])
         assert augmented_result['entity_type'] == "Party"
         assert augmented_result['url'] == self.party.get_absolute_url()
         assert augmented_result['main_label'] == "Party in the USA"
@@ -561,7 +543,7 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         assert len(attributes) == 1
         assert ("Type", "Group") in attributes
 
-    def test_augment_result_tenure_rel(self):
+    def test_augment_results_tenure_rel(self):
         question = q_factories.QuestionFactory.create(
             questionnaire=self.questionnaire,
             name='location_type',
@@ -576,8 +558,7 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         view = self.view_class()
         view.tenure_types = dict(TENURE_RELATIONSHIP_TYPES)
         view.spatial_types = dict(SPATIAL_TYPES)
-        augmented_result = view.augment_result(
-            self.tenure_rel_result)
+        augmented_result, = view.augment_results([self.tenure_rel_result])
         assert augmented_result['entity_type'] == "Relationship"
         assert augmented_result['url'] == self.tenure_rel.get_absolute_url()
         assert augmented_result['main_label'] == "Customary Rights"
@@ -586,9 +567,9 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         assert ("Party", "Party in the USA") in attributes
         assert ("Location type", self.su.name) in attributes
 
-    def test_augment_result_resource(self):
-        augmented_result = self.view_class().augment_result(
-            self.resource_result)
+    def test_augment_results_resource(self):
+        augmented_result, = self.view_class().augment_results(
+            [self.resource_result])
         assert augmented_result['entity_type'] == "Resource"
         assert augmented_result['url'] == self.resource.get_absolute_url()
         assert augmented_result['main_label'] == "Goat"
@@ -599,36 +580,88 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
                 "Let's pretend there's a description.") in attributes
         assert augmented_result['image'] == self.resource.thumbnail
 
-    def test_augment_result_nonexistent_entity(self):
-        assert self.view_class().augment_result({
+    def test_augment_results_nonexistent_entity(self):
+        assert self.view_class().augment_results([{
             '_type': 'spatial',
             '_source': {},
-        }) is None
+        }]) == []
+
+    def get_entity(self, es_type, source):
+        entity, = self.view_class().get_entities(
+            [{'_type': es_type, '_source': source}])
+        return entity
 
-    def test_get_entity_location(self):
-        assert self.view_class().get_entity(
+    def test_get_entities_location(self):
+        assert self.get_entity(
             'spatial', self.su_result['_source']) == self.su
 
-    def test_get_entity_party(self):
-        assert self.view_class().get_entity(
+    def test_get_entities_party(self):
+        assert self.get_entity(
             'party', self.party_result['_source']) == self.party
 
-    def test_get_entity_tenure_rel(self):
-        assert self.view_class().get_entity(
+    def test_get_entities_tenure_rel(self):
+        assert self.get_entity(
             'party', self.tenure_rel_result['_source']) == self.tenure_rel
 
-    def test_get_entity_resource(self):
-        assert self.view_class().get_entity(
+    def test_get_entities_resource(self):
+        assert self.get_entity(
             'resource', self.resource_result['_source']) == self.resource
 
-    def test_get_entity_null_id(self):
-        assert self.view_class().get_entity('spatial', {'id': None}) is None
+    def test_get_entities_null_id(self):
+        assert self.get_entity('spatial', {'id': None}) is None
+
+    def test_get_entities_nonexistent_id(self):
+        assert self.get_entity('spatial', {'id': 'xx'}) is None
+
+    def test_get_entities_unsupported_es_type(self):
+        assert self.get_entity('project', {}) is None
+
+    def test_get_entities(self):
+        results = self.results['hits']['hits'][1:] + [
+            {'_type': 'spatial', '_source': {'id': 'xx'}},
+            {'_type': 'party', '_source': {'tenure_id': 'xx',
+                                           'id': self.party.id}},
+        ]
+        with self.assertNumQueries(4):
+            entities = self.view_class().get_entities(results)
+        assert entities == [self.su, self.party, self.tenure_rel,
+                            self.resource, None, self.party]
+
+    def create_results(self, count):
+        results = []
+        for _ in range(count):
+            su = SpatialUnitFactory.create(project=self.project, type='CB')
+            party = PartyFactory.create(project=self.project, type='IN')
+            tenure_rel = TenureRelationshipFactory.create(
+                spatial_unit=su, party=party, project=self.project)
+            resource = ResourceFactory.create(project=self.project)
+            results.extend(get_fake_es_api_results(
+                self.project, su, party, tenure_rel, resource
+            )['hits']['hits'][1:])
+        return results
+
+    def get_search_view(self):
+        view = self.view_class()
+        view.tenure_types = dict(TENURE_RELATIONSHIP_TYPES)
+        view.spatial_types = dict(SPATIAL_TYPES)
+        return view
+
+    def test_augment_results_query_count(self):
+        few = self.create_results(1)
+        many = self.create_results(10)
+        # warm up process-wide caches such as content types and labels
+        self.get_search_view().augment_results(few)
 
-    def test_get_entity_nonexistent_id(self):
-        assert self.view_class().get_entity('spatial', {'id': 'xx'}) is None
+        view = self.get_search_view()
+        with CaptureQueriesContext(connection) as few_queries:
+            assert len(view.augment_results(few)) == 4
 
-    def test_get_entity_unsupported_es_type(self):
-        assert self.view_class().get_entity('project', {}) is None
+        view = self.get_search_view()
+        with CaptureQueriesContext(connection) as many_queries:
+            augmented = view.augment_results(many)
+        assert len(augmented) == 40
+        assert len(many_queries) == len(few_queries)
+        assert augmented[:4] == view.augment_results(many[:4])
 
     def test_get_main_label_location(self):
         view = self.view_class()
@@ -719,253 +752,137 @@ class SearchAPITest(APITestCase, UserTestCase, TestCase):
         assert self.view_class().htmlize_result(augmented_result) == expected
 
 
-class MyCompletedProcess:
-
-    def __init__(self, returncode):
-        self.returncode = returncode
-
-    def check_returncode(self):
-        if self.returncode:
-            raise subprocess.CalledProcessError(6, 'curl')
-
-
-def mock_subprocess_run_curl(*args):
-    assert args[0][0] == 'curl'
-    ensure_dirs()
-    original_es_dump_path = os.path.join(
-        os.path.dirname(settings.BASE_DIR),
-        'search/tests/files/test_es_dump_basic.esjson'
-    )
-    shutil.copy(original_es_dump_path, args[0][2])
-    return MyCompletedProcess(0)
-
-
-def mock_subprocess_run_curl_with_error(*args):
-    return MyCompletedProcess(1)
-
-
-# @pytest.mark.usefixtures('clear_temp')
-# @pytest.mark.usefixtures('make_dirs')
-# class SearchExportAPITest(ViewTestCase, UserTestCase, TestCase):
-
-#     view_class = async.SearchExport
-
-#     def setup_models(self):
-#         self.user = UserFactory.create()
-#         assign_policies(self.user)
-#         self.project = ProjectFactory.create(slug='test-project')
-
-#     def setup_url_kwargs(self):
-#         return {
-#             'organization': self.project.organization.slug,
-#             'project': self.project.slug,
-#         }
-
-#     # Note: The following 4 tests, which correspond to the 4 export formats,
-#     # skip django-skivvy in order to test that the downloaded file contents
-#     # was generated by the correct exporter class
-
-#     @patch('subprocess.run', new=mock_subprocess_run_curl)
-#     def test_post_shp_type(self):
-#         self.client.force_login(self.user)
-#         response = self.client.post(
-#             reverse('async:search:export', kwargs=self.setup_url_kwargs()),
-#             {'q': 'searching', 'type': 'shp'},
-#         )
-#         assert response.status_code == 200
-#         assert (response.__getitem__('content-disposition') ==
-#                 'attachment; filename={}.zip'.format(self.project.slug))
-#         assert response.__getitem__('content-type') == 'application/zip'
-
-#         # Dump content to a file
-#         zip_path = os.path.join(test_dir, 'tmp.zip')
-#         f = open(zip_path, 'wb')
-#         f.write(response.content)
-#         f.close()
-
-#         # Sanity content checks (full checking is done in test_export.py)
-#         with ZipFile(zip_path) as myzip:
-#             files = myzip.namelist()
-#             assert len(files) == 8
-#             assert 'README.txt' in files
-#             assert 'locations.csv' in files
-#             assert 'point.shp' in files
-
-#             with myzip.open('locations.csv') as csv_file:
-#                 rows = list(csv.reader(io.TextIOWrapper(csv_file)))
-#                 assert rows[0][0] == 'id'
-#                 assert rows[1][0] == 'ID0'
-
-#     @patch('subprocess.run', new=mock_subprocess_run_curl)
-#     def test_post_xls_type(self):
-#         self.client.force_login(self.user)
-#         response = self.client.post(
-#             reverse('async:search:export', kwargs=self.setup_url_kwargs()),
-#             {'q': 'searching', 'type': 'xls'},
-#         )
-#         assert response.status_code == 200
-#         assert (response.__getitem__('content-disposition') ==
-#                 'attachment; filename={}.xlsx'.format(self.project.slug))
-#         assert (response.__getitem__('content-type') ==
-#                 'application/vnd.openxmlformats-officedocument'
-#                 '.spreadsheetml.sheet')
-
-#         # Dump content to a file
-#         xls_path = os.path.join(test_dir, 'tmp.xlsx')
-#         f = open(xls_path, 'wb')
-#         f.write(response.content)
-#         f.close()
-
-#         # Sanity content checks (full checking is done in test_export.py)
-#         wb = load_workbook(xls_path)
-#         assert wb.get_sheet_names() == [
-#             'locations', 'parties', 'relationships']
-#         assert wb['locations']['B1'].value == 'geometry.ewkt'
-#         assert wb['locations']['D1'].value is None
-#         assert wb['locations']['B2'].value == 'SRID=4326;POINT (1 1)'
-#         assert wb['locations']['D2'].value is None
-
-#     @patch('subprocess.run', new=mock_subprocess_run_curl)
-#     def xtest_post_res_type(self):
-#         self.client.force_login(self.user)
-#         response = self.client.post(
-#             reverse('async:search:export', kwargs=self.setup_url_kwargs()),
-#             {'q': 'searching', 'type': 'res'},
-#         )
-#         assert response.status_code == 200
-#         assert (response.__getitem__('content-disposition') ==
-#                 'attachment; filename={}.zip'.format(self.project.slug))
-#         assert response.__getitem__('content-type') == 'application/zip'
-
-#         # Dump content to a file
-#         zip_path = os.path.join(test_dir, 'tmp.zip')
-#         f = open(zip_path, 'wb')
-#         f.write(response.content)
-#         f.close()
-
-#         # Sanity content checks (full checking is done in test_export.py)
-#         with ZipFile(zip_path) as myzip:
-#             files = myzip.namelist()
-#             assert len(files) == 2
-#             assert 'resources.xlsx' in files
-#             assert 'resources/baby_goat.jpeg' in files
-
-#             myzip.extract('resources.xlsx', test_dir)
-#             wb = load_workbook(os.path.join(test_dir, 'resources.xlsx'))
-#             assert wb.get_sheet_names() == ['resources']
-#             assert wb['resources']['G1'].value == 'relationships'
-#             assert wb['resources']['A2'].value == 'ID3'
-#             assert wb['resources']['E2'].value is None
-#             assert wb['resources']['F2'].value is None
-#             assert wb['resources']['G2'].value is None
-
-#     @patch('subprocess.run', new=mock_subprocess_run_curl)
-#     def xtest_post_all_type(self):
-#         self.client.force_login(self.user)
-#         response = self.client.post(
-#             reverse('async:search:export', kwargs=self.setup_url_kwargs()),
-#             {'q': 'searching', 'type': 'all'},
-#         )
-#         assert response.status_code == 200
-#         assert (response.__getitem__('content-disposition') ==
-#                 'attachment; filename={}.zip'.format(self.project.slug))
-#         assert response.__getitem__('content-type') == 'application/zip'
-
-#         # Dump content to a file
-#         zip_path = os.path.join(test_dir, 'tmp.zip')
-#         f = open(zip_path, 'wb')
-#         f.write(response.content)
-#         f.close()
-
-#         # Sanity content checks (full checking is done in test_export.py)
-#         with ZipFile(zip_path) as myzip:
-#             files = myzip.namelist()
-#             assert len(files) == 8
-#             assert 'data.xlsx' in files
-#             assert 'resources.xlsx' in files
-#             assert 'resources/baby_goat.jpeg' in files
-#             assert 'shape_files/README.txt' in files
-#             assert 'shape_files/point.shp' in files
-
-#             myzip.extract('resources.xlsx', test_dir)
-#             wb = load_workbook(os.path.join(test_dir, 'resources.xlsx'))
-#             assert wb.get_sheet_names() == ['resources']
-#             assert wb['resources']['G1'].value == 'relationships'
-#             assert wb['resources']['A2'].value == 'ID3'
-#             assert wb['resources']['E2'].value is None
-#             assert wb['resources']['F2'].value is None
-#             assert wb['resources']['G2'].value is None
-
-#             myzip.extract('data.xlsx', test_dir)
-#             wb = load_workbook(os.path.join(test_dir, 'data.xlsx'))
-#             assert wb.get_sheet_names() == [
-#                 'locations', 'parties', 'relationships']
-#             assert wb['locations']['B1'].value == 'geometry.ewkt'
-#             assert wb['locations']['D1'].value is None
-#             assert wb['locations']['B2'].value == 'SRID=4326;POINT (1 1)'
-#             assert wb['locations']['D2'].value is None
-
-#     def test_post_with_missing_query(self):
-#         response = self.request(user=self.user,
-#                                 method='POST',
-#                                 post_data={'type': 'all'})
-#         assert response.status_code == 400
-
-#     def test_post_with_invalid_type(self):
-#         response = self.request(user=self.user,
-#                                 method='POST',
-#                                 post_data={'q': 'test', 'type': 'nonsense'})
-#         assert response.status_code == 400
-
-#     def test_post_with_nonexistent_org(self):
-#         with pytest.raises(Http404):
-#             self.request(user=self.user,
-#                          method='POST',
-#                          url_kwargs={'organization': 'evil-corp'},
-#                          post_data={'q': 'test', 'type': 'all'})
-
-#     def test_post_with_nonexistent_project(self):
-#         with pytest.raises(Http404):
-#             self.request(user=self.user,
-#                          method='POST',
-#                          url_kwargs={'project': 'world-domination'},
-#                          post_data={'q': 'test', 'type': 'all'})
-
-#     def test_post_with_unauthorized_user(self):
-#         with pytest.raises(PermissionDenied):
-#             self.request(method='POST',
-#                          post_data={'q': 'test', 'type': 'all'})
-
-#     @patch('subprocess.run')
-#     def test_query_es(self, mock_run):
-#         es_dump_path = self.view_class().query_es(
-#             'projectid', 'userid', 'query')
-#         expected_path_begin = os.path.join(
-#             settings.MEDIA_ROOT,
-#             'temp/projectid-userid-'
-#         )
-#         query_dsl = {
-#             'query': parse_query('query'),
-#             'from': 0,
-#             'size': settings.ES_MAX_RESULTS,
-#             'sort': {'_score': {'order': 'desc'}},
-#         }
-#         query_dsl_param = url_quote(json.dumps(query_dsl), safe='')
-#         assert (es_dump_path[0:len(expected_path_begin)] ==
-#                 expected_path_begin)
-#         assert '.esjson' in es_dump_path
-#         mock_run.assert_called_once_with([
-#             'curl',
-#             '-o', es_dump_path,
-#             '-f',
-#             '-XGET',
-#             (
-#                 '{}/project-projectid/spatial,party,resource/_data/'
-#                 '?format=json&source={}'
-#             ).format(api_url, query_dsl_param)
-#         ])
-
-#     @patch('subprocess.run', new=mock_subprocess_run_curl_with_error)
-#     def test_query_es_with_curl_error(self):
-#         with pytest.raises(subprocess.CalledProcessError):
-#             self.view_class().query_es('projectid', 'userid', 'query')
+@override_settings(ES_EXPORT_BATCH_SIZE=2)
+@patch('search.views.async.get_client', new=mock_es_client)
+class SearchExportAPITest(ViewTestCase, UserTestCase, TestCase):
+
+    view_class = async.SearchExport
+
+    def setup_models(self):
+        self.user = UserFactory.create()
+        assign_policies(self.user)
+        self.project = ProjectFactory.create(slug='test-project')
+        self.location = SpatialUnitFactory.create(
+            project=self.project, geometry='SRID=4326;POINT(1 1)')
+        self.parties = PartyFactory.create_batch(2, project=self.project)
+        TenureRelationshipFactory.create(
+            project=self.project, spatial_unit=self.location,
+            party=self.parties[0])
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.project.organization.slug,
+            'project': self.project.slug,
+        }
+
+    def export(self, data):
+        self.client.force_login(self.user)
+        return self.client.post(
+            reverse('async:search:export', kwargs=self.setup_url_kwargs()),
+            data)
+
+    def read(self, response):
+        content = b''.join(response.streaming_content)
+        response.close()
+        return io.BytesIO(content)
+
+    # Note: The following tests skip django-skivvy in order to test that
+    # the downloaded file contents was generated by the correct exporter
+    # class
+
+    def test_post_shp_type(self):
+        response = self.export({'q': 'searching', 'type': 'shp'})
+        assert response.status_code == 200
+        assert (response['content-disposition'] ==
+                'attachment; filename={}.zip'.format(self.project.slug))
+        assert response['content-type'] == 'application/zip'
+
+        # Sanity content checks (full checking is done in test_export.py)
+        with ZipFile(self.read(response)) as myzip:
+            files = myzip.namelist()
+            assert len(files) == 8
+            assert 'README.txt' in files
+            assert 'locations.csv' in files
+            assert 'point.shp' in files
+
+            with myzip.open('locations.csv') as csv_file:
+                rows = list(csv.reader(io.TextIOWrapper(csv_file)))
+                assert rows[0][0] == 'id'
+                assert rows[1][0] == self.location.id
+
+            with myzip.open('parties.csv') as csv_file:
+                rows = list(csv.reader(io.TextIOWrapper(csv_file)))
+                assert len(rows) == 3
+
+    def test_post_xls_type(self):
+        response = self.export({'q': 'searching', 'type': 'xls'})
+        assert response.status_code == 200
+        assert (response['content-disposition'] ==
+                'attachment; filename={}.xlsx'.format(self.project.slug))
+        assert (response['content-type'] ==
+                'application/vnd.openxmlformats-officedocument'
+                '.spreadsheetml.sheet')
+        assert int(response['content-length']) > 0
+
+        # Sanity content checks (full checking is done in test_export.py)
+        wb = load_workbook(self.read(response))
+        assert wb.get_sheet_names() == [
+            'locations', 'parties', 'relationships']
+        assert wb['locations']['B1'].value == 'geometry.ewkt'
+        assert wb['locations']['B2'].value == 'SRID=4326;POINT (1 1)'
+        # Results are not capped at the batch size
+        assert wb['parties'].max_row == 3
+        assert wb['relationships'].max_row == 2
+
+    @patch('time.sleep')
+    def test_post_with_unavailable_es(self, sleep):
+        response = self.export({'q': 'error', 'type': 'xls'})
+        assert response.status_code == 503
+
+    def test_post_with_missing_query(self):
+        response = self.request(user=self.user,
+                                method='POST',
+                                post_data={'type': 'xls'})
+        assert response.status_code == 400
+
+    def test_post_with_invalid_type(self):
+        response = self.request(user=self.user,
+                                method='POST',
+                                post_data={'q': 'test', 'type': 'nonsense'})
+        assert response.status_code == 400
+
+    def test_post_with_nonexistent_org(self):
+        with pytest.raises(Http404):
+            self.request(user=self.user,
+                         method='POST',
+                         url_kwargs={'organization': 'evil-corp'},
+                         post_data={'q': 'test', 'type': 'xls'})
+
+    def test_post_with_nonexistent_project(self):
+        with pytest.raises(Http404):
+            self.request(user=self.user,
+                         method='POST',
+                         url_kwargs={'project': 'world-domination'},
+                         post_data={'q': 'test', 'type': 'xls'})
+
+    def test_post_with_unauthorized_user(self):
+        with pytest.raises(PermissionDenied):
+            self.request(method='POST',
+                         post_data={'q': 'test', 'type': 'xls'})
+
+    def test_query_es(self):
+        batches = list(self.view_class().query_es(self.project.id, 'query'))
+        assert [len(hits) for hits in batches] == [2, 2]
+
+    def test_query_es_body(self):
+        client = MagicMock()
+        with patch('search.views.async.get_client', return_value=client):
+            self.view_class().query_es('projectid', 'query')
+        client.scroll.assert_called_once_with(
+            'project-projectid/spatial,party,resource/_search/',
+            {
+                'query': parse_query('query'),
+                'size': 2,
+                'sort': ['_doc'],
+            },
+            keep_alive=settings.ES_SCROLL_KEEP_ALIVE)
@@ -1,23 +1,24 @@
+import hashlib
 import json
-# import os
-import requests
-# import subprocess
-# import time
+import os
+import shutil
+import tempfile
 
 from django.conf import settings
-# from django.http import HttpResponse, HttpResponseBadRequest
-from django.utils.translation import ugettext as _
-from django.core.exceptions import ObjectDoesNotExist
-from django.template.loader import render_to_string
-# from django.views.generic.base import View
+from django.http import (FileResponse, HttpResponse,
+                         HttpResponseBadRequest)
+from django.utils.translation import get_language, ugettext as _
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.views.generic.base import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
-# from urllib.parse import quote as url_quote
 
 from jsonattrs.models import Schema
 from tutelary import mixins as tmixins
 
-# from organization import messages as org_messages
+from organization import messages as org_messages
 from organization.views.mixins import ProjectMixin
 from spatial.models import SpatialUnit
 from spatial.choices import TYPE_CHOICES as SPATIAL_TYPE_CHOICES
@@ -25,16 +26,45 @@ from party.models import Party, TenureRelationship
 from party.choices import TENURE_RELATIONSHIP_TYPES
 from core.form_mixins import get_types
 from resources.models import Resource
+from resources.utils.io import ensure_dirs
+from ..backends import get_backends
+from ..client import get_client
+from ..exceptions import ESUnavailable
+from ..indexing import get_index_version
 from ..parser import parse_query
 # from ..export.all import AllExporter
+from ..export.base import iter_hits
 # from ..export.resource import ResourceExporter
-# from ..export.shape import ShapeExporter
-# from ..export.xls import XLSExporter
+from ..export.shape import ShapeExporter
+from ..export.xls import XLSExporter
 
-api_url = (
-    settings.ES_SCHEME + '://' + settings.ES_HOST + ':' + settings.ES_PORT)
 party_type_choices = {c[0]: c[1] for c in Party.TYPE_CHOICES}
 
+RESULT_CACHE_TIMEOUT = 60 * 60
+
+# ES types and the models their documents are loaded from, tried in
+# order, each with the source field holding the database ID.
+ENTITY_MAPPINGS = {
+    'spatial': (
+        (SpatialUnit, 'id'),
+    ),
+    'party': (
+        (TenureRelationship, 'tenure_id'),
+        (Party, 'id'),
+    ),
+    'resource': (
+        (Resource, 'id'),
+    ),
+}
+
+# Related objects needed to render a result, loaded with the entities
+ENTITY_RELATED = {
+    SpatialUnit: ('project__organization',),
+    Party: ('project__organization',),
+    TenureRelationship: ('project__organization', 'spatial_unit__project'),
+    Resource: ('project__organization',),
+}
+
 
 class Search(tmixins.APIPermissionRequiredMixin, ProjectMixin, APIView):
 
@@ -49,6 +79,60 @@ class Search(tmixins.APIPermissionRequiredMixin, ProjectMixin, APIView):
         page_size = int(request.data.get('length', 10))
         dataTablesDraw = int(request.data['draw'])
 
+        page = {
+            'recordsTotal': 0,
+            'recordsFiltered': 0,
+            'data': [],
+            'timestamp': '',
+        }
+        if query:
+            page = self.get_page(query, start_idx, page_size)
+            if page is None:
+                return Response({
+                    'draw': dataTablesDraw,
+                    'recordsTotal': 0,
+                    'recordsFiltered': 0,
+                    'data': [],
+                    'error': 'unavailable',
+                })
+
+        return Response(dict(page, draw=dataTablesDraw))
+
+    def get_cache_key(self, project_id, query, start_idx, page_size,
+                      timestamp):
+        """Returns the cache key of a page of search results. The key
+        includes the index timestamp and the version bumped by
+        incremental index updates, so changes to the index invalidate
+        cached results."""
+        dsl = json.dumps(parse_query(query), sort_keys=True)
+        key = '\n'.join((dsl, str(start_idx), str(page_size),
+                         get_language() or '', timestamp,
+                         get_index_version(project_id)))
+        return 'search.results.{}.{}'.format(
+            project_id, hashlib.sha1(key.encode()).hexdigest())
+
+    def get_page(self, query, start_idx, page_size):
+        """Returns a rendered page of search results, from the cache if
+        the project index has not changed since it was rendered, or
+        ``None`` if no search backend is available."""
+        project = self.get_project()
+        timestamp = self.query_timestamp(project.id)
+        if timestamp == _("unknown"):
+            return self.search(query, start_idx, page_size, timestamp)
+
+        cache_key = self.get_cache_key(
+            project.id, query, start_idx, page_size, timestamp)
+        page = cache.get(cache_key)
+        if page is None:
+            page = self.search(query, start_idx, page_size, timestamp)
+            if page is not None and self.search_backend.cache_results:
+                cache.set(cache_key, page, RESULT_CACHE_TIMEOUT)
+        return page
+
+    def search(self, query, start_idx, page_size, timestamp):
+        """Queries the search backends and renders a page of results.
+        ``timestamp`` is the index timestamp reported when the page has
+        no results."""
         project = self.get_project()
         tenure_types = get_types(
             'tenure_type',
@@ -64,92 +148,62 @@ class Search(tmixins.APIPermissionRequiredMixin, ProjectMixin, APIView):
             include_labels=True)
         self.spatial_types = dict(spatial_types)
 
-        results_as_html = []
-        num_hits = 0
-        timestamp = ''
+        raw_results = self.query_backends(
+            project.id, query, start_idx, page_size)
+        if raw_results is None:
+            return None
 
-        if query:
-            raw_results = self.query_es(
-                self.get_project().id, query, start_idx, page_size)
-            if raw_results is None:
-                return Response({
-                    'draw': dataTablesDraw,
-                    'recordsTotal': 0,
-                    'recordsFiltered': 0,
-                    'data': [],
-                    'error': 'unavailable',
-                })
+        num_hits = min(raw_results['hits']['total'],
+                       settings.ES_MAX_RESULTS)
+        results = raw_results['hits']['hits']
 
-            num_hits = min(raw_results['hits']['total'],
-                           settings.ES_MAX_RESULTS)
-            results = raw_results['hits']['hits']
-
-            if len(results) == 0:
-                timestamp = self.query_es_timestamp(project.id)
-            else:
-                timestamp = results[0]['_source'].get('@timestamp')
-
-            for result in results:
-                if result['_type'] == 'project':
-                    continue
-                augmented_result = self.augment_result(result)
-                if augmented_result is None:
-                    continue
-                html = self.htmlize_result(augmented_result)
-                results_as_html.append([html])
-
-        return Response({
-            'draw': dataTablesDraw,
+        if len(results) > 0:
+            timestamp = results[0]['_source'].get('@timestamp')
+
+        results = [r for r in results if r['_type'] != 'project']
+        results_as_html = [
+            [self.htmlize_result(augmented_result)]
+            for augmented_result in self.augment_results(results)
+        ]
+
+        return {
             'recordsTotal': num_hits,
             'recordsFiltered': num_hits,
             'data': results_as_html,
             'timestamp': timestamp,
-        })
-
-    def query_es(self, project_id, query, start_idx, page_size):
-        """Queries the ES API based on the UI query string and returns the
-        raw ES JSON results."""
-        body = {
-            'query': parse_query(query),
-            'from': start_idx,
-            'size': page_size,
-            'sort': {'_score': {'order': 'desc'}},
         }
-        try:
-            url = '{}/project-{}/spatial,party,resource/_search/'
-            r = requests.post(
-                url.format(api_url, project_id),
-                data=json.dumps(body, sort_keys=True),
-                headers={'content-type': 'application/json'},
-                timeout=10,
-            )
-            if r.status_code == 200:
-                return r.json()
-            else:
-                return None
-        except requests.exceptions.RequestException:
-            return None
 
-    def query_es_timestamp(self, project_id):
-        """Queries the ES API project type to get the index timestamp."""
-        try:
-            url = '{}/project-{}/project/_search/?q=*'
-            r = requests.get(url.format(api_url, project_id), timeout=10)
-            if r.status_code == 200:
-                return r.json()['hits']['hits'][0]['_source'].get('@timestamp')
-            else:
-                return _("unknown")
-        except requests.exceptions.RequestException:
-            return _("unknown")
-
-    def augment_result(self, result):
-        """Returns an augmented data suitable for plugging into HTML
-        given the raw ES result."""
-        es_type = result['_type']
-        source = result['_source']
-        entity = self.get_entity(es_type, source)
-        if entity is None:
-            return None
+    def query_backends(self, project_id, query, start_idx, page_size):
+        """Returns the raw results of the first search backend that is
+        available, or ``None`` if none is. The backend is kept in
+        ``search_backend``."""
+        self.search_backend = None
+        for backend in get_backends():
+            results = backend.search(project_id, query, start_idx, page_size)
+            if results is not None:
+                self.search_backend = backend
+                return results
+        return None
+
+    def query_timestamp(self, project_id):
+        """Returns the index timestamp of the first search backend that
+        knows it."""
+        for backend in get_backends():
+            timestamp = backend.get_timestamp(project_id)
+            if timestamp is not None:
+                return timestamp
+        return _("unknown")
+
+    def augment_results(self, results):
+        """Returns the augmented data of a page of raw ES results, loading
+        the entities of all results at once. Results whose entity no
+        longer exists are dropped."""
+        entities = self.get_entities(results)
+        return [self.augment_entity(entity, result['_source'])
+                for entity, result in zip(entities, results)
+                if entity is not None]
+
+    def augment_entity(self, entity, source):
         model = type(entity)
 
         augmented_result = {
@@ -163,43 +217,34 @@ class Search(tmixins.APIPermissionRequiredMixin, ProjectMixin, APIView):
 
         return augmented_result
 
-    def get_entity(self, es_type, source):
-        """Returns the model instance for a search result given its ES type and
-        the result source document, which should contain the database ID."""
-        mappings = {
-            'spatial': (
-                {
-                    'model': SpatialUnit,
-                    'id_field_name': 'id',
-                },
-            ),
-            'party': (
-                {
-                    'model': TenureRelationship,
-                    'id_field_name': 'tenure_id',
-                },
-                {
-                    'model': Party,
-                    'id_field_name': 'id',
-                },
-            ),
-            'resource': (
-                {
-                    'model': Resource,
-                    'id_field_name': 'id',
-                },
-            ),
-        }
-        mapping = mappings.get(es_type)
-        if mapping:
-            for model_map in mapping:
-                id = source.get(model_map['id_field_name'])
+    def get_entities(self, results):
+        """Returns the model instances for a list of raw ES results, in the
+        same order, with one query per model. Missing entities are None."""
+        ids = {}
+        for result in results:
+            mapping = ENTITY_MAPPINGS.get(result['_type'], ())
+            for model, id_field_name in mapping:
+                id = result['_source'].get(id_field_name)
                 if id:
-                    try:
-                        return model_map['model'].objects.get(id=id)
-                    except ObjectDoesNotExist:
-                        pass
-        return None
+                    ids.setdefault(model, set()).add(id)
+
+        instances = {
+            model: model.objects.select_related(
+                *ENTITY_RELATED[model]).in_bulk(list(model_ids))
+            for model, model_ids in ids.items()
+        }
+
+        entities = []
+        for result in results:
+            entity = None
+            mapping = ENTITY_MAPPINGS.get(result['_type'], ())
+            for model, id_field_name in mapping:
+                id = result['_source'].get(id_field_name)
+                entity = instances.get(model, {}).get(id) if id else None
+                if entity is not None:
+                    break
+            entities.append(entity)
+        return entities
 
     def get_main_label(self, model, source):
         """Returns the search result's main UI label."""
@@ -213,13 +258,11 @@ class Search(tmixins.APIPermissionRequiredMixin, ProjectMixin, APIView):
     def get_attributes(self, entity, source):
         """Returns additional display data for the result."""
         if type(entity) == SpatialUnit:
-            attributes = []
-            schema = Schema.objects.from_instance(entity)
-            attrs = [a for s in schema for a in s.attributes.all()]
-            attributes.extend([
+            attributes = [
                 (a.long_name, a.render(entity.attributes.get(a.name, '—')))
-                for a in attrs if not a.omit and 'name' in a.name
-            ])
+                for a in self.get_schema_attributes(entity)
+                if not a.omit and 'name' in a.name
+            ]
         elif type(entity) == Party:
             label = party_type_choices.get(source.get('type'), '—')
             attributes = [(_("Type"), label)]
@@ -235,68 +278,90 @@ class Search(tmixins.APIPermissionRequiredMixin, ProjectMixin, APIView):
             ]
         return attributes
 
+    def get_schema_attributes(self, entity):
+        """Returns the attributes of the schemas that apply to an entity.
+        Schemas are looked up once per distinct set of selectors."""
+        content_type = ContentType.objects.get_for_model(entity)
+        label = '{}.{}'.format(content_type.app_label, content_type.model)
+        selectors = []
+        for path in settings.JSONATTRS_SCHEMA_SELECTORS[label]:
+            value = entity
+            for name in path.split('.'):
+                value = getattr(value, name)
+            selectors.append(value)
+
+        if not hasattr(self, '_schema_attributes'):
+            self._schema_attributes = {}
+        key = (content_type.id, tuple(selectors))
+        if key not in self._schema_attributes:
+            schemas = Schema.objects.lookup(content_type=content_type,
+                                            selectors=selectors)
+            self._schema_attributes[key] = [
+                a for s in schemas for a in s.attributes.all()]
+        return self._schema_attributes[key]
+
     def htmlize_result(self, result):
         """Formats the search result into an HTML snippet."""
-        return render_to_string(
-            'search/search_result_item.html', {'result': result})
-
-
-# class SearchExport(tmixins.PermissionRequiredMixin, ProjectMixin, View):
-
-#     permission_required = 'project.download'
-#     permission_denied_message = org_messages.PROJ_DOWNLOAD
-#     raise_exception = True
-
-#     exporters = {
-#         'shp': ShapeExporter,
-#         'xls': XLSExporter,
-#         # 'res': ResourceExporter,
-#         # 'all': AllExporter,
-#     }
-
-#     def get_perms_objects(self):
-#         return [self.get_project()]
-
-#     def post(self, request, *args, **kwargs):
-#         query = request.POST.get('q')
-#         export_format = request.POST.get('type')
-#         if not query or export_format not in self.exporters.keys():
-#             return HttpResponseBadRequest()
-
-#         project = self.get_project()
-#         es_dump_path = self.query_es(project.id, request.user.id, query)
-#         exporter = self.exporters[export_format](project)
-#         path, mime_type = exporter.make_download(es_dump_path)
-
-#         ext = os.path.splitext(path)[1]
-#         response = HttpResponse(open(path, 'rb'), content_type=mime_type)
-#         response['Content-Disposition'] = ('attachment; filename=' +
-#                                            project.slug + ext)
-#         return response
-
-#     def query_es(self, project_id, user_id, query):
-#         """Run a curl command to ES and dump the results into a temp file."""
-
-#         query_dsl = {
-#             'query': parse_query(query),
-#             'from': 0,
-#             'size': settings.ES_MAX_RESULTS,
-#             'sort': {'_score': {'order': 'desc'}},
-#         }
-#         query_dsl_param = url_quote(json.dumps(query_dsl), safe='')
-#         t = round(time.time() * 1000)
-#         es_dump_path = os.path.join(
-#             settings.MEDIA_ROOT,
-#             'temp/{}-{}-{}.esjson'.format(project_id, user_id, t)
-#         )
-#         subprocess.run([
-#             'curl',
-#             '-o', es_dump_path,
-#             '-f',
-#             '-XGET',
-#             (
-#                 '{}/project-{}/spatial,party,resource/_data/'
-#                 '?format=json&source={}'
-#             ).format(api_url, project_id, query_dsl_param)
-#         ]).check_returncode()
-#         return es_dump_path
+        if not hasattr(self, '_result_template'):
+            self._result_template = get_template(
+                'search/search_result_item.html')
+        return self._result_template.render({'result': result})
+
+
+class SearchExport(tmixins.PermissionRequiredMixin, ProjectMixin, View):
+
+    permission_required = 'project.download'
+    permission_denied_message = org_messages.PROJ_DOWNLOAD
+    raise_exception = True
+
+    exporters = {
+        'shp': ShapeExporter,
+        'xls': XLSExporter,
+        # 'res': ResourceExporter,
+        # 'all': AllExporter,
+    }
+
+    def get_perms_objects(self):
+        return [self.get_project()]
+
+    def post(self, request, *args, **kwargs):
+        query = request.POST.get('q')
+        export_format = request.POST.get('type')
+        if not query or export_format not in self.exporters.keys():
+            return HttpResponseBadRequest()
+
+        project = self.get_project()
+        exporter = self.exporters[export_format](project)
+        temp_dir = tempfile.mkdtemp(dir=ensure_dirs())
+        try:
+            # Hits are written to the export as they arrive from ES;
+            # the export file name is derived from the dump path.
+            es_dump_path = os.path.join(temp_dir, project.slug + '.esjson')
+            hits = iter_hits(self.query_es(project.id, query))
+            path, mime_type = exporter.make_download(es_dump_path, hits=hits)
+            f = open(path, 'rb')
+        except ESUnavailable:
+            return HttpResponse(_("Search is currently unavailable."),
+                                status=503)
+        finally:
+            # The open export file stays readable after it is removed
+            shutil.rmtree(temp_dir)
+
+        ext = os.path.splitext(path)[1]
+        response = FileResponse(f, content_type=mime_type)
+        response['Content-Disposition'] = ('attachment; filename=' +
+                                           project.slug + ext)
+        response['Content-Length'] = os.fstat(f.fileno()).st_size
+        return response
+
+    def query_es(self, project_id, query):
+        """Scrolls through all ES results of the UI query string and
+        yields them in batches of ``ES_EXPORT_BATCH_SIZE`` hits."""
+        body = {
+            'query': parse_query(query),
+            'size': settings.ES_EXPORT_BATCH_SIZE,
+            'sort': ['_doc'],
+        }
+        return get_client().scroll(
+            'project-{}/spatial,party,resource/_search/'.format(project_id),
+            body, keep_alive=settings.ES_SCROLL_KEEP_ALIVE)
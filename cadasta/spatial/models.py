@@ -6,7 +6,6 @@ from django.db import models
 from django.utils.translation import ugettext as _
 from django.utils.encoding import iri_to_uri
 from django.dispatch import receiver
-from django.utils.translation import get_language
 from organization.models import Project
 from tutelary.decorators import permissioned_model
 from simple_history.models import HistoricalRecords
@@ -14,11 +13,12 @@ from shapely.geometry import Point, Polygon, LineString
 from shapely.wkt import dumps
 
 from . import messages, managers
+from .tiles import invalidate_tiles
 from .choices import TYPE_CHOICES
 from resources.mixins import ResourceModelMixin
 from jsonattrs.fields import JSONAttributeField
 from jsonattrs.decorators import fix_model_for_attributes
-from questionnaires.models import Question
+from questionnaires import labels
 
 
 @fix_model_for_attributes
@@ -117,21 +117,13 @@ class SpatialUnit(ResourceModelMixin, RandomIDModel):
 
     @cached_property
     def location_type_label(self):
-        if not self.project.current_questionnaire:
-            return dict(TYPE_CHOICES)[self.type]
-
-        question = Question.objects.get(
-            questionnaire_id=self.project.current_questionnaire,
-            name='location_type'
-        )
-        label = question.options.get(name=self.type).label_xlat
-        if label is None or isinstance(label, str):
-            return label
-        else:
-            return label.get(
-                get_language(),
-                label[question.questionnaire.default_language]
-            )
+        questionnaire_id = self.project.current_questionnaire
+        if questionnaire_id:
+            options = labels.get_option_labels(questionnaire_id,
+                                               'location_type')
+            if options and self.type in options:
+                return options[self.type]
+        return dict(TYPE_CHOICES).get(self.type)
 
 
 def reassign_spatial_geometry(instance):
@@ -178,6 +170,12 @@ def check_extent(sender, instance, **kwargs):
         reassign_spatial_geometry(instance)
 
 
+@receiver(models.signals.post_save, sender=SpatialUnit)
+@receiver(models.signals.post_delete, sender=SpatialUnit)
+def invalidate_project_tiles(sender, instance, **kwargs):
+    invalidate_tiles(instance.project_id)
+
+
 @receiver(models.signals.post_save, sender=SpatialUnit)
 def refresh_area(sender, instance, **kwargs):
     """ Ensure DB-generated area is set on instance """
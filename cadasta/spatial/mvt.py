@@ -0,0 +1,173 @@
+"""A minimal encoder of Mapbox Vector Tiles (version 2.1 of the spec).
+
+Only what the location tiles need is supported: layers of point, line
+and polygon features with string properties. Geometries are given in
+tile coordinates, with the origin at the top left corner of the tile.
+"""
+from collections import OrderedDict
+
+# Geometry types
+POINT = 1
+LINESTRING = 2
+POLYGON = 3
+
+# Geometry commands
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+
+# Protobuf wire types
+VARINT = 0
+LENGTH_DELIMITED = 2
+
+
+def _varint(value):
+    data = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _uint_field(field, value):
+    return _key(field, VARINT) + _varint(value)
+
+
+def _bytes_field(field, value):
+    return _key(field, LENGTH_DELIMITED) + _varint(len(value)) + value
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _command(command, count):
+    return (command & 0x7) | (count << 3)
+
+
+def _dedupe(points):
+    """Drop consecutive duplicate points."""
+    result = []
+    for point in points:
+        if not result or point != result[-1]:
+            result.append(point)
+    return result
+
+
+def _ring_area(ring):
+    """Twice the signed area of a ring by the surveyor's formula."""
+    return sum(x0 * y1 - x1 * y0
+               for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))
+
+
+class _Cursor:
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+
+    def move(self, points):
+        params = []
+        for x, y in points:
+            params += [_zigzag(x - self.x), _zigzag(y - self.y)]
+            self.x, self.y = x, y
+        return params
+
+
+def encode_points(points):
+    """Encode a list of ``(x, y)`` points as the geometry of a point
+    feature."""
+    if not points:
+        return []
+    return [_command(MOVE_TO, len(points))] + _Cursor().move(points)
+
+
+def encode_lines(lines):
+    """Encode a list of lines, each a list of ``(x, y)`` points, as the
+    geometry of a line feature. Lines of a single point are dropped."""
+    cursor = _Cursor()
+    geometry = []
+    for line in lines:
+        line = _dedupe(line)
+        if len(line) < 2:
+            continue
+        geometry += [_command(MOVE_TO, 1)] + cursor.move(line[:1])
+        geometry += [_command(LINE_TO, len(line) - 1)] + cursor.move(line[1:])
+    return geometry
+
+
+def encode_polygons(polygons):
+    """Encode a list of polygons, each a list of rings whose first ring
+    is the exterior, as the geometry of a polygon feature.
+
+    Rings are oriented as the spec requires, exterior rings with a
+    positive area and interior rings with a negative one. Rings that
+    collapse to no area in tile coordinates are dropped, and so are the
+    interior rings of a dropped exterior ring.
+    """
+    cursor = _Cursor()
+    geometry = []
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            ring = _dedupe(ring)
+            if len(ring) > 1 and ring[0] == ring[-1]:
+                ring = ring[:-1]
+            area = _ring_area(ring) if len(ring) >= 3 else 0
+            if area == 0:
+                if i == 0:
+                    break
+                continue
+            if (area > 0) != (i == 0):
+                ring = ring[::-1]
+            geometry += [_command(MOVE_TO, 1)] + cursor.move(ring[:1])
+            geometry += ([_command(LINE_TO, len(ring) - 1)] +
+                         cursor.move(ring[1:]))
+            geometry.append(_command(CLOSE_PATH, 1))
+    return geometry
+
+
+def encode_layer(name, features, extent=4096):
+    """Encode a layer of a tile.
+
+    ``features`` is a list of ``(geom_type, geometry, properties)``,
+    where ``geometry`` is the output of one of the ``encode_*``
+    functions and ``properties`` a dict of strings. Features without a
+    geometry are skipped.
+    """
+    keys = OrderedDict()
+    values = OrderedDict()
+    encoded = []
+    for geom_type, geometry, properties in features:
+        if not geometry:
+            continue
+        tags = []
+        for key, value in properties.items():
+            tags += [keys.setdefault(key, len(keys)),
+                     values.setdefault(value, len(values))]
+        feature = (_packed_field(2, tags) +
+                   _uint_field(3, geom_type) +
+                   _packed_field(4, geometry))
+        encoded.append(_bytes_field(2, feature))
+
+    if not encoded:
+        return b''
+    layer = (_uint_field(15, 2) +
+             _bytes_field(1, name.encode()) +
+             b''.join(encoded) +
+             b''.join(_bytes_field(3, key.encode()) for key in keys) +
+             b''.join(_bytes_field(4, _bytes_field(1, value.encode()))
+                      for value in values) +
+             _uint_field(5, extent))
+    return _bytes_field(3, layer)
@@ -0,0 +1,63 @@
+from django.test import TestCase
+
+from .. import mvt
+
+
+class EncodeGeometryTest(TestCase):
+    # Examples from the Mapbox Vector Tile specification
+
+    def test_encode_points(self):
+        assert mvt.encode_points([(25, 17)]) == [9, 50, 34]
+        assert mvt.encode_points([(5, 7), (3, 2)]) == [17, 10, 14, 3, 9]
+        assert mvt.encode_points([]) == []
+
+    def test_encode_lines(self):
+        assert mvt.encode_lines([[(2, 2), (2, 10), (10, 10)]]) == [
+            9, 4, 4, 18, 0, 16, 16, 0]
+        assert mvt.encode_lines([[(2, 2), (2, 10), (10, 10)],
+                                 [(1, 1), (3, 5)]]) == [
+            9, 4, 4, 18, 0, 16, 16, 0, 9, 17, 17, 10, 4, 8]
+        # lines that collapse to a point are dropped
+        assert mvt.encode_lines([[(1, 1), (1, 1)]]) == []
+
+    def test_encode_polygons(self):
+        expected = [9, 6, 12, 18, 10, 12, 24, 44, 15]
+        assert mvt.encode_polygons(
+            [[[(3, 6), (8, 12), (20, 34), (3, 6)]]]) == expected
+        # exterior rings are reoriented
+        assert mvt.encode_polygons(
+            [[[(3, 6), (20, 34), (8, 12), (3, 6)]]]) == [
+            9, 16, 24, 18, 24, 44, 33, 55, 15]
+
+    def test_encode_polygon_with_hole(self):
+        assert mvt.encode_polygons([[
+            [(11, 11), (20, 11), (20, 20), (11, 20), (11, 11)],
+            [(13, 13), (13, 17), (17, 17), (17, 13), (13, 13)],
+        ]]) == [9, 22, 22, 26, 18, 0, 0, 18, 17, 0, 15,
+                9, 4, 13, 26, 0, 8, 8, 0, 0, 7, 15]
+
+    def test_encode_collapsed_polygon(self):
+        assert mvt.encode_polygons([[[(1, 1), (2, 2), (1, 1)]]]) == []
+
+
+class EncodeLayerTest(TestCase):
+
+    def test_encode_layer(self):
+        layer = mvt.encode_layer('points', [
+            (mvt.POINT, [9, 50, 34], {'id': 'a'}),
+            (mvt.POINT, [9, 2, 2], {'id': 'b'}),
+            (mvt.POINT, [], {'id': 'c'}),
+        ], extent=4096)
+        assert layer == (
+            b'\x1a\x35'
+            b'\x78\x02'
+            b'\x0a\x06points'
+            b'\x12\x0b\x12\x02\x00\x00\x18\x01\x22\x03\x09\x32\x22'
+            b'\x12\x0b\x12\x02\x00\x01\x18\x01\x22\x03\x09\x02\x02'
+            b'\x1a\x02id'
+            b'\x22\x03\x0a\x01a'
+            b'\x22\x03\x0a\x01b'
+            b'\x28\x80\x20')
+
+    def test_encode_empty_layer(self):
+        assert mvt.encode_layer('points', []) == b''
@@ -0,0 +1,112 @@
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from core.tests.utils.cases import UserTestCase
+from organization.tests.factories import ProjectFactory
+from .. import mvt, tiles
+from .factories import SpatialUnitFactory
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class TileBoundsTest(TestCase):
+
+    def test_tile_bounds(self):
+        bound = tiles.WORLD_BOUND
+        assert tiles.tile_bounds(0, 0, 0) == (-bound, -bound, bound, bound)
+        assert tiles.tile_bounds(1, 1, 0) == (0, 0, bound, bound)
+        assert tiles.tile_bounds(1, 0, 1) == (-bound, -bound, 0, 0)
+
+    def test_is_valid_tile(self):
+        assert tiles.is_valid_tile(0, 0, 0)
+        assert tiles.is_valid_tile(2, 3, 3)
+        assert not tiles.is_valid_tile(2, 4, 0)
+        assert not tiles.is_valid_tile(2, 0, 4)
+        assert not tiles.is_valid_tile(tiles.MAX_ZOOM + 1, 0, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TileCacheTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+
+    def test_invalidate_tiles(self):
+        version = tiles.get_tile_version(self.project.id)
+        assert tiles.get_tile_version(self.project.id) == version
+        tiles.invalidate_tiles(self.project.id)
+        assert tiles.get_tile_version(self.project.id) != version
+
+    def test_spatial_unit_changes_invalidate_tiles(self):
+        version = tiles.get_tile_version(self.project.id)
+        su = SpatialUnitFactory.create(project=self.project)
+        updated = tiles.get_tile_version(self.project.id)
+        assert updated != version
+
+        su.delete()
+        assert tiles.get_tile_version(self.project.id) != updated
+
+
+class ToLonLatTest(TestCase):
+
+    def test_to_lonlat(self):
+        lon, lat = tiles.to_lonlat(tiles.WORLD_BOUND, tiles.WORLD_BOUND)
+        assert round(lon, 6) == 180
+        assert round(lat, 4) == 85.0511
+        assert tiles.to_lonlat(0, 0) == (0, 0)
+
+
+class EncodeFeaturesTest(TestCase):
+
+    def test_encode_collection(self):
+        geom = GEOSGeometry(
+            'GEOMETRYCOLLECTION (POINT (1 1), LINESTRING (0 0, 2 2))')
+        features = tiles.encode_features(geom, lambda p: (p[0], p[1]))
+        assert features == [
+            (mvt.POINT, [9, 2, 2]),
+            (mvt.LINESTRING, [9, 0, 0, 10, 4, 4]),
+            (mvt.POLYGON, []),
+        ]
+
+
+class RenderTileTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create()
+
+    def test_render_tile(self):
+        point = SpatialUnitFactory.create(
+            project=self.project, geometry='SRID=4326;POINT (179 10)')
+        # A polygon that covers most of the world
+        polygon = SpatialUnitFactory.create(
+            project=self.project,
+            geometry='SRID=4326;POLYGON ((-170 -60, 170 -60, 170 60, '
+                     '-170 60, -170 -60))')
+        other = SpatialUnitFactory.create(
+            geometry='SRID=4326;POINT (179 10)')
+
+        tile = tiles.render_tile(self.project.id, 0, 0, 0)
+        assert b'spatial_units' in tile
+        assert point.id.encode() in tile
+        assert polygon.id.encode() in tile
+        assert other.id.encode() not in tile
+
+        tile = tiles.render_tile(self.project.id, 1, 1, 0)
+        assert point.id.encode() in tile
+        assert polygon.id.encode() in tile
+
+        tile = tiles.render_tile(self.project.id, 1, 0, 1)
+        assert point.id.encode() not in tile
+        assert polygon.id.encode() in tile
+
+    def test_render_empty_tile(self):
+        SpatialUnitFactory.create(
+            project=self.project, geometry='SRID=4326;POINT (179 10)')
+        assert tiles.render_tile(self.project.id, 1, 0, 0) == b''
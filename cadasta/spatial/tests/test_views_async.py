@@ -1,4 +1,5 @@
 import json
+from unittest.mock import patch
 
 from django.test import TestCase
 
@@ -195,3 +196,42 @@ class SpatialUnitListAPITest(APITestCase, UserTestCase, TestCase):
         self.prj.save()
         response = self.request(user=user)
         assert response.status_code == 200
+
+
+class SpatialUnitTilesTest(APITestCase, UserTestCase, TestCase):
+    view_class = async.SpatialUnitTiles
+
+    def setup_models(self):
+        self.user = UserFactory.create()
+        assign_policies(self.user)
+        self.prj = ProjectFactory.create(slug='test-project', access='public')
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.prj.organization.slug,
+            'project': self.prj.slug,
+            'z': '1',
+            'x': '0',
+            'y': '1',
+        }
+
+    @patch('spatial.tiles.get_tile', return_value=b'tile')
+    def test_get_tile(self, get_tile):
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.headers['content-type'][1] == (
+            'application/vnd.mapbox-vector-tile')
+        get_tile.assert_called_once_with(self.prj.id, 1, 0, 1)
+
+    @patch('spatial.tiles.get_tile', return_value=b'tile')
+    def test_get_tile_out_of_range(self, get_tile):
+        response = self.request(user=self.user, url_kwargs={'x': '2'})
+        assert response.status_code == 404
+        assert not get_tile.called
+
+    def test_get_private_tile_with_unauthorized_user(self):
+        self.prj.access = 'private'
+        self.prj.save()
+
+        response = self.request()
+        assert response.status_code == 403
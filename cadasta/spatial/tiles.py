@@ -0,0 +1,151 @@
+import math
+
+from core.util import random_id
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+from django.db import connection
+
+from . import mvt
+
+# Half the width of the Web Mercator (EPSG:3857) world, in metres
+WORLD_BOUND = 20037508.342789244
+EARTH_RADIUS = 6378137
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_CACHE_TIMEOUT = 60 * 60 * 24
+MAX_ZOOM = 22
+
+# Locations of a project clipped to the buffered bounds of a tile in
+# WGS 84, where the bounds of a Web Mercator tile are a box as well, and
+# then simplified in Web Mercator.
+TILE_SQL = """
+    SELECT id, type,
+           ST_AsBinary(ST_SimplifyPreserveTopology(
+               ST_Transform(ST_Intersection(geometry::geometry, bbox), 3857),
+               %(tolerance)s))
+    FROM spatial_spatialunit,
+         ST_MakeEnvelope(%(west)s, %(south)s, %(east)s, %(north)s, 4326)
+         AS bbox
+    WHERE project_id = %(project)s
+      AND geometry::geometry && bbox
+"""
+
+
+def tile_bounds(z, x, y):
+    """Return the Web Mercator bounds ``(xmin, ymin, xmax, ymax)`` of an
+    XYZ tile."""
+    size = 2 * WORLD_BOUND / 2 ** z
+    xmin = -WORLD_BOUND + x * size
+    ymax = WORLD_BOUND - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def to_lonlat(x, y):
+    """Return the WGS 84 longitude and latitude of a Web Mercator
+    point."""
+    lon = math.degrees(x / EARTH_RADIUS)
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS)) -
+                       math.pi / 2)
+    return lon, lat
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def get_tile_version(project_id):
+    key = 'spatial.tiles.version.{}'.format(project_id)
+    version = cache.get(key)
+    if version is None:
+        version = random_id()
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate_tiles(project_id):
+    """Discard all cached tiles of a project."""
+    cache.delete('spatial.tiles.version.{}'.format(project_id))
+
+
+def _collect_parts(geom, parts):
+    """Sort the points, lines and polygons of a geometry by type."""
+    if geom.empty:
+        return
+    geom_type = geom.geom_type
+    if geom_type == 'Point':
+        parts[mvt.POINT].append(geom.coords)
+    elif geom_type in ('LineString', 'LinearRing'):
+        parts[mvt.LINESTRING].append(geom.coords)
+    elif geom_type == 'Polygon':
+        parts[mvt.POLYGON].append([ring.coords for ring in geom])
+    else:
+        for part in geom:
+            _collect_parts(part, parts)
+
+
+def encode_features(geom, to_tile):
+    """Return the geometries of the features of a geometry, one per
+    geometry type, as ``(geom_type, geometry)``. ``to_tile`` converts
+    Web Mercator coordinates to tile coordinates."""
+    parts = {mvt.POINT: [], mvt.LINESTRING: [], mvt.POLYGON: []}
+    _collect_parts(geom, parts)
+    return [
+        (mvt.POINT, mvt.encode_points(
+            [to_tile(point) for point in parts[mvt.POINT]])),
+        (mvt.LINESTRING, mvt.encode_lines(
+            [[to_tile(point) for point in line]
+             for line in parts[mvt.LINESTRING]])),
+        (mvt.POLYGON, mvt.encode_polygons(
+            [[[to_tile(point) for point in ring] for ring in polygon]
+             for polygon in parts[mvt.POLYGON]])),
+    ]
+
+
+def render_tile(project_id, z, x, y):
+    """Render a Mapbox Vector Tile of a project's locations.
+
+    PostGIS clips the locations to the tile and its buffer and
+    simplifies them to the size of one tile pixel at the given zoom
+    level. The tile is then encoded here, which works with any PostGIS
+    version.
+    """
+    xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+    size = xmax - xmin
+    pad = size * TILE_BUFFER / TILE_EXTENT
+    west, south = to_lonlat(max(xmin - pad, -WORLD_BOUND),
+                            max(ymin - pad, -WORLD_BOUND))
+    east, north = to_lonlat(min(xmax + pad, WORLD_BOUND),
+                            min(ymax + pad, WORLD_BOUND))
+    params = {
+        'project': project_id,
+        'west': west, 'south': south, 'east': east, 'north': north,
+        'tolerance': size / TILE_EXTENT,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(TILE_SQL, params)
+        rows = cursor.fetchall()
+
+    scale = TILE_EXTENT / size
+
+    def to_tile(point):
+        return (int(round((point[0] - xmin) * scale)),
+                int(round((ymax - point[1]) * scale)))
+
+    features = []
+    for su_id, su_type, wkb in rows:
+        geom = GEOSGeometry(memoryview(wkb))
+        properties = {'id': su_id, 'type': su_type}
+        for geom_type, geometry in encode_features(geom, to_tile):
+            features.append((geom_type, geometry, properties))
+    return mvt.encode_layer('spatial_units', features, TILE_EXTENT)
+
+
+def get_tile(project_id, z, x, y):
+    """Return a project tile, rendering it if it is not cached yet."""
+    key = 'spatial.tiles.{}.{}.{}.{}.{}'.format(
+        project_id, get_tile_version(project_id), z, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(project_id, z, x, y)
+        cache.set(key, tile, TILE_CACHE_TIMEOUT)
+    return tile
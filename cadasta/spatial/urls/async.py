@@ -8,6 +8,10 @@ urls = [
         r'^$',
         async.SpatialUnitList.as_view(),
         name='list'),
+    url(
+        r'^tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$',
+        async.SpatialUnitTiles.as_view(),
+        name='tiles'),
 ]
 
 
@@ -1,9 +1,11 @@
+from django.http import Http404, HttpResponse
 from tutelary.mixins import APIPermissionRequiredMixin
 from rest_framework import generics
+from rest_framework.views import APIView
 from rest_framework_gis.pagination import GeoJsonPagination
 
 from . import mixins
-from .. import serializers
+from .. import serializers, tiles
 
 
 class Paginator(GeoJsonPagination):
@@ -34,3 +36,32 @@ class SpatialUnitList(APIPermissionRequiredMixin,
 
     def get_perms_objects(self):
         return [self.get_project()]
+
+
+class SpatialUnitTiles(APIPermissionRequiredMixin,
+                       mixins.SpatialQuerySetMixin,
+                       APIView):
+    """Project locations as Mapbox Vector Tiles."""
+
+    def get_actions(self, request):
+        if self.get_project().archived:
+            return ['project.view_archived', 'spatial.list']
+        if self.get_project().public():
+            return ['project.view', 'spatial.list']
+        else:
+            return ['project.view_private', 'spatial.list']
+
+    permission_required = {
+        'GET': get_actions
+    }
+
+    def get_perms_objects(self):
+        return [self.get_project()]
+
+    def get(self, request, *args, **kwargs):
+        z, x, y = (int(self.kwargs[k]) for k in ('z', 'x', 'y'))
+        if not tiles.is_valid_tile(z, x, y):
+            raise Http404
+        tile = tiles.get_tile(self.get_project().id, z, x, y)
+        return HttpResponse(tile,
+                            content_type='application/vnd.mapbox-vector-tile')
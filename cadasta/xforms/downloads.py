@@ -0,0 +1,63 @@
+"""Precomputed XForms of questionnaires.
+
+Questionnaires never change once they are uploaded, so the XForm XML
+that ODK Collect downloads is rendered once, when a questionnaire is
+uploaded, and stored in the Django cache keyed by ``(questionnaire id,
+version, md5_hash)``. Downloads only read the cache; a form that has
+been evicted is rendered again on its next download. The key doubles as
+the ETag of the download, so a client that already has the form gets
+an empty ``304 Not Modified`` response.
+"""
+import logging
+
+from django.core.cache import cache
+
+from questionnaires.serializers import QuestionnaireSerializer
+from .renderers import XFormRenderer
+
+# Part of the cache key and the ETag; bump it whenever the output of
+# XFormRenderer changes, so that stored forms are rendered again.
+RENDER_VERSION = 1
+
+logger = logging.getLogger('xform.downloads')
+
+
+def get_etag(questionnaire):
+    return '{}-{}-{}-{}'.format(questionnaire.id, questionnaire.version,
+                                questionnaire.md5_hash, RENDER_VERSION)
+
+
+def _cache_key(questionnaire):
+    return 'xforms.xform.{}'.format(get_etag(questionnaire))
+
+
+def render_xform(questionnaire):
+    serializer = QuestionnaireSerializer(
+        questionnaire, context={'project': questionnaire.project})
+    return XFormRenderer().render(serializer.data)
+
+
+def store_xform(questionnaire):
+    """Render the XForm of a questionnaire and store it in the cache."""
+    xform = render_xform(questionnaire)
+    cache.set(_cache_key(questionnaire), xform, None)
+    return xform
+
+
+def get_xform(questionnaire):
+    """Return the XForm XML of a questionnaire."""
+    xform = cache.get(_cache_key(questionnaire))
+    if xform is None:
+        xform = store_xform(questionnaire)
+    return xform
+
+
+def precompute_xform(questionnaire):
+    """Store the XForm of a new questionnaire. Errors are only logged,
+    since the upload has already succeeded; the form is then rendered
+    when it is first downloaded."""
+    try:
+        store_xform(questionnaire)
+    except Exception:
+        logger.exception("Could not render the XForm of questionnaire %s",
+                         questionnaire.id)
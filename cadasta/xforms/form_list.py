@@ -0,0 +1,85 @@
+"""The ``xformsList`` served to ODK Collect.
+
+The forms of a user are the current questionnaires of the active
+projects in the user's active organizations, or in all active
+organizations for superusers. They are loaded with a single query and
+the rendered list is cached per user. The cache key includes two
+versions: one that changes when the roles of the user change, and one
+that changes when organizations, projects or questionnaires change.
+The MD5 hash of the rendered list is its ETag.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import F
+from tutelary.models import Role
+
+from core.util import random_id
+from questionnaires.models import Questionnaire
+
+CACHE_TIMEOUT = 60 * 60
+
+ALL_USERS = 'all'
+
+
+def _version_key(user_id):
+    return 'xforms.formlist.version.{}'.format(user_id)
+
+
+def get_versions(user_id):
+    keys = [_version_key(ALL_USERS), _version_key(user_id)]
+    versions = cache.get_many(keys)
+    missing = {key: random_id() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_user(user_id):
+    """Discard the cached form list of a user."""
+    cache.delete(_version_key(user_id))
+
+
+def invalidate_all():
+    """Discard the cached form lists of all users."""
+    cache.delete(_version_key(ALL_USERS))
+
+
+def is_superuser(user):
+    return any(isinstance(policy, Role) and policy.name == 'superuser'
+               for policy in user.assigned_policies())
+
+
+def get_user_forms(user):
+    """Returns the current questionnaires of the projects whose forms
+    ``user`` can download."""
+    forms = Questionnaire.objects.filter(
+        project__archived=False,
+        project__organization__archived=False,
+        project__current_questionnaire=F('id'))
+    if not is_superuser(user):
+        forms = forms.filter(project__organization__users=user)
+    return forms.order_by('project__organization__name', 'project__name')
+
+
+def get_form_list(request, render):
+    """Returns the XML and the ETag of the form list of the requesting
+    user. ``render`` is called with the forms of the user to render the
+    list if it is not cached. Download URLs depend on the requested
+    host, so lists are cached per host as well."""
+    user_id = request.user.id
+    key = '\n'.join(get_versions(user_id) + [
+        request.build_absolute_uri('/'),
+        request.META.get('SERVER_PROTOCOL', ''),
+    ])
+    cache_key = 'xforms.formlist.{}.{}'.format(
+        user_id, hashlib.sha1(key.encode()).hexdigest())
+
+    form_list = cache.get(cache_key)
+    if form_list is None:
+        xml = render(get_user_forms(request.user))
+        etag = hashlib.md5(xml.encode()).hexdigest()
+        form_list = (xml, etag)
+        cache.set(cache_key, form_list, CACHE_TIMEOUT)
+    return form_list
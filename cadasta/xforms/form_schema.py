@@ -0,0 +1,47 @@
+"""What the ingestion of ODK submissions needs to know about a
+questionnaire.
+
+Questionnaires never change once they are uploaded, so the names of the
+questions whose answers are sanitized and of the ``select_multiple``
+attributes of the questionnaire's attribute schemas are loaded once per
+questionnaire and kept in a per-process LRU cache keyed by the
+questionnaire ID. Ingesting further submissions of the same
+questionnaire version runs no schema queries at all.
+"""
+from collections import namedtuple
+
+from core.util import LRUCache
+from jsonattrs.models import Attribute
+
+from questionnaires.models import Question
+
+LOCAL_CACHE_SIZE = 256
+
+# Answers to these question types are checked by sanitize_string
+SANITIZABLE_TYPES = ('TX', 'NO')
+
+FormSchema = namedtuple('FormSchema',
+                        ['sanitizable_questions', 'select_multiples'])
+
+_local = LRUCache(LOCAL_CACHE_SIZE)
+
+
+def load_form_schema(questionnaire):
+    sanitizable_questions = Question.objects.filter(
+        questionnaire_id=questionnaire.id,
+        type__in=SANITIZABLE_TYPES).values_list('name', flat=True)
+    # Attribute schemas of a questionnaire are selected by its ID
+    select_multiples = Attribute.objects.filter(
+        schema__selectors__contains=[questionnaire.id],
+        attr_type__name='select_multiple').values_list('name', flat=True)
+    return FormSchema(frozenset(sanitizable_questions),
+                      frozenset(select_multiples))
+
+
+def get_form_schema(questionnaire):
+    """Return the ``FormSchema`` of a questionnaire."""
+    schema = _local.get(questionnaire.id)
+    if schema is None:
+        schema = load_form_schema(questionnaire)
+        _local.set(questionnaire.id, schema)
+    return schema
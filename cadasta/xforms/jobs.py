@@ -0,0 +1,140 @@
+"""The inbox of ODK submissions.
+
+With ``XFORM_SUBMISSION_ASYNC``, the submission view only parses and
+checks a submission, stores its XML and attachments on disk and queues
+a ``SubmissionJob``. Phones get their answer before any entity is
+created or any attachment is copied to storage, so slow connections no
+longer time out and send the submission again. The
+``processsubmissions`` worker then ingests the queued submissions.
+
+Submissions that fail for a transient reason stay in the inbox and are
+retried with an increasing delay, see ``BackgroundJob.retry``.
+
+Submissions are identified by their ``instanceID``. A submission that
+is sent again with no new attachments is not queued a second time, and
+the jobs of one ``instanceID`` are ingested one at a time, each in a
+single transaction, so that running a job again after a crash does not
+create its models twice.
+"""
+import os
+import shutil
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils.translation import ugettext as _
+
+from core.util import random_id
+from .exceptions import InvalidXMLSubmission
+from .mixins.model_helper import ModelHelper
+from .models import SubmissionJob, XFormSubmission
+
+SUBMISSION_FILE = 'xml_submission_file'
+
+inbox_storage = FileSystemStorage(
+    location=os.path.join(settings.MEDIA_ROOT, 'submissions'))
+
+
+def queue_submission(request):
+    """Store a submission in the inbox and return its job.
+
+    If a job of the submission that was not rejected already holds all
+    of its attachments, that job is returned instead.
+    """
+    if SUBMISSION_FILE not in request.data.keys():
+        raise InvalidXMLSubmission(_('XML submission not found'))
+
+    helper = ModelHelper()
+    xml_submission_file = request.data[SUBMISSION_FILE]
+    submission = helper.parse_submission(xml_submission_file)[1]
+    questionnaire = helper.check_submission(submission)
+    helper._check_perm(request.user, questionnaire.project)
+
+    instance_id = submission['meta']['instanceID']
+    # Submissions stored before may still get their missing attachments
+    if helper.get_previous_submission(instance_id) is None:
+        helper.check_current_questionnaire(questionnaire)
+
+    attachments = {field: file for field, file in request.FILES.items()
+                   if field != SUBMISSION_FILE}
+    jobs = SubmissionJob.objects.filter(
+        instanceID=instance_id).exclude(status=SubmissionJob.FAILED)
+    for job in jobs:
+        if set(attachments) <= {file['field'] for file in job.files}:
+            return job
+
+    job_id = random_id()
+    xml_submission_file.seek(0)
+    inbox_storage.save(os.path.join(job_id, SUBMISSION_FILE),
+                       xml_submission_file)
+    files = []
+    for field, file in attachments.items():
+        files.append({
+            'field': field,
+            'name': file.name,
+            'content_type': file.content_type,
+            'path': inbox_storage.save(os.path.join(job_id, file.name),
+                                       file),
+        })
+
+    return SubmissionJob.objects.create(
+        id=job_id, project=questionnaire.project, user=request.user,
+        instanceID=instance_id, path=inbox_storage.path(job_id),
+        files=files)
+
+
+def ingest_submission(job):
+    """Create the models and resources of a queued submission and
+    return its saved ``XFormSubmission``."""
+    with ExitStack() as stack:
+        xml_submission_file = stack.enter_context(
+            open(os.path.join(job.path, SUBMISSION_FILE), 'rb'))
+        files = {}
+        for file in job.files:
+            path = inbox_storage.path(file['path'])
+            files[file['field']] = UploadedFile(
+                file=stack.enter_context(open(path, 'rb')),
+                name=file['name'],
+                content_type=file['content_type'],
+                size=os.path.getsize(path))
+
+        result = ModelHelper().ingest_submission(
+            xml_submission_file, files, job.user)
+
+    # A submission sent before only gets its new attachments
+    if isinstance(result, XFormSubmission):
+        return result
+
+    submission, parties, locations, tenure_relationships = result
+    submission.save()
+    submission.parties.add(*parties)
+    submission.spatial_units.add(*locations)
+    submission.tenure_relationships.add(*tenure_relationships)
+    return submission
+
+
+def run_submission_job(job):
+    """Ingest a queued submission. Rejected submissions are marked as
+    failed and keep their files for inspection. Other errors, like an
+    unavailable storage or database, are raised so that the worker
+    retries the job later."""
+    try:
+        with transaction.atomic():
+            # Lock the jobs of the same submission, so that another
+            # worker ingests them after this one has been committed.
+            list(SubmissionJob.objects.select_for_update().filter(
+                instanceID=job.instanceID))
+            job.submission = ingest_submission(job)
+            job.finish(SubmissionJob.DONE)
+    except ValidationError as e:
+        for message in e.messages:
+            job.add_error(message)
+        job.finish(SubmissionJob.FAILED)
+    except (InvalidXMLSubmission, PermissionDenied) as e:
+        job.add_error(str(e))
+        job.finish(SubmissionJob.FAILED)
+    else:
+        shutil.rmtree(job.path, ignore_errors=True)
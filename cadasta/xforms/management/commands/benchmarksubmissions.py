@@ -0,0 +1,111 @@
+import time
+import uuid
+from datetime import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from jsonattrs.models import Attribute, AttributeType, Schema
+
+from accounts.models import User
+from organization.models import Organization, OrganizationRole, Project
+from questionnaires.models import Questionnaire
+from xforms.mixins.model_helper import ModelHelper
+
+ATTRIBUTE_MODELS = (('party', 'party'),
+                    ('spatial', 'spatialunit'),
+                    ('party', 'tenurerelationship'))
+CHOICES = ['maize', 'beans', 'cassava']
+ATTRIBUTES = {'notes': 'Collected on site', 'crops': 'maize beans'}
+
+
+def make_questionnaire():
+    """Create a questionnaire with a text and a select_multiple
+    attribute for parties, locations and tenure relationships, and a
+    user who may contribute to its project."""
+    name = 'benchmark-{}'.format(uuid.uuid4().hex[:12])
+    organization = Organization.objects.create(name=name)
+    project = Project.objects.create(name=name, organization=organization)
+    questionnaire = Questionnaire.objects.create(
+        project=project, filename=name, title=name, id_string=name,
+        version=int(datetime.utcnow().strftime('%Y%m%d%H%M%S%f')[:-4]),
+        xls_form='http://example.com/benchmark.xlsx',
+        xml_form='http://example.com/benchmark.xml')
+    project.current_questionnaire = questionnaire.id
+    project.save()
+    user = User.objects.create_user(
+        username=name, email='{}@example.com'.format(name))
+    OrganizationRole.objects.create(
+        organization=project.organization, user=user, admin=True)
+
+    for app_label, model in ATTRIBUTE_MODELS:
+        schema = Schema.objects.create(
+            content_type=ContentType.objects.get(
+                app_label=app_label, model=model),
+            selectors=(project.organization.id, project.id,
+                       questionnaire.id))
+        Attribute.objects.create(
+            schema=schema, name='notes', long_name='Notes',
+            attr_type=AttributeType.objects.get(name='text'), index=0,
+            required=False, omit=False)
+        Attribute.objects.create(
+            schema=schema, name='crops', long_name='Crops',
+            attr_type=AttributeType.objects.get(name='select_multiple'),
+            index=1, choices=CHOICES, required=False, omit=False)
+    return user, questionnaire
+
+
+def make_submission(questionnaire, parties):
+    """Build a parsed submission of one location with a repeat of
+    ``parties`` parties, each holding its own tenure relationship."""
+    return {
+        'id': questionnaire.id_string,
+        'version': str(questionnaire.version),
+        'meta': {'instanceID': 'uuid:{}'.format(uuid.uuid4())},
+        'location_type': 'PA',
+        'location_geometry': '45.56342779158167 -122.67650283873081 0.0 0.0',
+        'location_attributes': dict(ATTRIBUTES),
+        'party_repeat': [{
+            'party_name': 'Party {}'.format(i),
+            'party_type': 'IN',
+            'party_attributes_individual': dict(ATTRIBUTES),
+            'tenure_type': 'CO',
+            'tenure_relationship_attributes': dict(ATTRIBUTES),
+        } for i in range(parties)],
+    }
+
+
+class Command(BaseCommand):
+    help = """Measures how many ODK submissions with a repeat of parties
+            per second the submission ingestion can write, and how many
+            queries each submission runs. All data is written in a
+            transaction that is rolled back."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--submissions', type=int, default=100,
+            help='Number of submissions to ingest')
+        parser.add_argument(
+            '--parties', type=int, default=10,
+            help='Number of parties in the repeat of every submission')
+
+    def handle(self, *args, **options):
+        count = options['submissions']
+        with transaction.atomic():
+            user, questionnaire = make_questionnaire()
+            submissions = [make_submission(questionnaire, options['parties'])
+                           for _ in range(count)]
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for submission in submissions:
+                    ModelHelper().create_models(submission, user)
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            'Ingested {} submissions in {:.3f}s ({:.1f} submissions/sec, '
+            '{:.1f} queries/submission)'.format(
+                count, elapsed, count / elapsed if elapsed else 0,
+                len(queries) / count if count else 0))
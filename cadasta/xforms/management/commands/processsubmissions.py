@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import run_worker
+from xforms.jobs import run_submission_job
+from xforms.models import SubmissionJob
+
+
+class Command(BaseCommand):
+    help = """Ingests the ODK submissions queued in the submission inbox,
+            oldest first."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='Exit when no submissions are left in the inbox')
+        parser.add_argument(
+            '--poll-interval', type=int, default=5, dest='poll_interval',
+            help='Seconds to wait between polls of an empty inbox')
+
+    def handle(self, *args, **options):
+        run_worker(SubmissionJob, run_submission_job,
+                   poll_interval=options['poll_interval'],
+                   once=options['once'])
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('organization', '0008_exportjob'),
+        ('xforms', '0002_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionJob',
+            fields=[
+                ('id', models.CharField(max_length=24, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=7)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('retry_after', models.DateTimeField(blank=True, null=True)),
+                ('instanceID', models.UUIDField(db_index=True)),
+                ('path', models.CharField(max_length=255)),
+                ('files', django.contrib.postgres.fields.jsonb.JSONField(default=[])),
+                ('errors', django.contrib.postgres.fields.jsonb.JSONField(default=[])),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_jobs', to='organization.Project')),
+                ('submission', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='xforms.XFormSubmission')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -1,57 +1,75 @@
+import os
+from functools import partial
+
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.core.files.storage import get_storage_class
 from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.gis.db import models as geo_models
 from django.db.models.functions import Cast
-from django.db import transaction
+from django.db import InterfaceError, OperationalError, transaction
 from django.utils.translation import ugettext as _
-from jsonattrs.models import Attribute, AttributeType
-from tutelary.models import Policy
 from party.models import Party, TenureRelationship
 from pyxform.xform2json import XFormToDict
-from questionnaires.models import Questionnaire, Question
+from questionnaires.models import Questionnaire
 from resources.models import Resource
+from resources.utils.io import save_file
 from spatial.models import SpatialUnit
+from organization.importers.bulk import BulkCreator
+from organization.importers.exceptions import DataImportError
 from xforms.exceptions import InvalidXMLSubmission
+from xforms.form_schema import get_form_schema
 from xforms.models import XFormSubmission
 from xforms.utils import odk_geom_to_wkt
 from core.messages import SANITIZE_ERROR
 from core.validators import sanitize_string
 
 
-def get_policy_instance(policy_name, variables=None):
-    return (Policy.objects.get(name=policy_name), variables)
+def get_contributor_policies(project):
+    """Returns the ``(name, variables)`` of the policies that allow
+    contributing data to ``project``."""
+    org_vars = {'organization': project.organization.slug}
+    prj_vars = dict(org_vars, project=project.slug)
+    return [
+        ('superuser', None),
+        ('org-admin', org_vars),
+        ('project-manager', prj_vars),
+        ('data-collector', prj_vars),
+    ]
+
+
+def get_policy_name(policy):
+    """Returns ``(name, variables)`` of an entry of
+    ``user.assigned_policies()``: a policy or role, optionally paired
+    with its variables."""
+    variables = None
+    if isinstance(policy, tuple):
+        policy, variables = policy
+    return (policy.name, variables or None)
 
 
 class ModelHelper():
     def __init__(self, *arg):
         self.arg = arg
+        self._schema = None
+        self._bulk = None
+        self._previous_submissions = {}
 
     def _check_perm(self, user, project):
-        superuser = get_policy_instance('superuser')
-        org_admin = get_policy_instance('org-admin', {
-            'organization': project.organization.slug
-        })
-        prj_manager = get_policy_instance('project-manager', {
-            'organization': project.organization.slug,
-            'project': project.slug
-        })
-        data_collector = get_policy_instance('data-collector', {
-            'organization': project.organization.slug,
-            'project': project.slug
-        })
-
-        roles = [superuser, org_admin, prj_manager, data_collector]
-        assigned_policies = user.assigned_policies()
-        if not any(role in assigned_policies for role in roles):
+        # Policies are compared by name, so no Policy rows are loaded
+        assigned_policies = [get_policy_name(policy)
+                             for policy in user.assigned_policies()]
+        if not any(policy in assigned_policies
+                   for policy in get_contributor_policies(project)):
             raise PermissionDenied(_("You don't have permission to contribute"
                                      " data to this project."))
 
-    def create_models(self, data, user):
-        questionnaire = self._get_questionnaire(
-            id_string=data['id'], version=data['version']
-        )
+    def create_models(self, data, user, questionnaire=None):
+        if questionnaire is None:
+            questionnaire = self._get_questionnaire(
+                id_string=data['id'], version=data['version']
+            )
         self._check_perm(user, questionnaire.project)
+        self._schema = get_form_schema(questionnaire)
 
         # If xform has already been submitted, check for additional resources
         additional_resources = self.check_for_duplicate_submission(
@@ -60,44 +78,62 @@ class ModelHelper():
             return additional_resources
 
         project = questionnaire.project
+        self.check_current_questionnaire(questionnaire)
 
-        if project.current_questionnaire != questionnaire.id:
-            raise InvalidXMLSubmission(_('Form out of date'))
+        # Parties, locations and tenure relationships are buffered and
+        # written with one bulk insert per model
+        self._bulk = BulkCreator(batch_size=None, history_user=user)
+        try:
+            parties, party_resources = self.create_party(
+                data=data,
+                project=project
+            )
 
-        parties, party_resources = self.create_party(
-            data=data,
-            project=project
-        )
+            locations, location_resources = self.create_spatial_unit(
+                data=data,
+                project=project,
+                party=parties
+            )
 
-        locations, location_resources = self.create_spatial_unit(
-            data=data,
-            project=project,
-            party=parties
-        )
+            (tenure_relationships,
+                tenure_resources) = self.create_tenure_relationship(
+                data=data,
+                project=project,
+                parties=parties,
+                locations=locations
+            )
 
-        (tenure_relationships,
-            tenure_resources) = self.create_tenure_relationship(
-            data=data,
-            project=project,
-            parties=parties,
-            locations=locations
-        )
+            self._bulk.flush()
+        except DataImportError as e:
+            raise InvalidXMLSubmission(e.args[0])
+        finally:
+            self._bulk = None
 
         return (questionnaire,
                 parties, party_resources,
                 locations, location_resources,
                 tenure_relationships, tenure_resources)
 
+    def check_current_questionnaire(self, questionnaire):
+        if questionnaire.project.current_questionnaire != questionnaire.id:
+            raise InvalidXMLSubmission(_('Form out of date'))
+
+    def get_previous_submission(self, instance_id):
+        """Returns the submission already stored with ``instance_id``, or
+        ``None``. The lookup runs once per instance ID."""
+        if instance_id not in self._previous_submissions:
+            self._previous_submissions[instance_id] = (
+                XFormSubmission.objects.filter(
+                    instanceID=instance_id).first())
+        return self._previous_submissions[instance_id]
+
     def check_for_duplicate_submission(self, data, questionnaire):
-        previous_submission = XFormSubmission.objects.filter(
-            instanceID=data['meta']['instanceID']
-        )
+        previous_submission = self.get_previous_submission(
+            data['meta']['instanceID'])
 
         if not previous_submission:
             return None
 
-        previous_submission = previous_submission[0]
-
         party_objects, party_resources = self.create_party(
             data=data,
             project=questionnaire.project,
@@ -127,7 +163,7 @@ class ModelHelper():
         if duplicate:
             get_or_create_party = duplicate.parties.get
         else:
-            get_or_create_party = Party.objects.create
+            get_or_create_party = partial(self._create, Party)
 
         try:
             party_groups = self._format_repeat(data, ['party'])
@@ -174,8 +210,8 @@ class ModelHelper():
                         geom=Cast('geometry', GeometryField())
                     ).get(geom=geom, **attrs)
                 else:
-                    location = SpatialUnit.objects.create(geometry=geom,
-                                                          **attrs)
+                    location = self._create(
+                        SpatialUnit, geometry=geom, **attrs)
 
                 location_resources.append(
                     self._get_resource_names(group, location, 'location')
@@ -195,7 +231,8 @@ class ModelHelper():
         if duplicate:
             get_or_create_tenure_rels = duplicate.tenure_relationships.get
         else:
-            get_or_create_tenure_rels = TenureRelationship.objects.create
+            get_or_create_tenure_rels = partial(self._create,
+                                                TenureRelationship)
 
         try:
             if data.get('tenure_type'):
@@ -231,11 +268,25 @@ class ModelHelper():
                 "Tenure relationship error: {}".format(e)))
         return tenure_objects, tenure_resources
 
+    def _create(self, model, **kwargs):
+        """Creates a model instance. While a submission is ingested in
+        bulk, the instance is only written when the buffer is flushed."""
+        if self._bulk:
+            return self._bulk.create(model, **kwargs)
+        return model.objects.create(**kwargs)
+
     def create_resource(self, data, user, project, content_object=None):
         Storage = get_storage_class()
-        file = data.file.read()
+        # An attachment of several entities is uploaded with the first
+        # one and left at its end, the others get the existing resource
+        existing = data.file.read(1) == b''
+        url = None
+        if not existing:
+            # Storage and connection errors are not caused by the
+            # submission and are raised as they are, so it can be retried
+            url = save_file(Storage(), 'resources/' + data.name, data)
         try:
-            if file == b'':
+            if existing:
                 Resource.objects.get(
                     name=data.name,
                     contributor=user,
@@ -246,16 +297,19 @@ class ModelHelper():
                     content_object=content_object
                 )
             else:
-                url = Storage().save('resources/' + data.name, file)
                 Resource.objects.create(
                     name=data.name,
                     file=url,
                     content_object=content_object,
+                    local_file=data.file,
                     mime_type=data.content_type,
                     contributor=user,
                     project=project,
                     original_file=data.name
                 ).full_clean()
+                data.file.seek(0, os.SEEK_END)
+        except (InterfaceError, OperationalError):
+            raise
         except Exception as e:
             raise InvalidXMLSubmission(_("{}".format(e)))
 
@@ -267,32 +321,46 @@ class ModelHelper():
             elif key in sanitizable_questions and not sanitize_string(value):
                 raise InvalidXMLSubmission(SANITIZE_ERROR)
 
-    def get_sanitizable_questions(self, id_string, version):
-        return Question.objects.filter(
-            questionnaire__id_string=id_string,
-            questionnaire__version=version,
-            type__in=['TX', 'NO']).values_list('name', flat=True)
+    def parse_submission(self, xml_submission_file):
+        """Returns the parsed XML submission and the answers of its
+        form."""
+        full_submission = XFormToDict(
+            xml_submission_file.read().decode('utf-8')).get_dict()
+        return full_submission, full_submission[list(full_submission)[0]]
+
+    def check_submission(self, submission):
+        """Returns the questionnaire of a parsed submission, after checking
+        that its answers are sanitized."""
+        questionnaire = self._get_questionnaire(
+            id_string=submission['id'], version=submission['version'])
+        self._schema = get_form_schema(questionnaire)
+        self.sanitize_submission(submission,
+                                 self._schema.sanitizable_questions)
+        return questionnaire
 
     def upload_submission_data(self, request):
         if 'xml_submission_file' not in request.data.keys():
             raise InvalidXMLSubmission(_('XML submission not found'))
 
-        xml_submission_file = request.data['xml_submission_file'].read()
-        full_submission = XFormToDict(
-            xml_submission_file.decode('utf-8')).get_dict()
-
-        submission = full_submission[list(full_submission.keys())[0]]
+        return self.ingest_submission(request.data['xml_submission_file'],
+                                      request.FILES, request.user)
 
-        sanitizable_questions = self.get_sanitizable_questions(
-            submission['id'], submission['version'])
-        self.sanitize_submission(submission, sanitizable_questions)
+    def ingest_submission(self, xml_submission_file, files, user):
+        """Creates the models of a submission and its attachments in
+        ``files``. Returns the new, unsaved ``XFormSubmission`` with the
+        created parties, locations and tenure relationships, or the
+        stored ``XFormSubmission`` if the submission was sent before."""
+        full_submission, submission = self.parse_submission(
+            xml_submission_file)
+        questionnaire = self.check_submission(submission)
 
         with transaction.atomic():
             (questionnaire,
              parties, party_resources,
              locations, location_resources,
              tenure_relationships, tenure_resources
-             ) = self.create_models(submission, request.user)
+             ) = self.create_models(submission, user,
+                                    questionnaire=questionnaire)
 
             party_submissions = [submission]
             location_submissions = [submission]
@@ -338,27 +406,26 @@ class ModelHelper():
                 'tenure_resources': tenure_resource_files,
                 'tenures': tenure_resources,
             }
-            self.upload_resource_files(request, resource_data)
+            self.upload_resource_files(user, files, resource_data)
 
-        if XFormSubmission.objects.filter(
-                instanceID=submission['meta']['instanceID']).exists():
-            return XFormSubmission.objects.get(
-                instanceID=submission['meta']['instanceID'])
+        previous_submission = self.get_previous_submission(
+            submission['meta']['instanceID'])
+        if previous_submission:
+            return previous_submission
 
         xform_submission = XFormSubmission(
             json_submission=full_submission,
-            user=request.user,
+            user=user,
             questionnaire=questionnaire,
             instanceID=submission['meta']['instanceID']
             )
         return xform_submission, parties, locations, tenure_relationships
 
-    def upload_resource_files(self, request, data):
-        user = request.user
-        files = request.FILES
-        files.pop('xml_submission_file')
+    def upload_resource_files(self, user, files, data):
         project = data['project']
         for file_name in files:
+            if file_name == 'xml_submission_file':
+                continue
             args = [data, user, project, files, file_name]
 
             if file_name in data['location_resources']:
@@ -414,21 +481,21 @@ class ModelHelper():
 
     def _get_questionnaire(self, id_string, version):
         try:
-            return Questionnaire.objects.get(
-                id_string=id_string, version=int(version)
-            )
+            return Questionnaire.objects.select_related(
+                'project__organization'
+            ).get(id_string=id_string, version=int(version))
         except Questionnaire.DoesNotExist:
             raise ValidationError(_('Questionnaire not found.'))
 
     def _get_attributes(self, data, model_type):
+        select_multiples = ()
+        if self._schema:
+            select_multiples = self._schema.select_multiples
         attributes = {}
         for attr_group in data:
             if '{model}_attributes'.format(model=model_type) in attr_group:
                 for item in data[attr_group]:
-                    if Attribute.objects.filter(
-                        name=item,
-                        attr_type=AttributeType.objects.get(
-                            name='select_multiple')).exists():
+                    if item in select_multiples:
                         answers = data[attr_group][item].split(' ')
                         attributes[item] = answers
                     else:
@@ -1,12 +1,18 @@
 import json
 import uuid
-from django.db import models
+from functools import partial
+from django.db import models, transaction
+from django.dispatch import receiver
 from django.contrib.postgres.fields import JSONField
-from core.models import RandomIDModel
+from core.models import BackgroundJob, RandomIDModel
 from questionnaires.models import Questionnaire
 from accounts.models import User
 from spatial.models import SpatialUnit
 from party.models import Party, TenureRelationship
+from organization.models import (Organization, OrganizationRole, Project,
+                                 ProjectRole)
+from . import form_list
+from .downloads import precompute_xform
 
 
 class XFormSubmission(RandomIDModel):
@@ -46,3 +52,62 @@ class XFormSubmission(RandomIDModel):
                          parties=list(self.parties.all()),
                          tenure_relationships=list(
                             self.tenure_relationships.all()))
+
+
+class SubmissionJob(BackgroundJob):
+    """An ODK submission in the inbox, ingested by the
+    ``processsubmissions`` worker.
+
+    The XML and the attachments of the submission are stored in the
+    directory ``path`` until it is ingested; ``files`` describes the
+    attachments as they were uploaded.
+    """
+
+    project = models.ForeignKey(Project, related_name='submission_jobs')
+    user = models.ForeignKey(User, related_name='+')
+    instanceID = models.UUIDField(db_index=True)
+    path = models.CharField(max_length=255)
+    files = JSONField(default=[])
+    submission = models.ForeignKey(XFormSubmission, null=True,
+                                   on_delete=models.SET_NULL,
+                                   related_name='+')
+    errors = JSONField(default=[])
+
+    class Meta:
+        ordering = ('-created',)
+
+    def __repr__(self):
+        repr_string = ('<SubmissionJob id={obj.id}'
+                       ' project={obj.project.slug}'
+                       ' instanceID={obj.instanceID}'
+                       ' status={obj.status}>')
+        return repr_string.format(obj=self)
+
+    def add_error(self, message):
+        self.errors = self.errors + [message]
+
+
+@receiver(models.signals.post_save, sender=Questionnaire)
+def store_new_xform(sender, instance, created, raw=False, **kwargs):
+    # Questions are added to a new questionnaire after it is saved, in
+    # the same transaction, so its XForm is rendered after the commit.
+    if created and not raw and transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(precompute_xform, instance))
+
+
+@receiver(models.signals.post_save, sender=Organization)
+@receiver(models.signals.post_save, sender=Project)
+@receiver(models.signals.post_save, sender=Questionnaire)
+@receiver(models.signals.post_delete, sender=Organization)
+@receiver(models.signals.post_delete, sender=Project)
+@receiver(models.signals.post_delete, sender=Questionnaire)
+def invalidate_form_lists(sender, **kwargs):
+    form_list.invalidate_all()
+
+
+@receiver(models.signals.post_save, sender=OrganizationRole)
+@receiver(models.signals.post_save, sender=ProjectRole)
+@receiver(models.signals.post_delete, sender=OrganizationRole)
+@receiver(models.signals.post_delete, sender=ProjectRole)
+def invalidate_user_form_list(sender, instance, **kwargs):
+    form_list.invalidate_user(instance.user_id)
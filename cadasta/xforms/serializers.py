@@ -1,7 +1,7 @@
 from django.core.urlresolvers import reverse
 from rest_framework import serializers
 from core.serializers import FieldSelectorSerializer
-from xforms.models import XFormSubmission
+from xforms.models import SubmissionJob, XFormSubmission
 from accounts.models import User
 from questionnaires.models import Questionnaire
 from spatial.serializers import SpatialUnitSerializer
@@ -48,3 +48,14 @@ class XFormSubmissionSerializer(FieldSelectorSerializer,
 
     def create(self, validated_data):
         return XFormSubmission.objects.create(**validated_data)
+
+
+class SubmissionJobSerializer(serializers.ModelSerializer):
+    user = serializers.CharField(source='user.username')
+
+    class Meta:
+        model = SubmissionJob
+        fields = ('id', 'instanceID', 'status', 'user', 'submission',
+                  'errors', 'attempts', 'retry_after', 'created', 'started',
+                  'finished')
+        read_only_fields = fields
@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from core.tests.utils.cases import UserTestCase
+from questionnaires.tests.factories import QuestionnaireFactory
+from .. import downloads
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DownloadsTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.questionnaire = QuestionnaireFactory.create()
+
+    def test_get_etag(self):
+        q = self.questionnaire
+        assert downloads.get_etag(q) == '{}-{}-{}-{}'.format(
+            q.id, q.version, q.md5_hash, downloads.RENDER_VERSION)
+
+    def test_get_xform(self):
+        with patch('xforms.downloads.render_xform',
+                   wraps=downloads.render_xform) as render:
+            xform = downloads.get_xform(self.questionnaire)
+            assert downloads.get_xform(self.questionnaire) == xform
+            assert render.call_count == 1
+
+            # A new version of the questionnaire is rendered again
+            self.questionnaire.version += 1
+            downloads.get_xform(self.questionnaire)
+            assert render.call_count == 2
+
+        assert '<{id} id="{id}" version="{v}"/>'.format(
+            id=self.questionnaire.id_string,
+            v=self.questionnaire.version - 1) in xform.decode()
+
+    def test_precompute_xform(self):
+        downloads.precompute_xform(self.questionnaire)
+        with patch('xforms.downloads.render_xform') as render:
+            downloads.get_xform(self.questionnaire)
+        render.assert_not_called()
+
+    def test_precompute_xform_with_error(self):
+        with patch('xforms.downloads.render_xform',
+                   side_effect=ValueError('broken')):
+            with patch.object(downloads.logger, 'exception') as log:
+                downloads.precompute_xform(self.questionnaire)
+        assert log.call_count == 1
+
+    def test_store_xform_on_commit(self):
+        with patch('xforms.models.transaction.on_commit') as on_commit:
+            questionnaire = QuestionnaireFactory.create()
+        assert on_commit.call_count == 1
+
+        on_commit.call_args[0][0]()
+        with patch('xforms.downloads.render_xform') as render:
+            downloads.get_xform(questionnaire)
+        render.assert_not_called()
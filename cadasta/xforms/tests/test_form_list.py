@@ -0,0 +1,115 @@
+from unittest.mock import MagicMock
+
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from tutelary.models import Role
+
+from accounts.tests.factories import UserFactory
+from core.tests.utils.cases import UserTestCase
+from organization.models import OrganizationRole
+from organization.tests.factories import OrganizationFactory, ProjectFactory
+from questionnaires.tests.factories import QuestionnaireFactory
+from .. import form_list
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class GetUserFormsTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory.create()
+        self.org = OrganizationFactory.create(name='A')
+        OrganizationRole.objects.create(organization=self.org, user=self.user)
+        other_org = OrganizationFactory.create(name='B')
+        OrganizationRole.objects.create(organization=other_org,
+                                        user=self.user)
+
+        project = ProjectFactory.create(organization=self.org, name='A')
+        QuestionnaireFactory.create(project=project, version=1)
+        self.q1 = QuestionnaireFactory.create(project=project, version=2)
+        self.q2 = QuestionnaireFactory.create(
+            project=ProjectFactory.create(organization=other_org))
+        QuestionnaireFactory.create(
+            project=ProjectFactory.create(organization=self.org,
+                                          archived=True))
+        QuestionnaireFactory.create(project=ProjectFactory.create(
+            organization=OrganizationFactory.create(archived=True)))
+        self.q3 = QuestionnaireFactory.create()
+
+    def test_get_user_forms(self):
+        forms = form_list.get_user_forms(self.user)
+        with self.assertNumQueries(1):
+            assert list(forms) == [self.q1, self.q2]
+
+    def test_get_user_forms_for_superuser(self):
+        self.user.assign_policies(Role.objects.get(name='superuser'))
+        forms = form_list.get_user_forms(self.user)
+        assert set(forms) == {self.q1, self.q2, self.q3}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GetFormListTest(UserTestCase, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory.create()
+        self.org = OrganizationFactory.create()
+        self.project = ProjectFactory.create(organization=self.org)
+        self.render = MagicMock(return_value='<xforms/>')
+
+    def get_form_list(self, user=None, host='testserver'):
+        request = RequestFactory().get('/collect/', HTTP_HOST=host)
+        request.user = user or self.user
+        return form_list.get_form_list(request, self.render)
+
+    def test_get_form_list(self):
+        xml, etag = self.get_form_list()
+        assert xml == '<xforms/>'
+        assert etag == '3a40fbe248284ea6d9fea9a2417ef56d'
+        assert self.get_form_list() == (xml, etag)
+        assert self.render.call_count == 1
+        assert list(self.render.call_args[0][0]) == []
+
+        # lists depend on the host of the download URLs
+        self.get_form_list(host='example.com')
+        assert self.render.call_count == 2
+        # and on the user
+        self.get_form_list(user=UserFactory.create())
+        assert self.render.call_count == 3
+
+    def test_invalidate_on_role_change(self):
+        self.get_form_list()
+        questionnaire = QuestionnaireFactory.create(project=self.project)
+        self.render.reset_mock()
+
+        OrganizationRole.objects.create(organization=self.org, user=self.user)
+        self.get_form_list()
+        assert self.render.call_count == 1
+        assert list(self.render.call_args[0][0]) == [questionnaire]
+
+        # other users keep their cached lists
+        other = UserFactory.create()
+        self.get_form_list(user=other)
+        OrganizationRole.objects.create(organization=self.org, user=other)
+        self.get_form_list()
+        assert self.render.call_count == 2
+        self.get_form_list(user=other)
+        assert self.render.call_count == 3
+
+    def test_invalidate_on_questionnaire_upload(self):
+        OrganizationRole.objects.create(organization=self.org, user=self.user)
+        self.get_form_list()
+        questionnaire = QuestionnaireFactory.create(project=self.project)
+        self.get_form_list()
+        assert self.render.call_count == 2
+        assert list(self.render.call_args[0][0]) == [questionnaire]
+
+        self.project.archived = True
+        self.project.save()
+        self.get_form_list()
+        assert list(self.render.call_args[0][0]) == []
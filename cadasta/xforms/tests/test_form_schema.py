@@ -0,0 +1,52 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from jsonattrs.models import (Attribute, AttributeType, Schema,
+                              create_attribute_types)
+
+from questionnaires.tests.factories import (QuestionFactory,
+                                            QuestionnaireFactory)
+from .. import form_schema
+
+
+class FormSchemaTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_attribute_types()
+        form_schema._local.clear()
+        self.questionnaire = QuestionnaireFactory.create()
+        QuestionFactory.create(name='notes', type='TX',
+                               questionnaire=self.questionnaire)
+        QuestionFactory.create(name='count', type='IN',
+                               questionnaire=self.questionnaire)
+
+        content_type = ContentType.objects.get(app_label='party',
+                                               model='party')
+        for questionnaire in [self.questionnaire,
+                              QuestionnaireFactory.create()]:
+            project = questionnaire.project
+            schema = Schema.objects.create(
+                content_type=content_type,
+                selectors=(project.organization.id, project.id,
+                           questionnaire.id))
+            Attribute.objects.create(
+                schema=schema, name='crops_' + questionnaire.id,
+                long_name='Crops',
+                attr_type=AttributeType.objects.get(name='select_multiple'),
+                index=0, choices=['maize', 'beans'],
+                required=False, omit=False)
+            Attribute.objects.create(
+                schema=schema, name='notes', long_name='Notes',
+                attr_type=AttributeType.objects.get(name='text'), index=1,
+                required=False, omit=False)
+
+    def test_load_form_schema(self):
+        schema = form_schema.load_form_schema(self.questionnaire)
+        assert schema.sanitizable_questions == {'notes'}
+        assert schema.select_multiples == {
+            'crops_' + self.questionnaire.id}
+
+    def test_get_form_schema(self):
+        schema = form_schema.get_form_schema(self.questionnaire)
+        with self.assertNumQueries(0):
+            assert form_schema.get_form_schema(self.questionnaire) == schema
@@ -0,0 +1,24 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from jsonattrs.models import create_attribute_types
+
+from core.tests.factories import PolicyFactory
+from party.models import Party
+
+
+class BenchmarkSubmissionsTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        PolicyFactory.load_policies()
+        create_attribute_types()
+
+    def test_benchmark_submissions(self):
+        out = StringIO()
+        call_command('benchmarksubmissions', submissions=2, parties=3,
+                     stdout=out)
+        assert 'Ingested 2 submissions' in out.getvalue()
+        assert 'queries/submission' in out.getvalue()
+        assert Party.objects.count() == 0
@@ -9,6 +9,7 @@ from django.contrib.contenttypes.models import ContentType
 from jsonattrs.models import Attribute, AttributeType, Schema
 from jsonattrs.management.commands import loadattrtypes
 from jsonattrs.models import create_attribute_types
+from tutelary.models import Role
 
 from accounts.tests.factories import UserFactory
 from core.tests.factories import PolicyFactory
@@ -23,6 +24,7 @@ from party.models import Party, TenureRelationship
 from organization.models import OrganizationRole
 from resources.models import Resource
 from spatial.models import SpatialUnit
+from xforms import form_schema
 from xforms.models import XFormSubmission
 from xforms.mixins.model_helper import ModelHelper as mh
 from xforms.exceptions import InvalidXMLSubmission
@@ -35,6 +37,7 @@ class XFormModelHelperTest(TestCase):
         super().setUp()
         PolicyFactory.load_policies()
         create_attribute_types()
+        form_schema._local.clear()
 
         loadattrtypes.Command().handle(force=True)
 
@@ -268,6 +271,77 @@ class XFormModelHelperTest(TestCase):
         assert tenure_resources[0]['id'] == tenure.id
         assert 'resource_three.png' in tenure_resources[0]['resources']
 
+    def test_create_models_with_repeat(self):
+        schema = Schema.objects.get(content_type__model='party')
+        Attribute.objects.create(
+            schema=schema,
+            name='crops', long_name='Crops',
+            attr_type=AttributeType.objects.get(name='select_multiple'),
+            index=2, choices=['maize', 'beans', 'cassava'],
+            required=False, omit=False
+        )
+        data = {
+            'id': 'a1',
+            'meta': {
+                'instanceID': 'uuid:b3f225d3-0fac-4a0b-80c7-60e6db4cc0ad'
+            },
+            'version': str(self.questionnaire.version),
+            'location_type': 'BU',
+            'location_geometry': '45.56342779158167 -122.67650283873081 0 0',
+            'location_attributes': {'fname_two': 'Location One'},
+            'party_repeat': [{
+                'party_name': 'Party One',
+                'party_type': 'IN',
+                'party_attributes_individual': {'crops': 'maize beans'},
+                'tenure_type': 'CO',
+                'tenure_relationship_attributes': {'fname_two': 'Tenure One'}
+            }, {
+                'party_name': 'Party Two',
+                'party_type': 'GR',
+                'party_attributes_group': {'crops': 'cassava'},
+                'tenure_type': 'LH',
+                'tenure_relationship_attributes': {'fname_two': 'Tenure Two'}
+            }]
+        }
+
+        user = UserFactory.create()
+        OrganizationRole.objects.create(
+            user=user, organization=self.project.organization, admin=True)
+
+        (questionnaire,
+         parties, party_resources,
+         locations, location_resources,
+         tenure_relationships, tenure_resources) = mh.create_models(mh(),
+                                                                    data,
+                                                                    user)
+
+        assert parties == list(Party.objects.order_by('name'))
+        assert parties[0].attributes == {'crops': ['maize', 'beans']}
+        assert parties[1].attributes == {'crops': ['cassava']}
+        assert locations == list(SpatialUnit.objects.all())
+        tenures = TenureRelationship.objects.order_by('tenure_type')
+        assert set(tenure_relationships) == set(tenures)
+        assert [(t.party, t.spatial_unit) for t in tenures] == [
+            (parties[0], locations[0]), (parties[1], locations[0])]
+
+        history = Party.history.all()
+        assert len(history) == 2
+        assert all(h.history_user == user for h in history)
+
+    def test_get_previous_submission(self):
+        helper = mh()
+        instance_id = 'b3f225d3-0fac-4a0b-80c7-60e6db4cc0ad'
+        with self.assertNumQueries(1):
+            assert helper.get_previous_submission(instance_id) is None
+            assert helper.get_previous_submission(instance_id) is None
+
+        xform = XFormSubmission.objects.create(
+            json_submission={},
+            user=self.user,
+            questionnaire=self.questionnaire,
+            instanceID=instance_id)
+        assert mh().get_previous_submission(instance_id) == xform
+
     def test_check_for_duplicate_submission(self):
         geoshape = ('45.56342779158167 -122.67650283873081 0.0 0.0;'
                     '45.56176327330353 -122.67669159919024 0.0 0.0;'
@@ -1044,7 +1118,7 @@ class XFormModelHelperTest(TestCase):
             },
             'party_name': 'House Party'
         }
-        attributes = mh._get_attributes(self, data, 'party')
+        attributes = mh()._get_attributes(data, 'party')
 
         assert attributes['name_indv'] == 'Party Indv Attrs'
         assert attributes['type_indv'] == 'Party for one'
@@ -1053,6 +1127,21 @@ class XFormModelHelperTest(TestCase):
         assert 'party_name' not in attributes
         assert 'party_type' not in attributes
 
+    def test_get_attributes_with_select_multiple(self):
+        data = {
+            'party_attributes_individual': {
+                'crops': 'maize beans',
+                'notes': 'two crops',
+            },
+        }
+        helper = mh()
+        helper._schema = form_schema.FormSchema(
+            sanitizable_questions=frozenset(),
+            select_multiples=frozenset(['crops']))
+        attributes = helper._get_attributes(data, 'party')
+        assert attributes == {'crops': ['maize', 'beans'],
+                              'notes': 'two crops'}
+
     def test_get_resource_files(self):
         data = {
             'ardvark': 'Ardvark!',
@@ -1106,6 +1195,14 @@ class XFormModelHelperTest(TestCase):
         except PermissionDenied:
             self.fail("PermissionDenied raised unexpectedly")
 
+    def test_check_perm_superuser(self):
+        user = UserFactory.create()
+        user.assign_policies(Role.objects.get(name='superuser'))
+        try:
+            mh._check_perm(mh, user, self.project)
+        except PermissionDenied:
+            self.fail("PermissionDenied raised unexpectedly")
+
     def test_get_sanitizable_questions(self):
         QuestionFactory.create(
             name='text',
@@ -1204,10 +1301,8 @@ class XFormModelHelperTest(TestCase):
             type='PN',
             questionnaire=self.questionnaire)
 
-        sanitizeable_questions = mh.get_sanitizable_questions(
-            mh(),
-            self.questionnaire.id_string,
-            self.questionnaire.version)
+        sanitizeable_questions = form_schema.load_form_schema(
+            self.questionnaire).sanitizable_questions
         assert len(sanitizeable_questions) == 2
         assert 'text' in sanitizeable_questions
         assert 'note' in sanitizeable_questions
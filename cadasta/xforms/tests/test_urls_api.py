@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.core.urlresolvers import reverse, resolve
+from core.tests.utils.urls import version_ns, version_url
 
 from ..views import api
 
@@ -23,3 +24,32 @@ class XFormsUrlTest(TestCase):
 
         resolved = resolve('/collect/submission')
         assert resolved.func.__name__ == api.XFormSubmissionViewSet.__name__
+
+    def test_project_submission_list(self):
+        actual = reverse(
+            version_ns('xforms:submission_list'),
+            kwargs={'organization': 'habitat', 'project': '123abc'}
+        )
+        expected = version_url(
+            '/organizations/habitat/projects/123abc/submissions/')
+        assert actual == expected
+
+        resolved = resolve(expected)
+        assert resolved.func.__name__ == api.ProjectSubmissionList.__name__
+        assert resolved.kwargs['organization'] == 'habitat'
+        assert resolved.kwargs['project'] == '123abc'
+
+    def test_project_submission_detail(self):
+        actual = reverse(
+            version_ns('xforms:submission_detail'),
+            kwargs={'organization': 'habitat',
+                    'project': '123abc',
+                    'submission_job': 'abc123'}
+        )
+        expected = version_url(
+            '/organizations/habitat/projects/123abc/submissions/abc123/')
+        assert actual == expected
+
+        resolved = resolve(expected)
+        assert resolved.func.__name__ == api.ProjectSubmissionDetail.__name__
+        assert resolved.kwargs['submission_job'] == 'abc123'
@@ -1,5 +1,9 @@
 import json
 import io
+import os
+import shutil
+from io import StringIO
+from unittest.mock import patch
 
 import pytest
 from lxml import etree
@@ -8,10 +12,15 @@ from django.test import TestCase
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test.utils import override_settings
+from django.utils import timezone
 from skivvy import APITestCase
 from tutelary.models import Policy
 
 from accounts.tests.factories import UserFactory
+from core.jobs import run_worker
 from core.messages import SANITIZE_ERROR
 from core.tests.utils.cases import UserTestCase, FileStorageTestCase
 from core.tests.utils.files import make_dirs  # noqa
@@ -26,7 +35,9 @@ from resources.models import Resource
 from spatial.models import SpatialUnit
 from tutelary.models import Role
 from xforms.tests.files.test_resources import responses
-from xforms.models import XFormSubmission
+from xforms.downloads import get_etag
+from xforms.jobs import run_submission_job
+from xforms.models import SubmissionJob, XFormSubmission
 
 from ..views import api
 from .attr_schemas import (default_party_xform_group,
@@ -108,6 +119,28 @@ class XFormListTest(APITestCase, UserTestCase, FileStorageTestCase, TestCase):
         assert xml.find(
             './/xf:xform/xf:formID', namespaces=ns).text == 'form_2'
 
+    def test_get_xforms_not_modified(self):
+        OrganizationRole.objects.create(
+            organization=self.org, user=self.user, admin=True)
+        self._get_questionnaire()
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        etag = response.headers['etag'][1]
+
+        response = self.request(user=self.user,
+                                request_meta={'SERVER_PROTOCOL': 'HTTP/1.1',
+                                              'HTTP_IF_NONE_MATCH': etag})
+        assert response.status_code == 304
+        assert response.headers['etag'][1] == etag
+        assert response.headers['x-openrosa-version'][1] == '1.0'
+
+        self._get_questionnaire(id='form_2')
+        response = self.request(user=self.user,
+                                request_meta={'SERVER_PROTOCOL': 'HTTP/1.1',
+                                              'HTTP_IF_NONE_MATCH': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'][1] != etag
+
     def test_get_without_data(self):
         OrganizationRole.objects.create(
             organization=self.org, user=self.user, admin=True)
@@ -688,6 +721,210 @@ class XFormSubmissionTest(APITestCase, UserTestCase, FileStorageTestCase,
         self._test_resource('test_image_four', party_one)
         self._test_resource('test_image_five', party_two)
 
+    def _queued_job(self):
+        job = SubmissionJob.objects.get()
+        self.addCleanup(shutil.rmtree, job.path, True)
+        return job
+
+    @override_settings(XFORM_SUBMISSION_ASYNC=True)
+    def test_submission_upload_async(self):
+        questionnaire = self._create_questionnaire('t_questionnaire', 0)
+        data = self._submission(form='submission',
+                                image=['test_image_one',
+                                       'test_image_two',
+                                       'test_image_three'],
+                                audio=['test_audio_one'])
+        response = self.request(method='POST', user=self.user, post_data=data,
+                                content_type='multipart/form-data')
+        assert response.status_code == 202
+        assert Party.objects.count() == 0
+
+        job = self._queued_job()
+        assert job.project == self.prj
+        assert job.user == self.user
+        assert job.status == SubmissionJob.PENDING
+        assert len(job.files) == 4
+
+        # A resent submission without new attachments is not queued again
+        data = self._submission(form='submission', image=['test_image_one'])
+        response = self.request(method='POST', user=self.user, post_data=data,
+                                content_type='multipart/form-data')
+        assert response.status_code == 202
+        assert SubmissionJob.objects.count() == 1
+
+        run_submission_job(job)
+        job.refresh_from_db()
+        assert job.status == SubmissionJob.DONE
+        assert not os.path.exists(job.path)
+
+        party = Party.objects.get(name='Bilbo Baggins')
+        tenure = TenureRelationship.objects.get(party=party)
+        self._test_resource('test_image_one', tenure.spatial_unit)
+        self._test_resource('test_image_two', party)
+        self._test_resource('test_audio_one', party)
+        self._test_resource('test_image_three', tenure)
+        assert job.submission == XFormSubmission.objects.get(
+            questionnaire=questionnaire)
+        assert list(job.submission.parties.all()) == [party]
+
+    @override_settings(XFORM_SUBMISSION_ASYNC=True)
+    def test_invalid_submission_upload_async(self):
+        self._create_questionnaire('t_questionnaire', 0)
+        data = self._submission(form='submission_bad_location')
+        response = self.request(method='POST', user=self.user, post_data=data,
+                                content_type='multipart/form-data')
+        assert response.status_code == 202
+
+        job = self._queued_job()
+        call_command('processsubmissions', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        assert job.status == SubmissionJob.FAILED
+        assert job.errors == ["Location error: 'location_type'"]
+        assert os.path.exists(job.path)
+        assert Party.objects.count() == 0
+        assert XFormSubmission.objects.count() == 0
+
+    @override_settings(XFORM_SUBMISSION_ASYNC=True)
+    def test_unauthorized_user_async(self):
+        self._create_questionnaire('t_questionnaire', 0)
+        data = self._submission(form='submission')
+        response = self.request(method='POST', post_data=data,
+                                user=UserFactory.create(),
+                                content_type='multipart/form-data')
+        assert response.status_code == 403
+        assert SubmissionJob.objects.count() == 0
+
+    @override_settings(XFORM_SUBMISSION_ASYNC=True)
+    def test_form_not_current_questionnaire_async(self):
+        self._create_questionnaire('t_questionnaire', 0)
+        self._create_questionnaire('t_questionnaire', 1)
+        data = self._submission(form='submission')
+        response = self.request(method='POST', post_data=data,
+                                user=self.user,
+                                content_type='multipart/form-data')
+        assert response.status_code == 400
+        assert self._getResponseMessage(response) == 'Form out of date'
+        assert SubmissionJob.objects.count() == 0
+
+    @override_settings(XFORM_SUBMISSION_ASYNC=True)
+    def test_submission_upload_async_transient_error(self):
+        self._create_questionnaire('t_questionnaire', 0)
+        data = self._submission(form='submission')
+        response = self.request(method='POST', user=self.user, post_data=data,
+                                content_type='multipart/form-data')
+        assert response.status_code == 202
+        job = self._queued_job()
+
+        with patch('xforms.jobs.ingest_submission',
+                   side_effect=OperationalError('connection lost')):
+            assert run_worker(SubmissionJob, run_submission_job,
+                              once=True) == 1
+        job.refresh_from_db()
+        assert job.status == SubmissionJob.PENDING
+        assert job.attempts == 1
+        assert job.errors == ['connection lost']
+        assert job.retry_after > timezone.now()
+        assert os.path.exists(job.path)
+        assert Party.objects.count() == 0
+
+        # the job is retried once its delay has passed
+        SubmissionJob.objects.filter(pk=job.pk).update(
+            retry_after=timezone.now())
+        assert run_worker(SubmissionJob, run_submission_job, once=True) == 1
+        job.refresh_from_db()
+        assert job.status == SubmissionJob.DONE
+        assert Party.objects.count() == 1
+
+
+class ProjectSubmissionListAPITest(APITestCase, UserTestCase, TestCase):
+    view_class = api.ProjectSubmissionList
+
+    def setup_models(self):
+        self.user = UserFactory.create()
+        self.project = ProjectFactory.create()
+        OrganizationRole.objects.create(
+            organization=self.project.organization, user=self.user,
+            admin=True)
+        self.pending = SubmissionJob.objects.create(
+            project=self.project, user=self.user,
+            instanceID='b3f225d3-0fac-4a0b-80c7-60e6db4cc0ad',
+            path='/tmp/submission')
+        SubmissionJob.objects.create(
+            project=self.project, user=self.user, status=SubmissionJob.DONE,
+            instanceID='c9b1e1a2-0fac-4a0b-80c7-60e6db4cc0ad',
+            path='/tmp/done')
+        SubmissionJob.objects.create(
+            project=ProjectFactory.create(), user=self.user,
+            instanceID='d7a0b8c4-0fac-4a0b-80c7-60e6db4cc0ad',
+            path='/tmp/other')
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.project.organization.slug,
+            'project': self.project.slug,
+        }
+
+    def test_list_submissions(self):
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.content['count'] == 2
+
+    def test_list_pending_submissions(self):
+        response = self.request(user=self.user,
+                                get_data={'status': SubmissionJob.PENDING})
+        assert response.status_code == 200
+        job, = response.content['results']
+        assert job['id'] == self.pending.id
+        assert job['instanceID'] == str(self.pending.instanceID)
+        assert job['user'] == self.user.username
+        assert job['submission'] is None
+        assert job['errors'] == []
+
+    def test_list_submissions_with_unauthorized_user(self):
+        response = self.request(user=UserFactory.create())
+        assert response.status_code == 403
+
+
+class ProjectSubmissionDetailAPITest(APITestCase, UserTestCase, TestCase):
+    view_class = api.ProjectSubmissionDetail
+
+    def setup_models(self):
+        self.user = UserFactory.create()
+        self.project = ProjectFactory.create()
+        OrganizationRole.objects.create(
+            organization=self.project.organization, user=self.user,
+            admin=True)
+        self.job = SubmissionJob.objects.create(
+            project=self.project, user=self.user,
+            instanceID='b3f225d3-0fac-4a0b-80c7-60e6db4cc0ad',
+            path='/tmp/submission')
+
+    def setup_url_kwargs(self):
+        return {
+            'organization': self.project.organization.slug,
+            'project': self.project.slug,
+            'submission_job': self.job.id,
+        }
+
+    def test_get_submission(self):
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.content['id'] == self.job.id
+        assert response.content['status'] == SubmissionJob.PENDING
+
+    def test_get_submission_with_unauthorized_user(self):
+        response = self.request(user=UserFactory.create())
+        assert response.status_code == 403
+
+    def test_get_submission_from_other_project(self):
+        job = SubmissionJob.objects.create(
+            project=ProjectFactory.create(), user=self.user,
+            instanceID='d7a0b8c4-0fac-4a0b-80c7-60e6db4cc0ad',
+            path='/tmp/other')
+        response = self.request(user=self.user,
+                                url_kwargs={'submission_job': job.id})
+        assert response.status_code == 404
+
 
 class XFormDownloadView(APITestCase, UserTestCase, TestCase):
     view_class = api.XFormDownloadView
@@ -722,6 +959,28 @@ class XFormDownloadView(APITestCase, UserTestCase, TestCase):
                 id=self.questionnaire.id_string,
                 v=self.questionnaire.version) in response.content
 
+    def test_get_questionnaire_etag(self):
+        etag = '"{}"'.format(get_etag(self.questionnaire))
+        response = self.request(user=self.user)
+        assert response.status_code == 200
+        assert response.headers['etag'][1] == etag
+
+        response = self.request(user=self.user,
+                                request_meta={'HTTP_IF_NONE_MATCH': etag})
+        assert response.status_code == 304
+        assert response.headers['etag'][1] == etag
+
+        response = self.request(
+            user=self.user, request_meta={'HTTP_IF_NONE_MATCH': '"other"'})
+        assert response.status_code == 200
+
+    def test_get_questionnaire_etag_with_unauthorized_user(self):
+        user = UserFactory.create()
+        etag = '"{}"'.format(get_etag(self.questionnaire))
+        response = self.request(user=user,
+                                request_meta={'HTTP_IF_NONE_MATCH': etag})
+        assert response.status_code == 403
+
     def test_get_questionnaire_that_does_not_exist(self):
         response = self.request(user=self.user,
                                 url_kwargs={'questionnaire': 'abc'})
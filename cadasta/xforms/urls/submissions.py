@@ -0,0 +1,14 @@
+from django.conf.urls import url
+
+from ..views import api
+
+urlpatterns = [
+    url(
+        r'^$',
+        api.ProjectSubmissionList.as_view(),
+        name='submission_list'),
+    url(
+        r'^(?P<submission_job>[-\w]+)/$',
+        api.ProjectSubmissionDetail.as_view(),
+        name='submission_detail'),
+]
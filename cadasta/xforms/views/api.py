@@ -1,24 +1,31 @@
 import logging
 
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
 from django.utils.six import BytesIO
 from django.utils.translation import ugettext as _
 from questionnaires.models import Questionnaire
-from rest_framework import status, viewsets, generics
+from rest_framework import filters, status, viewsets, generics
 from rest_framework.authentication import BasicAuthentication
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.renderers import JSONRenderer
 from rest_framework.renderers import StaticHTMLRenderer
 from rest_framework.response import Response
-from tutelary.models import Role
 from tutelary.mixins import APIPermissionRequiredMixin
-from xforms.models import XFormSubmission
+from organization.views.mixins import ProjectMixin
+from xforms import form_list
+from xforms.downloads import get_etag, get_xform
+from xforms.jobs import queue_submission
+from xforms.models import SubmissionJob, XFormSubmission
 from xforms.mixins.model_helper import ModelHelper
 from xforms.mixins.openrosa_headers_mixin import OpenRosaHeadersMixin
 from xforms.renderers import XFormListRenderer
-from xforms.serializers import XFormListSerializer, XFormSubmissionSerializer
+from xforms.serializers import (SubmissionJobSerializer, XFormListSerializer,
+                                XFormSubmissionSerializer)
 from xforms.exceptions import InvalidXMLSubmission
 from questionnaires.serializers import QuestionnaireSerializer
 from ..renderers import XFormRenderer
@@ -47,6 +54,13 @@ class XFormSubmissionViewSet(OpenRosaHeadersMixin, viewsets.GenericViewSet):
             return Response(headers=self.get_openrosa_headers(request),
                             status=status.HTTP_204_NO_CONTENT,)
         try:
+            if settings.XFORM_SUBMISSION_ASYNC:
+                queue_submission(request)
+                return self._formatMessageResponse(
+                    request,
+                    _("Form was received and will be processed shortly"),
+                    status.HTTP_202_ACCEPTED
+                )
             instance = ModelHelper().upload_submission_data(request)
         except InvalidXMLSubmission as e:
             logger.debug(str(e))
@@ -120,32 +134,27 @@ class XFormListView(OpenRosaHeadersMixin,
         context['request'] = self.request
         return context
 
-    def get_user_forms(self):
-        forms = []
-        policies = self.request.user.assigned_policies()
-        orgs = self.request.user.organizations.filter(archived=False)
-        if Role.objects.get(name='superuser') in policies:
-            return Questionnaire.objects.filter(project__archived=False)
-        for org in orgs:
-            projects = org.projects.filter(archived=False)
-            for project in projects:
-                try:
-                    questionnaire = Questionnaire.objects.get(
-                        id=project.current_questionnaire
-                    )
-                    forms.append(questionnaire)
-                except Questionnaire.DoesNotExist:
-                    pass
-        return forms
-
     def get_queryset(self):
-        return self.get_user_forms()
+        return form_list.get_user_forms(self.request.user)
+
+    def render_forms(self, forms):
+        serializer = self.get_serializer(forms, many=True)
+        return XFormListRenderer().render(serializer.data)
 
     def list(self, request, *args, **kwargs):
-        self.object_list = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(self.object_list, many=True)
-        return Response(
-            serializer.data, headers=self.get_openrosa_headers(request))
+        """Serves the cached form list of the user, or an empty 304
+        response if the client sent its ETag in If-None-Match."""
+        xml, etag = form_list.get_form_list(request, self.render_forms)
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in etags or '*' in etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(xml,
+                                    content_type='text/xml; charset=utf-8')
+        for header, value in self.get_openrosa_headers(request).items():
+            response[header] = value
+        response['ETag'] = quote_etag(etag)
+        return response
 
 
 class XFormDownloadView(APIPermissionRequiredMixin, generics.RetrieveAPIView):
@@ -169,3 +178,51 @@ class XFormDownloadView(APIPermissionRequiredMixin, generics.RetrieveAPIView):
         context = super().get_serializer_context(*args, **kwargs)
         context['project'] = self.get_object().project
         return context
+
+    def retrieve(self, request, *args, **kwargs):
+        """Serves the precomputed XForm of the questionnaire, or an empty
+        304 response if the client sent its ETag in If-None-Match."""
+        questionnaire = self.get_object()
+        etag = get_etag(questionnaire)
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in etags or '*' in etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                get_xform(questionnaire),
+                content_type='application/xml; charset=utf-8')
+        response['ETag'] = quote_etag(etag)
+        return response
+
+
+class ProjectSubmissionList(APIPermissionRequiredMixin,
+                            ProjectMixin,
+                            generics.ListAPIView):
+    """Lists the submissions in the inbox of a project, newest first."""
+
+    serializer_class = SubmissionJobSerializer
+    filter_backends = (filters.DjangoFilterBackend,)
+    filter_fields = ('status',)
+    permission_required = 'project.import'
+
+    def get_perms_objects(self):
+        return [self.get_project()]
+
+    def get_queryset(self):
+        return SubmissionJob.objects.filter(
+            project=self.get_project()).select_related('user')
+
+
+class ProjectSubmissionDetail(APIPermissionRequiredMixin,
+                              ProjectMixin,
+                              generics.RetrieveAPIView):
+    serializer_class = SubmissionJobSerializer
+    lookup_url_kwarg = 'submission_job'
+    permission_required = 'project.import'
+
+    def get_perms_objects(self):
+        return [self.get_project()]
+
+    def get_queryset(self):
+        return SubmissionJob.objects.filter(
+            project=self.get_project()).select_related('user')